@@ -0,0 +1,159 @@
+from collections import OrderedDict
+
+# Export order for chunked plans: every group only depends on groups before it
+ASSET_TYPE_ORDER = ["vpcConnection", "datasource", "theme", "dataset", "analysis", "dashboard"]
+
+# QuickSight accepts a bounded list of ResourceArns per export job; plans larger than this are split
+DEFAULT_MAX_RESOURCE_ARNS_PER_EXPORT = 100
+
+
+def arn_resource_type(arn: str) -> str:
+    """Returns the QuickSight resource type of an ARN, e.g. 'dataset' for arn:aws:quicksight:...:dataset/<id>."""
+    return arn.rsplit(':', 1)[-1].split('/', 1)[0]
+
+
+def arn_resource_id(arn: str) -> str:
+    """Returns the resource ID at the end of a QuickSight ARN."""
+    return arn.rsplit('/', 1)[-1]
+
+
+class AssetGraph:
+    """
+    Dependency graph of QuickSight assets, keyed by ARN.
+
+    Nodes are resolved with Describe calls, each ARN at most once, following
+    dashboard -> analysis -> dataset -> datasource -> theme/VPC connection edges.
+    The LastUpdatedTime of every described asset is kept in last_updated.
+    """
+
+    def __init__(self, quicksight_client, aws_account_id: str, log=print):
+        self.quicksight_client = quicksight_client
+        self.aws_account_id = aws_account_id
+        self.log = log
+        self.dependencies = OrderedDict()  # ARN -> list of ARNs it depends on
+        self.dependents = {}               # ARN -> set of ARNs that depend on it
+        self.last_updated = {}             # ARN -> LastUpdatedTime (ISO 8601) from its Describe call
+
+    def _record_last_updated(self, arn: str, described: dict):
+        last_updated = described.get("LastUpdatedTime")
+        self.last_updated[arn] = last_updated.isoformat() if hasattr(last_updated, "isoformat") else last_updated
+
+    def _describe_dependencies(self, arn: str) -> list:
+        resource_type = arn_resource_type(arn)
+        resource_id = arn_resource_id(arn)
+        client = self.quicksight_client
+        account = self.aws_account_id
+        found = []
+
+        if resource_type == "dashboard":
+            dashboard = client.describe_dashboard(AwsAccountId=account, DashboardId=resource_id)["Dashboard"]
+            self._record_last_updated(arn, dashboard)
+            version = dashboard.get("Version", {})
+            if version.get("SourceEntityArn") and arn_resource_type(version["SourceEntityArn"]) == "analysis":
+                found.append(version["SourceEntityArn"])
+            found.extend(version.get("DataSetArns", []))
+            if version.get("ThemeArn"):
+                found.append(version["ThemeArn"])
+        elif resource_type == "analysis":
+            analysis = client.describe_analysis(AwsAccountId=account, AnalysisId=resource_id)["Analysis"]
+            self._record_last_updated(arn, analysis)
+            found.extend(analysis.get("DataSetArns", []))
+            if analysis.get("ThemeArn"):
+                found.append(analysis["ThemeArn"])
+        elif resource_type == "dataset":
+            data_set = client.describe_data_set(AwsAccountId=account, DataSetId=resource_id)["DataSet"]
+            self._record_last_updated(arn, data_set)
+            for table in data_set.get("PhysicalTableMap", {}).values():
+                for source_key in ("RelationalTable", "CustomSql", "S3Source"):
+                    if table.get(source_key, {}).get("DataSourceArn"):
+                        found.append(table[source_key]["DataSourceArn"])
+            for table in data_set.get("LogicalTableMap", {}).values():
+                if table.get("Source", {}).get("DataSetArn"):
+                    found.append(table["Source"]["DataSetArn"])
+            if data_set.get("RowLevelPermissionDataSet", {}).get("Arn"):
+                found.append(data_set["RowLevelPermissionDataSet"]["Arn"])
+        elif resource_type == "datasource":
+            data_source = client.describe_data_source(AwsAccountId=account, DataSourceId=resource_id)["DataSource"]
+            self._record_last_updated(arn, data_source)
+            if data_source.get("VpcConnectionProperties", {}).get("VpcConnectionArn"):
+                found.append(data_source["VpcConnectionProperties"]["VpcConnectionArn"])
+        # Themes and VPC connections are leaves; they are only described for their LastUpdatedTime
+        elif resource_type == "theme":
+            self._record_last_updated(arn, client.describe_theme(AwsAccountId=account, ThemeId=resource_id)["Theme"])
+        elif resource_type == "vpcConnection":
+            self._record_last_updated(arn, client.describe_vpc_connection(
+                AwsAccountId=account, VPCConnectionId=resource_id)["VPCConnection"])
+
+        return list(OrderedDict.fromkeys(found))
+
+    def resolve(self, root_arns: list, follow_dependencies: bool = True):
+        """
+        Resolves the full dependency closure of root_arns, or only root_arns themselves when
+        follow_dependencies is False. ARNs already in the graph are not described again.
+        """
+        pending = list(root_arns)
+        while pending:
+            arn = pending.pop(0)
+            if arn in self.dependencies:
+                continue
+            self.log(f"  Resolving dependencies of {arn}")
+            self.dependencies[arn] = self._describe_dependencies(arn)
+            for dependency in self.dependencies[arn]:
+                self.dependents.setdefault(dependency, set()).add(arn)
+                if follow_dependencies and dependency not in self.dependencies:
+                    pending.append(dependency)
+        return self
+
+    def shared_assets(self) -> dict:
+        """ARNs used by more than one asset in the graph, with the ARNs that use them."""
+        return {arn: users for arn, users in self.dependents.items() if len(users) > 1}
+
+    def ordered_arns(self) -> list:
+        """Every ARN in the graph, dependencies before the assets that use them."""
+        rank = {resource_type: position for position, resource_type in enumerate(ASSET_TYPE_ORDER)}
+        by_type = lambda arn: rank.get(arn_resource_type(arn), len(rank))
+        ordered = []
+        visited = set()
+
+        def visit(arn):
+            if arn in visited:
+                return
+            visited.add(arn)
+            for dependency in sorted(self.dependencies.get(arn, []), key=by_type):
+                visit(dependency)
+            ordered.append(arn)
+
+        for arn in sorted(self.dependencies, key=by_type):
+            visit(arn)
+        return ordered
+
+
+def plan_deduplicated_exports(
+    quicksight_client,
+    aws_account_id: str,
+    aws_region: str,
+    dashboard_ids: list,
+    max_resource_arns_per_export: int = DEFAULT_MAX_RESOURCE_ARNS_PER_EXPORT,
+    log=print
+):
+    """
+    Plans exports for several dashboards so that every shared dependency moves exactly once.
+
+    Returns (graph, export_groups) where export_groups is a list of ResourceArns lists. Normally that
+    is a single export of the deduplicated closure; larger closures are split in dependency order so
+    each group can be imported after the ones before it.
+    """
+    root_arns = [f"arn:aws:quicksight:{aws_region}:{aws_account_id}:dashboard/{dashboard_id}" for dashboard_id in dashboard_ids]
+    log(f"Resolving dependency graph for {len(root_arns)} dashboards...")
+    graph = AssetGraph(quicksight_client, aws_account_id, log=log).resolve(root_arns)
+
+    ordered = graph.ordered_arns()
+    export_groups = [ordered[start:start + max_resource_arns_per_export]
+                     for start in range(0, len(ordered), max_resource_arns_per_export)]
+
+    shared = graph.shared_assets()
+    log(f"Dependency graph resolved: {len(ordered)} unique assets, {len(shared)} shared by more than one asset, "
+        f"{len(export_groups)} export job(s) planned.")
+    for arn, users in shared.items():
+        log(f"  Shared: {arn} (used by {len(users)} assets)")
+    return graph, export_groups
@@ -0,0 +1,83 @@
+import asyncio
+import contextvars
+import functools
+import signal
+from concurrent.futures import ThreadPoolExecutor
+
+from job_waiter import DEFAULT_JOB_TIMEOUT_SECONDS, PENDING_JOB_STATUSES, JobWaiter
+
+# Threads for blocking calls (boto3 requests, downloads, bundle rewrites); waiting on jobs needs none
+DEFAULT_OFFLOAD_THREADS = 16
+
+
+class AsyncEngine:
+    """
+    Runs promotion pipelines as asyncio tasks in one process.
+
+    boto3 has no asyncio API, so every blocking call is offloaded to a bounded thread pool, while
+    waiting on an export or import job is asyncio.sleep between Describe calls. Dozens of jobs can
+    then be in flight on a handful of threads. job_slot(kind) bounds how many jobs of one kind
+    (e.g. "export", "import") run at once. Ctrl-C cancels every pipeline still running; jobs
+    already started keep running in QuickSight, only the waiting stops.
+    """
+
+    def __init__(self, max_concurrent_jobs: int, offload_threads: int = DEFAULT_OFFLOAD_THREADS, log=print):
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.offload_threads = offload_threads
+        self.log = log
+        self._executor = None
+        self._slots = {}
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """Runs func in the offload pool, with the calling task's run_report context."""
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, func, *args, **kwargs)
+        return await asyncio.get_event_loop().run_in_executor(self._executor, call)
+
+    def job_slot(self, kind: str) -> asyncio.Semaphore:
+        """The semaphore bounding concurrent jobs of this kind; use as `async with engine.job_slot(...)`."""
+        # Created on first use, inside the running loop (Python 3.8 binds a semaphore to a loop)
+        if kind not in self._slots:
+            self._slots[kind] = asyncio.Semaphore(self.max_concurrent_jobs)
+        return self._slots[kind]
+
+    async def wait_job(self, describe, pending_statuses=PENDING_JOB_STATUSES, label: str = "Job",
+                       deadline_seconds: float = DEFAULT_JOB_TIMEOUT_SECONDS):
+        """JobWaiter.wait_async with the Describe calls in the offload pool."""
+        return await JobWaiter(deadline_seconds=deadline_seconds, log=self.log).wait_async(
+            describe, pending_statuses, label, run_blocking=self.run_blocking)
+
+    def run(self, coroutines: list) -> list:
+        """
+        Runs the coroutines concurrently until all are done. Returns their results in order; a
+        coroutine that raised (or was cancelled) is represented by its exception.
+        """
+        return asyncio.run(self._run_all(coroutines))
+
+    async def _run_all(self, coroutines: list) -> list:
+        loop = asyncio.get_event_loop()
+        self._executor = ThreadPoolExecutor(max_workers=self.offload_threads)
+        self._slots = {}
+        tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+        try:
+            loop.add_signal_handler(signal.SIGINT, self._cancel, tasks)
+            handles_interrupt = True
+        except (NotImplementedError, RuntimeError, ValueError):
+            # Not available on Windows or outside the main thread; Ctrl-C then ends the run abruptly
+            handles_interrupt = False
+        try:
+            return await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            if handles_interrupt:
+                loop.remove_signal_handler(signal.SIGINT)
+            # Offloaded calls cannot be interrupted; let those in flight finish
+            self._executor.shutdown(wait=True)
+
+    def _cancel(self, tasks: list):
+        running = [task for task in tasks if not task.done()]
+        self.log(f"\nInterrupted: cancelling {len(running)} running promotions. "
+                 "Jobs already started keep running in QuickSight. Press Ctrl-C again to exit immediately.")
+        # A second Ctrl-C gets the default KeyboardInterrupt
+        asyncio.get_event_loop().remove_signal_handler(signal.SIGINT)
+        for task in running:
+            task.cancel()
@@ -0,0 +1,69 @@
+import threading
+
+import boto3
+from botocore.config import Config
+
+# Batch promotions share one client across export and import threads; size the pool for that
+DEFAULT_MAX_POOL_CONNECTIONS = 50
+DEFAULT_MAX_ATTEMPTS = 10
+
+DEFAULT_CLIENT_CONFIG = Config(
+    max_pool_connections=DEFAULT_MAX_POOL_CONNECTIONS,
+    # Adaptive mode adds client-side rate limiting on top of standard retries when QuickSight throttles
+    retries={"mode": "adaptive", "max_attempts": DEFAULT_MAX_ATTEMPTS},
+    tcp_keepalive=True,
+    connect_timeout=10,
+    read_timeout=60,
+)
+
+
+class ClientRegistry:
+    """
+    Hands out one boto3 client per (profile, region, service, endpoint) and reuses it.
+
+    boto3 clients are thread-safe once created, but sessions and client creation are not, so
+    creation happens under a lock. Reusing clients keeps credential resolution, endpoint setup
+    and the connection pool (with its TLS sessions) alive across calls and threads.
+    """
+
+    def __init__(self, config: Config = DEFAULT_CLIENT_CONFIG):
+        self.config = config
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._clients = {}
+
+    def _session(self, profile_name: str, region_name: str) -> boto3.Session:
+        key = (profile_name, region_name)
+        if key not in self._sessions:
+            session_params = {"region_name": region_name}
+            if profile_name:
+                session_params["profile_name"] = profile_name
+            self._sessions[key] = boto3.Session(**session_params)
+        return self._sessions[key]
+
+    def client(self, service_name: str, region_name: str = None, profile_name: str = None, endpoint_url: str = None):
+        key = (profile_name, region_name, service_name, endpoint_url)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    session = self._session(profile_name, region_name)
+                    client = session.client(service_name, region_name=region_name,
+                                            endpoint_url=endpoint_url, config=self.config)
+                    self._clients[key] = client
+        return client
+
+    def clear(self):
+        """Forgets every cached session and client (e.g. after credentials were rotated)."""
+        with self._lock:
+            self._sessions.clear()
+            self._clients.clear()
+
+
+_default_registry = ClientRegistry()
+
+
+def get_client(service_name: str, region_name: str = None, profile_name: str = None, endpoint_url: str = None):
+    """Returns the shared client for this profile, region and service from the default registry."""
+    return _default_registry.client(service_name, region_name, profile_name, endpoint_url)
@@ -0,0 +1,325 @@
+import argparse
+import base64
+import contextlib
+import functools
+import http.server
+import io
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import Counter
+
+import run_report
+from bundle_rewriter import process_qs_file
+
+OLD_ACCOUNT_ID = "470822489487"
+NEW_ACCOUNT_ID = "565393024852"
+REGION = "us-east-1"
+RESULTS_VERSION = 1
+
+
+def _visual(dataset_id: str, index: int) -> dict:
+    field_id = f"{dataset_id}.{index}.{random.randint(10**12, 10**13)}"
+    return {
+        "BarChartVisual": {
+            "VisualId": str(uuid.uuid4()),
+            "ChartConfiguration": {
+                "FieldWells": {"BarChartAggregatedFieldWells": {"Category": [
+                    {"CategoricalDimensionField": {"FieldId": field_id, "Column": {"DataSetIdentifier": dataset_id, "ColumnName": f"column_{index}"}}}
+                ]}},
+            },
+        }
+    }
+
+
+def _permissions() -> list:
+    return [{"principal": f"arn:aws:quicksight:{REGION}:{OLD_ACCOUNT_ID}:group/default/analysts",
+             "actions": ["quicksight:DescribeDashboard", "quicksight:QueryDashboard"]}]
+
+
+def _nested_zip(arn_prefix: str, dataset_ids: list, depth: int) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as nested_zip:
+        for dataset_id in dataset_ids:
+            nested_zip.writestr(f"refs/{dataset_id}.json", json.dumps(
+                {"dataSetArn": f"{arn_prefix}:dataset/{dataset_id}", "bucket": "analytics-dev-exports"}))
+        if depth > 1:
+            nested_zip.writestr("inner.zip", _nested_zip(arn_prefix, dataset_ids[:1], depth - 1))
+    return buffer.getvalue()
+
+
+def generate_bundle(path: str, dashboards: int = 200, visuals_per_dashboard: int = 400, datasets: int = 50,
+                    nested_zips: int = 0, nested_depth: int = 2, replacement_keys: int = 0, seed: int = 0) -> dict:
+    """
+    Writes a synthetic QUICKSIGHT_JSON bundle: dashboard/, dataset/ and datasource/ members that reference
+    each other by ID and ARN and carry permissions, plus nested_zips archives (nested_depth levels deep).
+    Returns the ID replacement map to use with it, padded with non-matching IDs up to replacement_keys.
+    """
+    random.seed(seed)
+    dataset_ids = [str(uuid.UUID(int=random.getrandbits(128))) for _ in range(datasets)]
+    datasource_id = str(uuid.UUID(int=random.getrandbits(128)))
+    arn_prefix = f"arn:aws:quicksight:{REGION}:{OLD_ACCOUNT_ID}"
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as bundle_zip:
+        for dataset_id in dataset_ids:
+            bundle_zip.writestr(f"dataset/{dataset_id}.json", json.dumps({
+                "dataSetId": dataset_id,
+                "arn": f"{arn_prefix}:dataset/{dataset_id}",
+                "physicalTableMap": {"t1": {"relationalTable": {"dataSourceArn": f"{arn_prefix}:datasource/{datasource_id}"}}},
+                "permissions": _permissions(),
+            }))
+        bundle_zip.writestr(f"datasource/{datasource_id}.json", json.dumps({
+            "dataSourceId": datasource_id, "arn": f"{arn_prefix}:datasource/{datasource_id}",
+        }))
+        for _ in range(dashboards):
+            dashboard_id = str(uuid.UUID(int=random.getrandbits(128)))
+            used = random.sample(dataset_ids, min(5, len(dataset_ids)))
+            bundle_zip.writestr(f"dashboard/{dashboard_id}.json", json.dumps({
+                "dashboardId": dashboard_id,
+                "arn": f"{arn_prefix}:dashboard/{dashboard_id}",
+                "definition": {
+                    "dataSetIdentifierDeclarations": [
+                        {"identifier": dataset_id, "dataSetArn": f"{arn_prefix}:dataset/{dataset_id}"} for dataset_id in used
+                    ],
+                    "sheets": [{"visuals": [_visual(random.choice(used), index) for index in range(visuals_per_dashboard)]}],
+                },
+                "permissions": _permissions(),
+            }))
+        for index in range(nested_zips):
+            bundle_zip.writestr(f"attachments/{index}.zip", _nested_zip(arn_prefix, random.sample(dataset_ids, min(3, len(dataset_ids))), nested_depth))
+
+    replacements = {dataset_id: str(uuid.UUID(int=random.getrandbits(128))) for dataset_id in dataset_ids}
+    while len(replacements) < replacement_keys:
+        replacements[str(uuid.UUID(int=random.getrandbits(128)))] = str(uuid.UUID(int=random.getrandbits(128)))
+    return replacements
+
+
+class StubQuickSight:
+    """
+    Local stand-in for the asset bundle export/import job APIs. Every call takes api_latency seconds;
+    a job reports IN_PROGRESS until job_seconds after it was started, then SUCCESSFUL.
+    """
+
+    def __init__(self, download_url: str, api_latency: float = 0.05, job_seconds: float = 0.5):
+        self.download_url = download_url
+        self.api_latency = api_latency
+        self.job_seconds = job_seconds
+        self.calls = Counter()
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def _call(self, name: str):
+        with self._lock:
+            self.calls[name] += 1
+        time.sleep(self.api_latency)
+
+    def _status(self, job_id: str) -> str:
+        return "SUCCESSFUL" if time.monotonic() - self._started[job_id] >= self.job_seconds else "IN_PROGRESS"
+
+    def start_asset_bundle_export_job(self, AssetBundleExportJobId, **kwargs):
+        self._call("start_asset_bundle_export_job")
+        self._started[AssetBundleExportJobId] = time.monotonic()
+        return {"Status": 202, "Arn": f"arn:aws:quicksight:{REGION}:{OLD_ACCOUNT_ID}:asset-bundle-export-job/{AssetBundleExportJobId}"}
+
+    def describe_asset_bundle_export_job(self, AssetBundleExportJobId, **kwargs):
+        self._call("describe_asset_bundle_export_job")
+        status = self._status(AssetBundleExportJobId)
+        response = {"Status": 200, "JobStatus": status}
+        if status == "SUCCESSFUL":
+            response["DownloadUrl"] = self.download_url
+        return response
+
+    def start_asset_bundle_import_job(self, AssetBundleImportJobId, AssetBundleImportSource, **kwargs):
+        self._call("start_asset_bundle_import_job")
+        self._started[AssetBundleImportJobId] = time.monotonic()
+        return {"Status": 202, "Arn": f"arn:aws:quicksight:{REGION}:{NEW_ACCOUNT_ID}:asset-bundle-import-job/{AssetBundleImportJobId}"}
+
+    def describe_asset_bundle_import_job(self, AssetBundleImportJobId, **kwargs):
+        self._call("describe_asset_bundle_import_job")
+        return {"Status": 200, "JobStatus": self._status(AssetBundleImportJobId)}
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def serve_directory(directory: str):
+    """Serves directory over HTTP on a free local port; yields the base URL."""
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(_QuietHandler, directory=directory))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def measure(name: str, run, repeat: int, bytes_processed: int = None) -> dict:
+    """Calls run() repeat times with its stdout and INFO logging discarded. Returns the timing summary."""
+    runs = []
+    stages = None
+    for _ in range(repeat):
+        run_report.REPORT = run_report.RunReport()
+        logging.disable(logging.INFO)
+        started = time.perf_counter()
+        try:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                if run() in (None, False):
+                    raise RuntimeError(f"Benchmark {name} failed")
+        finally:
+            logging.disable(logging.NOTSET)
+        runs.append(time.perf_counter() - started)
+        stages = run_report.REPORT.summary()
+    result = {
+        "name": name,
+        "best_seconds": round(min(runs), 6),
+        "mean_seconds": round(statistics.mean(runs), 6),
+        "runs": [round(seconds, 6) for seconds in runs],
+        "stages": stages,
+    }
+    if bytes_processed:
+        result["mb_per_second"] = round(bytes_processed / (1024 * 1024) / min(runs), 3)
+    print(f"  {name:<44} best {result['best_seconds']:>8.3f}s  mean {result['mean_seconds']:>8.3f}s")
+    return result
+
+
+def run_benchmarks(args, work_dir: str) -> list:
+    import bundletool
+    import folderexport
+    import updated_quicksight
+
+    bundle_path = os.path.join(work_dir, "synthetic.qs")
+    replacements = generate_bundle(bundle_path, args.dashboards, args.visuals_per_dashboard, args.datasets,
+                                   args.nested_zips, args.nested_depth, args.replacement_keys)
+    with zipfile.ZipFile(bundle_path) as bundle_zip:
+        members = len(bundle_zip.infolist())
+        uncompressed = sum(info.file_size for info in bundle_zip.infolist())
+    print(f"Synthetic bundle: {members} members, {uncompressed / (1024 * 1024):.1f} MB uncompressed, "
+          f"{os.path.getsize(bundle_path) / (1024 * 1024):.1f} MB on disk, {len(replacements)} replacement keys")
+
+    results = []
+    worker_counts = sorted({1, args.workers})
+    output_path = os.path.join(work_dir, "output.qs")
+
+    print("\nprocess_qs_file:")
+    for rewrite_mode in args.rewrite_mode:
+        for workers in worker_counts:
+            results.append(measure(
+                f"process_qs_file[{rewrite_mode},workers={workers}]",
+                lambda: process_qs_file(bundle_path, output_path, replacements, OLD_ACCOUNT_ID, NEW_ACCOUNT_ID,
+                                        rewrite_mode=rewrite_mode, workers=workers),
+                args.repeat, uncompressed))
+
+    print("\nfolderexport.modify_permissions:")
+    folderexport.TEMP_ZIP = bundle_path
+    folderexport.OUTPUT_ZIP = output_path
+    for workers in worker_counts:
+        results.append(measure(f"modify_permissions[workers={workers}]",
+                               lambda: folderexport.modify_permissions(workers) or True, args.repeat, uncompressed))
+
+    print("\nbundletool rewrite (nested zips):")
+    for workers in worker_counts:
+        results.append(measure(
+            f"bundletool_rewrite[workers={workers}]",
+            lambda: bundletool.rewrite_nested_bundle(bundle_path, output_path, dict(replacements, **{"-dev-": "-tst-"}),
+                                                     workers=workers),
+            args.repeat, uncompressed))
+
+    print(f"\nEnd to end against the stubbed API (latency {args.api_latency}s, jobs {args.job_seconds}s):")
+    with serve_directory(work_dir) as base_url:
+        stub = StubQuickSight(f"{base_url}/synthetic.qs", args.api_latency, args.job_seconds)
+        updated_quicksight.get_client = lambda *client_args, **client_kwargs: stub
+        replacements_b64 = base64.b64encode(json.dumps(replacements).encode('utf-8')).decode('ascii')
+
+        def promote(rewrite_mode, workers):
+            bundle = updated_quicksight.export_quicksight_dashboard_and_modify(
+                source_aws_account_id=OLD_ACCOUNT_ID, source_profile_name=None, dashboard_id="benchmark",
+                source_aws_region=REGION, include_all_dependencies=True,
+                output_file_path_base=os.path.join(work_dir, "e2e"), dashboard_replacements_json=replacements_b64,
+                old_account_id=OLD_ACCOUNT_ID, new_account_id=NEW_ACCOUNT_ID, rewrite_mode=rewrite_mode, workers=workers)
+            return bundle and updated_quicksight.import_quicksight_bundle(
+                target_aws_account_id=NEW_ACCOUNT_ID, target_profile=None, target_aws_region=REGION,
+                bundle_file_path=bundle, s3_import_threshold_mb=float('inf'),
+                known_ids=set(replacements) | set(replacements.values()))
+
+        for rewrite_mode in args.rewrite_mode:
+            results.append(measure(f"end_to_end[{rewrite_mode},workers={args.workers}]",
+                                   lambda: promote(rewrite_mode, args.workers), args.repeat))
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(results: list, baseline_path: str):
+    """Prints best times against a results file from an earlier run (e.g. another commit)."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    baseline_best = {result["name"]: result["best_seconds"] for result in baseline.get("results", [])}
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}):")
+    print(f"  {'benchmark':<44} {'baseline':>9} {'current':>9} {'change':>8}")
+    for result in results:
+        previous = baseline_best.get(result["name"])
+        if previous is None:
+            print(f"  {result['name']:<44} {'-':>9} {result['best_seconds']:>9.3f} {'new':>8}")
+            continue
+        change = (result["best_seconds"] - previous) / previous * 100 if previous else 0.0
+        print(f"  {result['name']:<44} {previous:>9.3f} {result['best_seconds']:>9.3f} {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the bundle pipeline on synthetic bundles against a stubbed QuickSight API.")
+    parser.add_argument("--dashboards", type=int, default=200, help="Dashboard members in the synthetic bundle.")
+    parser.add_argument("--visuals-per-dashboard", type=int, default=400, help="Visuals per dashboard definition.")
+    parser.add_argument("--datasets", type=int, default=50, help="Dataset members in the synthetic bundle.")
+    parser.add_argument("--nested-zips", type=int, default=20, help="Nested zip members in the synthetic bundle.")
+    parser.add_argument("--nested-depth", type=int, default=2, help="Nesting depth of each nested zip.")
+    parser.add_argument("--replacement-keys", type=int, default=1000, help="Size of the ID replacement map (padded with IDs that never match).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Process pool size for the parallel runs.")
+    parser.add_argument("--rewrite-mode", choices=["text", "json"], nargs="+", default=["text", "json"])
+    parser.add_argument("--api-latency", type=float, default=0.05, help="Seconds each stubbed API call takes.")
+    parser.add_argument("--job-seconds", type=float, default=0.5, help="Seconds each stubbed export/import job runs.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; best and mean are reported.")
+    parser.add_argument("--output", help="Write the results as JSON to this path, for comparison across commits.")
+    parser.add_argument("--compare", help="Results JSON from an earlier run to compare against.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = run_benchmarks(args, work_dir)
+
+    report = {
+        "version": RESULTS_VERSION,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+from asset_graph import AssetGraph
+
+DEFAULT_BUNDLE_CACHE_MAX_MB = 2048
+CACHE_KEY_VERSION = 1
+
+
+def bundle_cache_key(
+    quicksight_client,
+    aws_account_id: str,
+    aws_region: str,
+    resource_arns: list,
+    include_all_dependencies: bool,
+    log=print
+):
+    """
+    Content address of an export: source account, region, the exported ARNs, the dependency flag and
+    the LastUpdatedTime of every asset that ends up in the bundle (the dependency closure when
+    include_all_dependencies is set). Returns None when any asset has no LastUpdatedTime, since the
+    bundle could then change without the key changing.
+    """
+    graph = AssetGraph(quicksight_client, aws_account_id, log=log).resolve(
+        resource_arns, follow_dependencies=include_all_dependencies)
+    missing = [arn for arn in graph.dependencies if not graph.last_updated.get(arn)]
+    if missing:
+        log(f"Bundle cache disabled for this export: no LastUpdatedTime for {', '.join(missing)}")
+        return None
+    key_material = {
+        "version": CACHE_KEY_VERSION,
+        "account": aws_account_id,
+        "region": aws_region,
+        "resource_arns": sorted(resource_arns),
+        "include_all_dependencies": include_all_dependencies,
+        "last_updated": graph.last_updated,
+    }
+    return hashlib.sha256(json.dumps(key_material, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class BundleCache:
+    """
+    Exported (unmodified) bundles on local disk, one file per cache key, evicted least recently
+    used first once the total size exceeds max_bytes. A hit refreshes the entry's mtime.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_BUNDLE_CACHE_MAX_MB * 1024 * 1024, log=print):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.log = log
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.qs")
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """Copies the cached bundle for key to output_path. Returns False on a miss."""
+        entry_path = self._entry_path(key)
+        with self._lock:
+            if not os.path.exists(entry_path):
+                return False
+            os.utime(entry_path)
+            shutil.copyfile(entry_path, output_path)
+        return True
+
+    def store(self, key: str, bundle_path: str):
+        """Adds a downloaded bundle under key, then evicts down to max_bytes."""
+        partial_path = os.path.join(self.cache_dir, f".{key}.{uuid.uuid4().hex}.partial")
+        try:
+            shutil.copyfile(bundle_path, partial_path)
+            with self._lock:
+                os.replace(partial_path, self._entry_path(key))
+                self._evict()
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".qs"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.log(f"Evicted {os.path.basename(path)} from the bundle cache ({size} bytes)")
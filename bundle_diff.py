@@ -0,0 +1,182 @@
+from bundle_reader import Bundle
+
+ADDED = "ADDED"
+REMOVED = "REMOVED"
+CHANGED = "CHANGED"
+
+# Key paths (lower-cased, dot-separated, list positions left out) that change on every export or
+# publish without the asset changing: the API envelope and timestamps of a member, not the same key
+# names nested anywhere in a definition
+VOLATILE_KEYS = frozenset({
+    "createdtime", "lastupdatedtime", "lastpublishedtime", "lastrefreshtime", "versionnumber",
+    "requestid", "status", "consumedspicecapacityinbytes", "version.createdtime", "version.versionnumber",
+})
+# Keys (lower-cased) identifying the items of a list, so a reordered or inserted item is not reported
+# as every later item changing
+LIST_ITEM_ID_KEYS = ("sheetid", "visualid", "fieldid", "filtergroupid", "filterid", "parameterid",
+                     "identifier", "calculatedfieldid", "columnid", "principal", "key")
+DEFAULT_MAX_PRINTED_PATHS = 10
+
+
+def _child_path(path: str, key) -> str:
+    if isinstance(key, int):
+        return f"{path}[{key}]"
+    return f"{path}.{key}" if path else key
+
+
+def _item_id(item: dict, id_key: str):
+    """(key, ID) of a list item, looked up directly or in a one-key union wrapper such as
+    {"BarChartVisual": {"VisualId": ...}}; None when the item has no string ID under id_key."""
+    candidates = [item]
+    if len(item) == 1 and isinstance(next(iter(item.values())), dict):
+        candidates.append(next(iter(item.values())))
+    for candidate in candidates:
+        for key, value in candidate.items():
+            if isinstance(key, str) and key.lower() == id_key and isinstance(value, str):
+                return key, value
+    return None
+
+
+def _item_ids(items: list):
+    """[(key, ID), ...] when every item is a dict with a unique ID under one of LIST_ITEM_ID_KEYS, else None."""
+    if not items or not all(isinstance(item, dict) for item in items):
+        return None
+    for id_key in LIST_ITEM_ID_KEYS:
+        ids = [_item_id(item, id_key) for item in items]
+        if None not in ids and len({item_id for _, item_id in ids}) == len(ids):
+            return ids
+    return None
+
+
+def _child_key_path(key_path: str, key) -> str:
+    key = key.lower() if isinstance(key, str) else str(key)
+    return f"{key_path}.{key}" if key_path else key
+
+
+def diff_documents(old, new, ignore_keys=VOLATILE_KEYS, path: str = "", changes: list = None,
+                   key_path: str = "") -> list:
+    """
+    Structural differences between two parsed JSON documents, as (kind, path, old value, new value)
+    with kind ADDED, REMOVED or CHANGED. A key is skipped when its key path is in ignore_keys: lower-cased
+    and dot-separated from the document root, without list positions ('version.createdtime').
+    List items that carry an ID (see LIST_ITEM_ID_KEYS) are matched by it, other lists by position.
+    """
+    if changes is None:
+        changes = []
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            child_key_path = _child_key_path(key_path, key)
+            if child_key_path in ignore_keys:
+                continue
+            if key not in new:
+                changes.append((REMOVED, _child_path(path, key), old[key], None))
+            else:
+                diff_documents(old[key], new[key], ignore_keys, _child_path(path, key), changes, child_key_path)
+        for key in new:
+            if key not in old and _child_key_path(key_path, key) not in ignore_keys:
+                changes.append((ADDED, _child_path(path, key), None, new[key]))
+    elif isinstance(old, list) and isinstance(new, list):
+        old_ids, new_ids = _item_ids(old), _item_ids(new)
+        keys = {key.lower() for key, _ in (old_ids or []) + (new_ids or [])}
+        if (old_ids or not old) and (new_ids or not new) and len(keys) == 1:
+            old_items = {item_id: (key, item) for (key, item_id), item in zip(old_ids or [], old)}
+            new_items = {item_id: (key, item) for (key, item_id), item in zip(new_ids or [], new)}
+            for item_id, (key, item) in old_items.items():
+                item_path = f"{path}[{key}={item_id}]"
+                if item_id not in new_items:
+                    changes.append((REMOVED, item_path, item, None))
+                else:
+                    diff_documents(item, new_items[item_id][1], ignore_keys, item_path, changes, key_path)
+            for item_id, (key, item) in new_items.items():
+                if item_id not in old_items:
+                    changes.append((ADDED, f"{path}[{key}={item_id}]", None, item))
+        else:
+            for index, (old_item, new_item) in enumerate(zip(old, new)):
+                diff_documents(old_item, new_item, ignore_keys, _child_path(path, index), changes, key_path)
+            for index in range(len(new), len(old)):
+                changes.append((REMOVED, _child_path(path, index), old[index], None))
+            for index in range(len(old), len(new)):
+                changes.append((ADDED, _child_path(path, index), None, new[index]))
+    elif old != new:
+        changes.append((CHANGED, path, old, new))
+    return changes
+
+
+def _asset_label(member) -> str:
+    return f"{member.asset_type} {member.asset_id}" if member.asset_type else member.name
+
+
+def diff_bundles(old_path: str, new_path: str, ignore_keys=VOLATILE_KEYS) -> dict:
+    """
+    Compares two bundles, e.g. the last promoted one and a new export. Members with the same name,
+    CRC and size are taken as unchanged from the zip central directories alone; only the others
+    are read, parsed and diffed with diff_documents. Returns {"members", "unchanged",
+    "volatile_only", "assets"}, where assets lists one dict per added, removed or changed member:
+    member, asset (e.g. 'dashboard <id>'), status and changes (diff_documents tuples; empty for
+    added, removed and non-JSON members).
+    """
+    ignore_keys = frozenset(key.lower() for key in ignore_keys)
+    result = {"members": 0, "unchanged": 0, "volatile_only": 0, "assets": []}
+    with Bundle(old_path) as old_bundle, Bundle(new_path) as new_bundle:
+        names = [member.name for member in old_bundle.members]
+        names += [member.name for member in new_bundle.members if member.name not in old_bundle]
+        result["members"] = len(names)
+        for name in sorted(names):
+            if name not in new_bundle:
+                result["assets"].append({"member": name, "asset": _asset_label(old_bundle.member(name)),
+                                         "status": REMOVED, "changes": []})
+                continue
+            new_member = new_bundle.member(name)
+            if name not in old_bundle:
+                result["assets"].append({"member": name, "asset": _asset_label(new_member),
+                                         "status": ADDED, "changes": []})
+                continue
+            old_member = old_bundle.member(name)
+            if (old_member.crc, old_member.size) == (new_member.crc, new_member.size):
+                result["unchanged"] += 1
+                continue
+            # Non-JSON or unparsable members can only be reported as differing
+            changes = []
+            if name.endswith(".json"):
+                try:
+                    changes = diff_documents(old_bundle.document(name), new_bundle.document(name), ignore_keys)
+                    if not changes:
+                        result["volatile_only"] += 1
+                        continue
+                except (ValueError, UnicodeDecodeError):
+                    pass
+                finally:
+                    old_bundle.forget(name)
+                    new_bundle.forget(name)
+            result["assets"].append({"member": name, "asset": _asset_label(new_member),
+                                     "status": CHANGED, "changes": changes})
+    return result
+
+
+def _short(value, limit: int = 60) -> str:
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def format_bundle_diff(result: dict, max_paths: int = DEFAULT_MAX_PRINTED_PATHS) -> list:
+    """The diff as printable lines: one line per asset, then up to max_paths changed paths under it."""
+    lines = []
+    for asset in result["assets"]:
+        summary = f"{asset['status']:<8} {asset['asset']}"
+        if asset["status"] == CHANGED:
+            summary += f" ({len(asset['changes'])} changes)" if asset["changes"] else " (content differs)"
+        lines.append(summary)
+        for kind, path, old_value, new_value in asset["changes"][:max_paths]:
+            if kind == CHANGED:
+                lines.append(f"    ~ {path}: {_short(old_value)} -> {_short(new_value)}")
+            elif kind == ADDED:
+                lines.append(f"    + {path}: {_short(new_value)}")
+            else:
+                lines.append(f"    - {path}: {_short(old_value)}")
+        if len(asset["changes"]) > max_paths:
+            lines.append(f"    ... and {len(asset['changes']) - max_paths} more.")
+    counts = {status: sum(1 for asset in result["assets"] if asset["status"] == status) for status in (ADDED, REMOVED, CHANGED)}
+    lines.append(f"{result['members']} members: {counts[CHANGED]} changed, {counts[ADDED]} added, "
+                 f"{counts[REMOVED]} removed, {result['unchanged']} unchanged, "
+                 f"{result['volatile_only']} with only volatile, ordering or formatting changes")
+    return lines
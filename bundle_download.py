@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import re
+import time
+
+import urllib3
+
+import run_report
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_RESUMES = 5
+# A stalled transfer is treated like a dropped one and resumed
+DEFAULT_TIMEOUT = urllib3.Timeout(connect=10.0, read=60.0)
+# Transport failures worth resuming from the last written byte; an unexpected HTTP status is not one
+RESUMABLE_ERRORS = (
+    urllib3.exceptions.ProtocolError,
+    urllib3.exceptions.ReadTimeoutError,
+    urllib3.exceptions.ConnectTimeoutError,
+    urllib3.exceptions.NewConnectionError,
+)
+
+_CONTENT_RANGE_TOTAL = re.compile(r"bytes \d+-\d+/(\d+)")
+_PLAIN_MD5_ETAG = re.compile(r'^"?([0-9a-f]{32})"?$')
+
+
+class DownloadIntegrityError(Exception):
+    """The downloaded bytes do not match the size or checksum the server announced."""
+
+
+def download_bundle(
+    download_url: str,
+    output_path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_resumes: int = DEFAULT_MAX_RESUMES,
+    expected_sha256: str = None,
+    http: urllib3.PoolManager = None
+) -> dict:
+    """
+    Streams a presigned bundle URL to output_path with memory bounded by chunk_size.
+
+    When the transfer drops, it resumes with an HTTP Range request from the last written byte,
+    up to max_resumes times. SHA-256 and MD5 are computed while streaming. The size is checked
+    against Content-Length, and the MD5 against a single-part S3 ETag when there is one. The
+    SHA-256 is checked against expected_sha256 when given.
+    Returns metrics: bytes, seconds, mb_per_second, resumes, sha256.
+    """
+    with run_report.span("download") as record:
+        metrics = _download_bundle(download_url, output_path, chunk_size, max_resumes, expected_sha256, http)
+        record.update(bytes=metrics["bytes"], resumes=metrics["resumes"])
+    return metrics
+
+
+def _download_bundle(download_url: str, output_path: str, chunk_size: int, max_resumes: int,
+                     expected_sha256: str, http: urllib3.PoolManager) -> dict:
+    http = http or urllib3.PoolManager()
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    written = 0
+    total_size = None
+    etag_md5 = None
+    resumes = 0
+    started = time.perf_counter()
+
+    with open(output_path, 'wb') as output_file:
+        while True:
+            headers = {"Range": f"bytes={written}-"} if written else {}
+            response = None
+            try:
+                # Inside the try, so a dropped connection on a resume request is resumed too
+                response = http.request('GET', download_url, headers=headers, preload_content=False,
+                                        retries=False, timeout=DEFAULT_TIMEOUT)
+                if response.status == 206:
+                    match = _CONTENT_RANGE_TOTAL.match(response.headers.get("Content-Range", ""))
+                    if match:
+                        total_size = int(match.group(1))
+                elif response.status == 200:
+                    if written:
+                        # Server ignored the Range header; start over
+                        logger.warning("Server does not support range requests; restarting download")
+                        output_file.seek(0)
+                        output_file.truncate()
+                        sha256 = hashlib.sha256()
+                        md5 = hashlib.md5()
+                        written = 0
+                    if response.headers.get("Content-Length"):
+                        total_size = int(response.headers["Content-Length"])
+                    etag_match = _PLAIN_MD5_ETAG.match(response.headers.get("ETag", ""))
+                    etag_md5 = etag_match.group(1) if etag_match else None
+                else:
+                    raise urllib3.exceptions.HTTPError(f"Unexpected HTTP status {response.status} while downloading bundle")
+
+                for chunk in response.stream(chunk_size):
+                    output_file.write(chunk)
+                    sha256.update(chunk)
+                    md5.update(chunk)
+                    written += len(chunk)
+                break
+            except RESUMABLE_ERRORS as e:
+                if resumes >= max_resumes:
+                    raise
+                resumes += 1
+                logger.warning(f"Download interrupted after {written} bytes ({e}); resuming ({resumes}/{max_resumes})")
+            finally:
+                if response is not None:
+                    response.release_conn()
+
+    seconds = time.perf_counter() - started
+    if total_size is not None and written != total_size:
+        raise DownloadIntegrityError(f"Downloaded {written} bytes but the server announced {total_size}")
+    if etag_md5 and md5.hexdigest() != etag_md5:
+        raise DownloadIntegrityError(f"MD5 {md5.hexdigest()} does not match ETag {etag_md5}")
+    if expected_sha256 and sha256.hexdigest() != expected_sha256.lower():
+        raise DownloadIntegrityError(f"SHA-256 {sha256.hexdigest()} does not match expected {expected_sha256}")
+
+    metrics = {
+        "bytes": written,
+        "seconds": seconds,
+        "mb_per_second": (written / (1024 * 1024)) / seconds if seconds > 0 else 0.0,
+        "resumes": resumes,
+        "sha256": sha256.hexdigest(),
+    }
+    logger.info(f"Downloaded {written} bytes in {seconds:.2f}s ({metrics['mb_per_second']:.2f} MB/s, "
+                f"{resumes} resumes, sha256 {metrics['sha256']})")
+    return metrics
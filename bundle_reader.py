@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+import zipfile
+
+
+class BundleMember:
+    """One file member of a bundle as listed in the zip central directory."""
+
+    def __init__(self, info: zipfile.ZipInfo):
+        self.info = info
+        self.name = info.filename
+        folder, _, filename = self.name.partition('/')
+        # 'dataset/<id>.json' is asset type 'dataset', asset ID '<id>'; top-level files have no type
+        self.asset_type = folder if filename else None
+        self.asset_id = os.path.splitext(os.path.basename(self.name))[0]
+        self.size = info.file_size
+        self.compressed_size = info.compress_size
+        self.crc = info.CRC
+
+    def __repr__(self):
+        return f"BundleMember({self.name!r}, size={self.size}, crc={self.crc:08x})"
+
+
+class Bundle:
+    """
+    Read-only access to an exported bundle without extracting it.
+
+    Opening a bundle reads only the zip central directory and indexes it: asset type -> asset ID ->
+    member (name, size, CRC). A member's bytes are read on demand and its JSON is parsed on first
+    access and memoized, so rewrite, validation and diff code can share one Bundle instead of each
+    scanning and parsing the whole archive. Safe to read from several threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._zip = zipfile.ZipFile(path, 'r')
+        self._lock = threading.Lock()
+        self._documents = {}
+        self.members = [BundleMember(info) for info in self._zip.infolist() if not info.is_dir()]
+        self._by_name = {member.name: member for member in self.members}
+        self._index = {}
+        for member in self.members:
+            if member.asset_type:
+                self._index.setdefault(member.asset_type, {}).setdefault(member.asset_id, member)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._zip.close()
+
+    @property
+    def zip_file(self) -> zipfile.ZipFile:
+        """The open archive, for raw member copies (see bundle_rewriter.copy_member_raw)."""
+        return self._zip
+
+    def __contains__(self, member_name: str) -> bool:
+        return member_name in self._by_name
+
+    def member(self, member_name: str) -> BundleMember:
+        """Raises KeyError for a name that is not a file member of the bundle."""
+        return self._by_name[member_name]
+
+    def asset_types(self) -> set:
+        """Top-level folders holding at least one member, e.g. {'dashboard', 'dataset'}."""
+        return set(self._index)
+
+    def assets(self, asset_type: str) -> dict:
+        """{asset ID: BundleMember} for one asset type, in archive order; {} if the type is absent."""
+        return dict(self._index.get(asset_type, {}))
+
+    def asset(self, asset_type: str, asset_id: str):
+        """The member holding one asset, or None."""
+        return self._index.get(asset_type, {}).get(asset_id)
+
+    def read(self, member_name: str) -> bytes:
+        return self._zip.read(self._by_name[member_name].info)
+
+    def document(self, member_name: str):
+        """The member's parsed JSON, memoized. Raises ValueError if the member is not valid JSON."""
+        with self._lock:
+            if member_name in self._documents:
+                return self._documents[member_name]
+        document = json.loads(self.read(member_name))
+        with self._lock:
+            return self._documents.setdefault(member_name, document)
+
+    def forget(self, member_name: str = None):
+        """Drops memoized documents (one member, or all) to free memory on large bundles."""
+        with self._lock:
+            if member_name is None:
+                self._documents.clear()
+            else:
+                self._documents.pop(member_name, None)
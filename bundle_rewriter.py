@@ -0,0 +1,594 @@
+import contextlib
+import copy
+import hashlib
+import io
+import json
+import os
+import struct
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import run_report
+from bundle_reader import Bundle
+from id_replacement import ReplacementEngine
+from job_journal import file_sha256
+from json_rewriter import JsonRewriter
+from member_transform import MemberTransform
+
+# Deterministic output (see rewrite_bundle): every member gets the same timestamp, attributes and compression
+DETERMINISTIC_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+DETERMINISTIC_COMPRESS_LEVEL = 6
+DETERMINISTIC_FILE_ATTR = 0o100644 << 16
+DIGEST_SIDECAR_SUFFIX = ".digest.json"
+
+
+# Zip format constants, so raw copies do not depend on zipfile internals that change between Python versions
+LOCAL_FILE_HEADER = struct.Struct("<4s2B4HL2L2H")
+DATA_DESCRIPTOR_FLAG = 0x08
+ZIP64_EXTRA_ID = 0x0001
+
+
+def _raw_copy_supported() -> bool:
+    """
+    Whether ZipFile exposes the writer state write_member_raw appends to. Without it, raw copies
+    fall back to reading and recompressing the member, which gives the same archive content.
+    """
+    try:
+        with zipfile.ZipFile(io.BytesIO(), 'w') as probe:
+            state = ("fp", "filelist", "NameToInfo", "start_dir", "_lock", "_didModify")
+            return all(hasattr(probe, name) for name in state) and hasattr(zipfile.ZipInfo, "FileHeader")
+    except Exception:
+        return False
+
+
+RAW_COPY_SUPPORTED = _raw_copy_supported()
+
+
+def _strip_zip64_extra(extra: bytes) -> bytes:
+    """The extra field without its ZIP64 record; FileHeader adds a fresh one when the sizes need it."""
+    kept = []
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, size = struct.unpack_from("<HH", extra, offset)
+        if header_id != ZIP64_EXTRA_ID:
+            kept.append(extra[offset:offset + 4 + size])
+        offset += 4 + size
+    return b"".join(kept)
+
+
+def read_member_raw(source_zip: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """
+    Reads a member's raw compressed bytes without inflating them.
+    Returns (info, raw_data) ready for write_member_raw, into any number of target archives.
+    Where raw copies are not supported (see RAW_COPY_SUPPORTED), raw_data is the inflated content.
+    """
+    if not RAW_COPY_SUPPORTED:
+        return info, source_zip.read(info)
+
+    source_zip.fp.seek(info.header_offset)
+    fields = LOCAL_FILE_HEADER.unpack(source_zip.fp.read(LOCAL_FILE_HEADER.size))
+    filename_length, extra_length = fields[-2:]
+    source_zip.fp.seek(filename_length + extra_length, os.SEEK_CUR)
+    raw_data = source_zip.fp.read(info.compress_size)
+
+    new_info = copy.copy(info)
+    # CRC and sizes are known up front, so no trailing data descriptor is written.
+    new_info.flag_bits &= ~DATA_DESCRIPTOR_FLAG
+    new_info.extra = _strip_zip64_extra(info.extra)
+    return new_info, raw_data
+
+
+def write_member_raw(target_zip: zipfile.ZipFile, info: zipfile.ZipInfo, raw_data: bytes):
+    """Appends raw compressed bytes read by read_member_raw; only the local header is rewritten."""
+    if not RAW_COPY_SUPPORTED:
+        write_member(target_zip, info, raw_data)
+        return
+
+    new_info = copy.copy(info)
+    zip64 = new_info.file_size > zipfile.ZIP64_LIMIT or new_info.compress_size > zipfile.ZIP64_LIMIT
+
+    # Mirrors what ZipFile.writestr does internally, minus the compressor.
+    with target_zip._lock:
+        new_info.header_offset = target_zip.fp.tell()
+        target_zip._didModify = True
+        target_zip.fp.write(new_info.FileHeader(zip64))
+        target_zip.fp.write(raw_data)
+        target_zip.start_dir = target_zip.fp.tell()
+        target_zip.filelist.append(new_info)
+        target_zip.NameToInfo[new_info.filename] = new_info
+
+
+def copy_member_raw(source_zip: zipfile.ZipFile, target_zip: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """
+    Copies a single member from source_zip to target_zip as raw compressed bytes.
+    The member is never inflated or re-deflated; only its local header is rewritten.
+    """
+    write_member_raw(target_zip, *read_member_raw(source_zip, info))
+
+
+def write_member(target_zip: zipfile.ZipFile, info: zipfile.ZipInfo, data: bytes):
+    """Writes new content for a member, keeping the source member's name, timestamp and compression."""
+    new_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    new_info.compress_type = info.compress_type
+    new_info.external_attr = info.external_attr
+    new_info.create_system = info.create_system
+    new_info.comment = info.comment
+    target_zip.writestr(new_info, data)
+
+
+def update_content_digest(digest, member_name: str, data: bytes):
+    """Adds one member to a bundle content digest: its name and the sha256 of its uncompressed bytes."""
+    digest.update(member_name.encode('utf-8') + b'\0' + hashlib.sha256(data).digest())
+
+
+def write_member_deterministic(target_zip: zipfile.ZipFile, member_name: str, data: bytes, digest=None):
+    """
+    Writes a member whose bytes depend only on its name and content: fixed timestamp, attributes
+    and compression level. digest, a hashlib object, is updated with the name and content.
+    """
+    info = zipfile.ZipInfo(member_name, date_time=DETERMINISTIC_DATE_TIME)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.create_system = 3
+    info.external_attr = DETERMINISTIC_FILE_ATTR
+    target_zip.writestr(info, data, compresslevel=DETERMINISTIC_COMPRESS_LEVEL)
+    if digest is not None:
+        update_content_digest(digest, member_name, data)
+
+
+def archive_members(source_zip: zipfile.ZipFile, deterministic: bool = False) -> list:
+    """The members to write, in archive order; sorted by name and without directory entries when deterministic."""
+    if not deterministic:
+        return source_zip.infolist()
+    return sorted((info for info in source_zip.infolist() if not info.is_dir()), key=lambda info: info.filename)
+
+
+def digest_sidecar_path(bundle_path: str) -> str:
+    return f"{bundle_path}{DIGEST_SIDECAR_SUFFIX}"
+
+
+def write_digest_sidecar(bundle_path: str, content_sha256: str, members: int):
+    """
+    Writes <bundle>.digest.json next to a deterministic bundle: content_sha256 covers member names and
+    uncompressed contents, archive_sha256 the file itself, so reruns and duplicates are cheap to spot.
+    """
+    with open(digest_sidecar_path(bundle_path), 'w', encoding='utf-8') as f:
+        json.dump({"content_sha256": content_sha256, "archive_sha256": file_sha256(bundle_path), "members": members},
+                  f, indent=2, sort_keys=True)
+
+
+def read_digest_sidecar(bundle_path: str):
+    """The digest sidecar of a bundle as a dict, or None when there is none (or it cannot be read)."""
+    try:
+        with open(digest_sidecar_path(bundle_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def remove_digest_sidecar(bundle_path: str):
+    if os.path.exists(digest_sidecar_path(bundle_path)):
+        os.remove(digest_sidecar_path(bundle_path))
+
+
+_worker_transform = None
+
+
+def _init_worker(transform):
+    global _worker_transform
+    _worker_transform = transform
+
+
+def _transform_in_worker(member_name: str, data: bytes):
+    new_data = _worker_transform(member_name, data)
+    if new_data == data:
+        new_data = None
+    worker_stats = _worker_transform.take_stats() if hasattr(_worker_transform, "take_stats") else None
+    return new_data, worker_stats
+
+
+def _write_result(source_zip, target_zip, info, new_data, stats, digest=None, data=None):
+    if digest is not None:
+        # Deterministic output: unchanged members are recompressed too, so their bytes do not depend on the source
+        write_member_deterministic(target_zip, info.filename, new_data if new_data is not None else
+                                   data if data is not None else source_zip.read(info), digest)
+        stats["rewritten" if new_data is not None else "recompressed"] += 1
+    elif new_data is None:
+        copy_member_raw(source_zip, target_zip, info)
+        stats["raw_copied"] += 1
+    else:
+        write_member(target_zip, info, new_data)
+        stats["rewritten"] += 1
+
+
+def _rewrite_members_parallel(source_zip, target_zip, transform, select, workers, stats, digest=None):
+    """
+    Fans selected members out to a process pool and writes results back in archive order.
+    At most workers * 4 members are in flight, which bounds memory for large bundles.
+    """
+    window = workers * 4
+    in_flight = deque()  # (info, future or None for raw copies, data kept for deterministic output), in archive order
+
+    def write_oldest():
+        info, future, data = in_flight.popleft()
+        new_data = None
+        if future is not None:
+            new_data, worker_stats = future.result()
+            if worker_stats is not None:
+                transform.merge_stats(worker_stats)
+        _write_result(source_zip, target_zip, info, new_data, stats, digest, data)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(transform,)) as pool:
+        for info in archive_members(source_zip, digest is not None):
+            stats["members"] += 1
+            if info.is_dir() or (select is not None and not select(info.filename)):
+                in_flight.append((info, None, None))
+            else:
+                stats["read"] += 1
+                data = source_zip.read(info)
+                in_flight.append((info, pool.submit(_transform_in_worker, info.filename, data),
+                                  data if digest is not None else None))
+            while len(in_flight) > window:
+                write_oldest()
+        while in_flight:
+            write_oldest()
+
+
+def rewrite_archive(source_zip: zipfile.ZipFile, target_zip: zipfile.ZipFile, transform, select=None, workers: int = 1,
+                    deterministic: bool = False):
+    """
+    Writes every member of an open source archive into an open target archive (see rewrite_bundle).
+    Works on in-memory archives too. Returns the same counters as rewrite_bundle.
+    """
+    stats = {"members": 0, "read": 0, "rewritten": 0, "raw_copied": 0, "recompressed": 0}
+    digest = hashlib.sha256() if deterministic else None
+    if workers and workers > 1:
+        _rewrite_members_parallel(source_zip, target_zip, transform, select, workers, stats, digest)
+    else:
+        for info in archive_members(source_zip, deterministic):
+            stats["members"] += 1
+            if info.is_dir() or (select is not None and not select(info.filename)):
+                _write_result(source_zip, target_zip, info, None, stats, digest)
+                continue
+
+            data = source_zip.read(info)
+            stats["read"] += 1
+            new_data = transform(info.filename, data)
+            _write_result(source_zip, target_zip, info, None if new_data == data else new_data, stats, digest, data)
+    if deterministic:
+        stats["content_sha256"] = digest.hexdigest()
+    return stats
+
+
+def rewrite_bundle(source_path: str, output_path: str, transform, select=None, workers: int = 1,
+                   deterministic: bool = False):
+    """
+    Streams every member of the source bundle straight into the output bundle.
+
+    select(member_name) decides whether a member needs to be read at all; members it rejects
+    are copied as raw compressed bytes. For selected members, transform(member_name, data)
+    returns the new bytes, or None when the member should be left unchanged (raw copy).
+
+    With workers > 1 the transforms run in a process pool (transform must be picklable, e.g. a
+    MemberTransform) and results are written in archive order, so the output is the same as a
+    serial run.
+
+    With deterministic=True the output bytes depend only on the member names and contents, so
+    identical input gives a byte-identical bundle: members are sorted by name (directory entries
+    dropped) and all written with a fixed timestamp, attributes and compression level, which means
+    unchanged members are recompressed instead of raw copied. A digest sidecar is written next to
+    the output (see write_digest_sidecar), and the counters get content_sha256 and content_unchanged
+    (the previous output's sidecar had the same content digest).
+
+    The output is written next to output_path and moved into place once complete.
+    Returns a dict of counters: members, read, rewritten, raw_copied, recompressed.
+    """
+    partial_output_path = f"{output_path}.partial"
+    previous_digest = read_digest_sidecar(output_path) if deterministic else None
+
+    with run_report.span("rewrite", bundle=os.path.basename(source_path), workers=workers,
+                         bytes=os.path.getsize(source_path)) as record:
+        try:
+            with zipfile.ZipFile(source_path, 'r') as source_zip, \
+                    zipfile.ZipFile(partial_output_path, 'w', zipfile.ZIP_DEFLATED) as target_zip:
+                stats = rewrite_archive(source_zip, target_zip, transform, select, workers, deterministic)
+            os.replace(partial_output_path, output_path)
+        finally:
+            if os.path.exists(partial_output_path):
+                os.remove(partial_output_path)
+        if deterministic:
+            write_digest_sidecar(output_path, stats["content_sha256"], stats["members"])
+            stats["content_unchanged"] = (previous_digest or {}).get("content_sha256") == stats["content_sha256"]
+        else:
+            # A sidecar left by an earlier deterministic run no longer describes this output
+            remove_digest_sidecar(output_path)
+        record.update(stats, bytes_out=os.path.getsize(output_path))
+
+    return stats
+
+
+def rewrite_bundle_fanout(source_path: str, outputs: list, deterministic: bool = False):
+    """
+    Writes several rewritten copies of one source bundle in a single pass over it.
+
+    outputs is a list of (output_path, transform, select) as for rewrite_bundle. Each member is read
+    (and inflated, if any output selects it) once; every output's transform runs on that same data.
+    Writing, which is where members are deflated, happens concurrently with one writer thread per
+    output, each appending to its own archive in archive order. deterministic is as for rewrite_bundle.
+    Returns one dict of counters per output, in the order given.
+    """
+    all_stats = [{"members": 0, "read": 0, "rewritten": 0, "raw_copied": 0, "recompressed": 0} for _ in outputs]
+    digests = [hashlib.sha256() if deterministic else None for _ in outputs]
+    partial_paths = [f"{output_path}.partial" for output_path, _, _ in outputs]
+    window = 16 * len(outputs)
+
+    with run_report.span("rewrite", bundle=os.path.basename(source_path), outputs=len(outputs),
+                         bytes=os.path.getsize(source_path)) as record:
+        try:
+            with contextlib.ExitStack() as stack:
+                source_zip = stack.enter_context(zipfile.ZipFile(source_path, 'r'))
+                target_zips = [stack.enter_context(zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)) for path in partial_paths]
+                writers = [stack.enter_context(ThreadPoolExecutor(max_workers=1)) for _ in outputs]
+                pending = deque()
+
+                for info in archive_members(source_zip, deterministic):
+                    selected = [not info.is_dir() and (select is None or select(info.filename)) for _, _, select in outputs]
+                    data = source_zip.read(info) if any(selected) or deterministic else None
+                    raw = None
+                    for index, (_, transform, _) in enumerate(outputs):
+                        stats = all_stats[index]
+                        stats["members"] += 1
+                        new_data = None
+                        if selected[index]:
+                            stats["read"] += 1
+                            new_data = transform(info.filename, data)
+                            if new_data == data:
+                                new_data = None
+                        if deterministic:
+                            # The digest is updated here, in archive order; the writer only compresses
+                            update_content_digest(digests[index], info.filename, data if new_data is None else new_data)
+                            pending.append(writers[index].submit(write_member_deterministic, target_zips[index],
+                                                                 info.filename, data if new_data is None else new_data))
+                            stats["rewritten" if new_data is not None else "recompressed"] += 1
+                        elif new_data is None:
+                            if raw is None:
+                                raw = read_member_raw(source_zip, info)
+                            pending.append(writers[index].submit(write_member_raw, target_zips[index], *raw))
+                            stats["raw_copied"] += 1
+                        else:
+                            pending.append(writers[index].submit(write_member, target_zips[index], info, new_data))
+                            stats["rewritten"] += 1
+                    while len(pending) > window:
+                        pending.popleft().result()
+                while pending:
+                    pending.popleft().result()
+
+            for (output_path, _, _), partial_path, digest, stats in zip(outputs, partial_paths, digests, all_stats):
+                os.replace(partial_path, output_path)
+                if deterministic:
+                    stats["content_sha256"] = digest.hexdigest()
+                    write_digest_sidecar(output_path, stats["content_sha256"], stats["members"])
+                else:
+                    remove_digest_sidecar(output_path)
+        finally:
+            for partial_path in partial_paths:
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+        record["bytes_out"] = sum(os.path.getsize(output_path) for output_path, _, _ in outputs)
+
+    return all_stats
+
+
+def top_level_folders(source_path: str):
+    """Returns the set of top-level folder names holding members of a bundle, read from the central directory only."""
+    with Bundle(source_path) as bundle:
+        return bundle.asset_types()
+
+
+def split_member_name(member_name: str):
+    """Splits 'folder/file.json' into ('folder', 'file.json'). Nested paths keep their remainder in the file part."""
+    folder, _, filename = member_name.partition('/')
+    return folder, filename
+
+
+class QsTextTransform(MemberTransform):
+    """
+    Text-mode rewrite of a single .qs member: the ID map for 'dashboard' JSON files and the generic
+    Account ID for the data definition folder ('dataset' or 'datasource').
+    """
+
+    def __init__(self, replacement_engine: ReplacementEngine, data_folder_name: str = None):
+        super().__init__(replacement_engine)
+        self.data_folder_name = data_folder_name
+
+    def select(self, member_name: str) -> bool:
+        folder, filename = split_member_name(member_name)
+        if '/' in filename or not filename.endswith(".json"):
+            return False
+        return folder == "dashboard" or folder == self.data_folder_name
+
+    def __call__(self, member_name: str, data: bytes):
+        replacement_engine = self.replacement_engine
+        folder, filename = split_member_name(member_name)
+        try:
+            content_string = data.decode('utf-8')
+        except UnicodeDecodeError as e:
+            self.messages.append(f"  ERROR: An unexpected error occurred while processing {filename}: {e}")
+            return None
+        original_content_string = content_string
+
+        if folder == "dashboard":
+            self.stats["dashboard_scanned"] += 1
+            self.messages.append(f"  Processing dashboard file: {filename}")
+            content_string, file_hits = replacement_engine.replace_ids(content_string)
+            for old_id, hit_count in file_hits.items():
+                self.messages.append(f"    Replaced in dashboard file: '{old_id}' with '{replacement_engine.id_replacements[old_id]}' ({hit_count} occurrences)")
+            if content_string != original_content_string:
+                self.stats["dashboard_replaced"] += 1
+                self.messages.append(f"    Dashboard file {filename} updated with specific replacements.")
+            else:
+                self.messages.append(f"    No specific dashboard replacements made in {filename}.")
+        else:
+            self.stats["data_scanned"] += 1
+            self.messages.append(f"  Processing dataset/datasource file for Account ID: {filename}")
+            content_string, file_hits = replacement_engine.replace_account_id(content_string)
+            for old_id, hit_count in file_hits.items():
+                self.messages.append(f"    Replaced generic Account ID string '{old_id}' with '{replacement_engine.account_replacements[old_id]}' ({hit_count} occurrences).")
+            if content_string != original_content_string:
+                self.stats["data_replaced"] += 1
+            else:
+                self.messages.append(f"    No generic Account ID replacement needed or found in {filename}.")
+
+        if content_string == original_content_string:
+            return None
+        return content_string.encode('utf-8')
+
+
+def print_bundle_stats(stats: dict, indent: str = ""):
+    """Prints the member counters of rewrite_bundle, and the content digest of deterministic output."""
+    if "content_sha256" in stats:
+        print(f"{indent}Bundle members: {stats['members']} total, {stats['rewritten']} rewritten, "
+              f"{stats['recompressed']} recompressed for deterministic output.")
+        unchanged = " (unchanged since the previous output)" if stats.get("content_unchanged") else ""
+        print(f"{indent}Content digest: sha256:{stats['content_sha256']}{unchanged}")
+    else:
+        print(f"{indent}Bundle members: {stats['members']} total, {stats['rewritten']} rewritten, "
+              f"{stats['raw_copied']} copied without recompression.")
+
+
+def process_qs_file(
+    downloaded_qs_path: str,
+    output_modified_qs_path: str,
+    dashboard_replacements_map: dict,  # For specific replacements in 'dashboard' folder
+    p_old_account_id: str,             # Generic Account ID old value for 'dataset' folder
+    p_new_account_id: str,             # Generic Account ID new value for 'dataset' folder
+    replacement_engine: ReplacementEngine = None,  # Prebuilt engine; built from the map and account IDs when omitted
+    rewrite_mode: str = "text",        # 'text' for raw string replacement, 'json' for structure-aware rewriting
+    workers: int = 1,                  # >1 rewrites members in a process pool of this size
+    deterministic: bool = False        # Byte-reproducible output with a digest sidecar (see rewrite_bundle)
+):
+    """
+    Rewrites a .qs file member by member, straight from the downloaded archive into the modified one.
+    Modifications include:
+    1. Specific string replacements in 'dashboard' folder JSON files.
+    2. Global string replacement of generic Account ID in 'dataset'/'datasource' folder JSON files.
+    Members that need no change are copied as raw compressed bytes; nothing is extracted to disk.
+    Each member is rewritten in a single scan by a ReplacementEngine, regardless of the map size.
+
+    With rewrite_mode='json', every JSON member is parsed once and only known ID/ARN paths are
+    rewritten with both the map and the account ID (see json_rewriter.ID_ARN_PATHS).
+    With workers > 1, members are transformed in parallel and written back in archive order.
+    """
+    print(f"\nProcessing downloaded QS file: {downloaded_qs_path}")
+    if replacement_engine is None:
+        replacement_engine = ReplacementEngine(dashboard_replacements_map, p_old_account_id, p_new_account_id)
+
+    final_qs_path = os.path.splitext(output_modified_qs_path)[0] + ".qs"
+
+    try:
+        if rewrite_mode == "json":
+            # --- Structure-aware mode: only indexed ID/ARN paths in each JSON member are touched ---
+            json_rewriter = JsonRewriter(replacement_engine)
+            print(f"\nWriting modified bundle '{final_qs_path}' with structure-aware JSON rewriting...")
+            stats = rewrite_bundle(downloaded_qs_path, final_qs_path, json_rewriter,
+                                   lambda member_name: member_name.endswith(".json"), workers=workers,
+                                   deterministic=deterministic)
+            json_rewriter.print_messages()
+            json_rewriter.print_report()
+            replacement_engine.print_summary()
+            print()
+            print_bundle_stats(stats)
+            print(f"Successfully created modified bundle file: {os.path.abspath(final_qs_path)}")
+            return os.path.abspath(final_qs_path)
+
+        folders = top_level_folders(downloaded_qs_path)
+
+        # --- Stage 1: 'dashboard' folder members get the specific replacements ---
+        if "dashboard" in folders:
+            print("\nProcessing JSON files in 'dashboard' folder.")
+        else:
+            print("\nWarning: 'dashboard' directory not found in the bundle. Skipping specific dashboard replacements.")
+
+        # --- Stage 2: 'dataset' or 'datasource' folder members get the generic Account ID replacement ---
+        data_folder_name = None
+        for folder_name in ["dataset", "datasource"]:
+            if folder_name in folders:
+                data_folder_name = folder_name
+                print(f"\nFound data definition folder for generic Account ID replacement: '{folder_name}'")
+                break
+        if not data_folder_name:
+            print(f"\nWarning: Neither 'dataset' nor 'datasource' directory found for generic Account ID replacements. This is expected if export was run with --no-include-all.")
+
+        transform = QsTextTransform(replacement_engine, data_folder_name)
+
+        # --- Stage 3: Stream every member into the modified bundle ---
+        print(f"\nWriting modified bundle '{final_qs_path}' directly from '{downloaded_qs_path}'...")
+        stats = rewrite_bundle(downloaded_qs_path, final_qs_path, transform, transform.select, workers=workers,
+                               deterministic=deterministic)
+        transform.print_messages()
+        counts = transform.stats
+
+        if "dashboard" in folders:
+            print("\nSummary of 'dashboard' folder modifications:")
+            print(f"  Dashboard JSON files scanned: {counts['dashboard_scanned']}")
+            print(f"  Dashboard files where specific string replacements were made: {counts['dashboard_replaced']}")
+        if data_folder_name:
+            print(f"\nSummary of '{data_folder_name}' folder modifications (Account ID):")
+            if counts["data_scanned"] > 0:
+                print(f"  Files scanned: {counts['data_scanned']}")
+                print(f"  Files where generic Account ID string was replaced: {counts['data_replaced']}")
+            else:
+                print(f"  No JSON files found or processed in '{data_folder_name}'. This is expected if export was run with --no-include-all.")
+        replacement_engine.print_summary()
+        print()
+        print_bundle_stats(stats)
+
+        print(f"Successfully created modified bundle file: {os.path.abspath(final_qs_path)}")
+        return os.path.abspath(final_qs_path)
+    except Exception as e:
+        print(f"An error occurred during QS file processing: {e}")
+        return None
+
+
+def process_qs_file_fanout(
+    downloaded_qs_path: str,
+    targets: list,              # (output_modified_qs_path, ReplacementEngine) per target
+    rewrite_mode: str = "text",
+    deterministic: bool = False
+):
+    """
+    Rewrites one downloaded .qs file for several targets at once (see process_qs_file), each with
+    its own ReplacementEngine. The source is read once and every target bundle is written in the
+    same pass. Returns the absolute output paths in target order, or None on failure.
+    """
+    print(f"\nProcessing downloaded QS file for {len(targets)} targets: {downloaded_qs_path}")
+    final_qs_paths = [os.path.splitext(output_path)[0] + ".qs" for output_path, _ in targets]
+
+    try:
+        if rewrite_mode == "json":
+            transforms = [JsonRewriter(replacement_engine) for _, replacement_engine in targets]
+            selects = [lambda member_name: member_name.endswith(".json")] * len(targets)
+        else:
+            folders = top_level_folders(downloaded_qs_path)
+            data_folder_name = next((name for name in ["dataset", "datasource"] if name in folders), None)
+            transforms = [QsTextTransform(replacement_engine, data_folder_name) for _, replacement_engine in targets]
+            selects = [transform.select for transform in transforms]
+
+        all_stats = rewrite_bundle_fanout(downloaded_qs_path, list(zip(final_qs_paths, transforms, selects)),
+                                          deterministic)
+
+        for final_qs_path, transform, stats in zip(final_qs_paths, transforms, all_stats):
+            print(f"\nTarget bundle {os.path.abspath(final_qs_path)}:")
+            transform.print_messages()
+            if rewrite_mode == "json":
+                transform.print_report()
+            else:
+                counts = transform.stats
+                print(f"  Dashboard files with specific replacements: {counts['dashboard_replaced']}/{counts['dashboard_scanned']}")
+                print(f"  Data definition files with Account ID replaced: {counts['data_replaced']}/{counts['data_scanned']}")
+            transform.replacement_engine.print_summary()
+            print_bundle_stats(stats, indent="  ")
+        return [os.path.abspath(final_qs_path) for final_qs_path in final_qs_paths]
+    except Exception as e:
+        print(f"An error occurred during fan-out QS file processing: {e}")
+        return None
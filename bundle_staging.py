@@ -0,0 +1,95 @@
+import math
+import os
+import time
+import uuid
+
+from boto3.s3.transfer import TransferConfig
+
+import run_report
+
+# StartAssetBundleImportJob rejects an inline Body larger than this; bigger bundles must come from S3
+DEFAULT_S3_IMPORT_THRESHOLD_MB = 20
+DEFAULT_STAGING_PREFIX = "quicksight-bundles/"
+DEFAULT_PART_SIZE = 16 * 1024 * 1024
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+def staging_key(bundle_path: str, staging_prefix: str = DEFAULT_STAGING_PREFIX) -> str:
+    """A unique object key for one staged upload of bundle_path."""
+    return f"{staging_prefix}{uuid.uuid4()}/{os.path.basename(bundle_path)}"
+
+
+def stage_bundle(
+    s3_client,
+    bundle_path: str,
+    bucket: str,
+    key: str,
+    part_size: int = DEFAULT_PART_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+) -> dict:
+    """
+    Streams bundle_path to s3://bucket/key as a multipart upload with up to max_concurrency parts in
+    flight. The file is read part by part, never held in memory whole.
+    Returns metrics: s3_uri, bytes, parts, seconds, mb_per_second.
+    """
+    size = os.path.getsize(bundle_path)
+    parts = max(1, math.ceil(size / part_size))
+    config = TransferConfig(multipart_threshold=part_size, multipart_chunksize=part_size,
+                            max_concurrency=max_concurrency, use_threads=True)
+    started = time.perf_counter()
+    with run_report.span("upload", bytes=size, parts=parts):
+        s3_client.upload_file(bundle_path, bucket, key, Config=config)
+    seconds = time.perf_counter() - started
+    return {
+        "s3_uri": f"s3://{bucket}/{key}",
+        "bytes": size,
+        "parts": parts,
+        "seconds": seconds,
+        "mb_per_second": (size / (1024 * 1024)) / seconds if seconds > 0 else 0.0,
+    }
+
+
+def build_import_source(
+    bundle_path: str,
+    s3_client=None,
+    staging_bucket: str = None,
+    staging_prefix: str = DEFAULT_STAGING_PREFIX,
+    s3_import_threshold_mb: float = DEFAULT_S3_IMPORT_THRESHOLD_MB,
+    part_size: int = DEFAULT_PART_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    log=print
+):
+    """
+    Chooses how to hand a bundle to StartAssetBundleImportJob.
+
+    Bundles above s3_import_threshold_mb are staged in staging_bucket and passed as S3Uri; smaller
+    ones (or any bundle when no staging bucket is configured) are sent inline as Body.
+    Returns (AssetBundleImportSource, staged) where staged is (bucket, key) to clean up, or None.
+    """
+    size = os.path.getsize(bundle_path)
+    log(f"Bundle file size: {size / (1024 * 1024):.2f} MB")
+
+    if size > s3_import_threshold_mb * 1024 * 1024:
+        if staging_bucket:
+            key = staging_key(bundle_path, staging_prefix)
+            metrics = stage_bundle(s3_client, bundle_path, staging_bucket, key, part_size, max_concurrency)
+            log(f"Staged bundle at {metrics['s3_uri']} in {metrics['seconds']:.2f}s "
+                f"({metrics['parts']} parts, {metrics['mb_per_second']:.2f} MB/s)")
+            return {'S3Uri': metrics['s3_uri']}, (staging_bucket, key)
+        log(f"Warning: Bundle is larger than {s3_import_threshold_mb} MB and no staging bucket is configured; "
+            f"sending it inline, which the import API may reject. Configure a staging bucket to import via S3.")
+
+    with open(bundle_path, 'rb') as f:
+        return {'Body': f.read()}, None
+
+
+def remove_staged_bundle(s3_client, staged, log=print):
+    """Deletes a staged bundle once the import job no longer needs it. Failures are only logged."""
+    if not staged:
+        return
+    bucket, key = staged
+    try:
+        s3_client.delete_object(Bucket=bucket, Key=key)
+        log(f"Removed staged bundle s3://{bucket}/{key}")
+    except Exception as e:
+        log(f"Warning: Could not remove staged bundle s3://{bucket}/{key}: {e}")
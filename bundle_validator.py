@@ -0,0 +1,223 @@
+import io
+import json
+import os
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import run_report
+from bundle_reader import Bundle
+
+ZIP_MAGIC = b'PK\x03\x04'
+# Findings printed before an import is refused; the rest are only counted
+DEFAULT_MAX_PRINTED_FINDINGS = 50
+
+REFERENCE_ARN_PATTERN = re.compile(r"^arn:aws[\w-]*:quicksight:[\w-]*:\d*:(dataset|datasource)/(.+)$")
+# Keys (lower-cased) that hold the ID of the asset a dataset/datasource member defines
+ASSET_ID_KEYS = {"dataset": "datasetid", "datasource": "datasourceid"}
+
+
+def finding(member_name: str, path: str, check: str, message: str) -> dict:
+    return {"member": member_name, "path": path, "check": check, "message": message}
+
+
+def format_finding(item: dict) -> str:
+    location = f"{item['member']}:{item['path']}" if item["path"] else item["member"]
+    return f"{location}: [{item['check']}] {item['message']}"
+
+
+def _child_path(path: str, key) -> str:
+    if isinstance(key, int):
+        return f"{path}[{key}]"
+    return f"{path}.{key}" if path else key
+
+
+def _lower_keys(node: dict) -> dict:
+    return {key.lower(): value for key, value in node.items() if isinstance(key, str)}
+
+
+def _check_visual_fields(member_name: str, visual: dict, path: str, sheet_id: str, findings: list):
+    """
+    Every FieldId a visual refers to (data bars, sorts, tooltips, conditional formatting, ...) must be
+    declared by a field in the same visual. Every FieldId in the FieldWells is a declaration, whether
+    the field has a Column or an Expression (calculated measures); outside them, only a field with a
+    Column or an Expression is (e.g. the computations of an InsightVisual).
+    """
+    declared = set()
+    references = []
+
+    def walk(node, node_path, in_field_wells):
+        if isinstance(node, dict):
+            lowered = _lower_keys(node)
+            field_id = lowered.get("fieldid")
+            if isinstance(field_id, str):
+                if in_field_wells or "column" in lowered or "expression" in lowered:
+                    declared.add(field_id)
+                else:
+                    references.append((field_id, node_path))
+            for key, value in node.items():
+                walk(value, _child_path(node_path, key),
+                     in_field_wells or (isinstance(key, str) and key.lower() == "fieldwells"))
+        elif isinstance(node, list):
+            for index, value in enumerate(node):
+                walk(value, _child_path(node_path, index), in_field_wells)
+
+    walk(visual, path, False)
+    visual_id = _lower_keys(visual).get("visualid", "?")
+    for field_id, reference_path in references:
+        if field_id not in declared:
+            option = reference_path.rsplit('.', 1)[-1]
+            findings.append(finding(
+                member_name, reference_path, "COLUMN_NOT_FOUND",
+                f"Field id '{field_id}' in {option} not found in field wells "
+                f"(sheet/{sheet_id}/visual/{visual_id}/field/{field_id})"))
+
+
+def _check_visual(member_name: str, node: dict, path: str, sheet_id: str, findings: list):
+    """Checks an item of Sheets[].Visuals[], a one-key union such as {"BarChartVisual": {...}}."""
+    if "visualid" not in _lower_keys(node) and len(node) == 1:
+        key, value = next(iter(node.items()))
+        if isinstance(value, dict):
+            node, path = value, _child_path(path, key)
+    _check_visual_fields(member_name, node, path, sheet_id, findings)
+
+
+def _scan_document(member_name: str, document, findings: list, references: list):
+    """
+    Walks a parsed member once: field checks for the visuals of every sheet (Sheets[].Visuals[]) and
+    dataset/datasource ARN references. list_key is the key of the list a node is an item of, and
+    sheet_list whether that list belongs to a sheet.
+    """
+
+    def walk(node, path, sheet_id, top_level, list_key=None, sheet_list=False):
+        if isinstance(node, dict):
+            lowered = _lower_keys(node)
+            is_sheet = list_key == "sheets"
+            if is_sheet and isinstance(lowered.get("sheetid"), str):
+                sheet_id = lowered["sheetid"]
+            if list_key == "visuals" and sheet_list:
+                _check_visual(member_name, node, path, sheet_id, findings)
+            for key, value in node.items():
+                # The asset's own ARN is not a reference
+                if top_level and isinstance(key, str) and key.lower() == "arn":
+                    continue
+                walk(value, _child_path(path, key), sheet_id, False,
+                     key.lower() if isinstance(key, str) and isinstance(value, list) else None, is_sheet)
+        elif isinstance(node, list):
+            for index, value in enumerate(node):
+                walk(value, _child_path(path, index), sheet_id, False, list_key, sheet_list)
+        elif isinstance(node, str):
+            match = REFERENCE_ARN_PATTERN.match(node)
+            if match:
+                references.append((member_name, match.group(1), match.group(2), path))
+
+    walk(document, "", "?", True)
+
+
+def validate_member(member_name: str, data: bytes) -> dict:
+    """
+    Checks one bundle member (recursing into nested archives). Returns the findings, the assets the
+    member defines as (type, id), and its dataset/datasource references as (member, type, id, path).
+    """
+    result = {"members": 1, "findings": [], "provides": [], "references": []}
+    if data.startswith(ZIP_MAGIC):
+        with zipfile.ZipFile(io.BytesIO(data), 'r') as nested_zip:
+            for info in nested_zip.infolist():
+                if info.is_dir():
+                    continue
+                nested = validate_member(f"{member_name}/{info.filename}", nested_zip.read(info))
+                for key in result:
+                    result[key] += nested[key]
+        return result
+    if not member_name.endswith(".json"):
+        return result
+
+    try:
+        document = json.loads(data)
+    except (ValueError, UnicodeDecodeError) as e:
+        result["findings"].append(finding(member_name, "", "INVALID_JSON", f"Member does not parse: {e}"))
+        return result
+
+    folder = os.path.basename(os.path.dirname(member_name))
+    if folder in ASSET_ID_KEYS and isinstance(document, dict):
+        asset_id = _lower_keys(document).get(ASSET_ID_KEYS[folder]) or os.path.splitext(os.path.basename(member_name))[0]
+        result["provides"].append((folder, asset_id))
+    _scan_document(member_name, document, result["findings"], result["references"])
+    return result
+
+
+def _member_results(bundle: Bundle, workers: int):
+    """Yields validate_member results for every file member, in archive order."""
+    if not workers or workers <= 1:
+        for member in bundle.members:
+            yield validate_member(member.name, bundle.read(member.name))
+        return
+
+    # At most workers * 4 members are in flight, which bounds memory for large bundles
+    window = workers * 4
+    in_flight = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for member in bundle.members:
+            in_flight.append(pool.submit(validate_member, member.name, bundle.read(member.name)))
+            while len(in_flight) > window:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def validate_bundle(bundle_path: str, known_ids=None, check_references: bool = True, workers: int = 1) -> list:
+    """
+    Checks a bundle locally before it is imported, with members checked in a process pool of
+    `workers` processes:
+    - every JSON member parses (INVALID_JSON)
+    - field IDs referenced in visual options exist in that visual's field wells (COLUMN_NOT_FOUND)
+    - every referenced dataset/datasource resolves to a member of the bundle or to one of
+      known_ids, e.g. the IDs of a promotion map (UNRESOLVED_REFERENCE); skipped when
+      check_references is False, for bundles exported without their dependencies.
+    Returns the findings in archive order, each with the member and the JSON path concerned.
+    """
+    known_ids = set(known_ids or ())
+    findings = []
+    provided = set()
+    references = []
+    with run_report.span("validate", bundle=os.path.basename(bundle_path), workers=workers) as record, \
+            Bundle(bundle_path) as bundle:
+        members = 0
+        for result in _member_results(bundle, workers):
+            members += result["members"]
+            findings.extend(result["findings"])
+            provided.update(result["provides"])
+            references.extend(result["references"])
+
+        if check_references:
+            provided_ids = {asset_id for _, asset_id in provided}
+            seen = set()
+            for member_name, asset_type, asset_id, path in references:
+                if asset_id in provided_ids or asset_id in known_ids or (member_name, asset_id) in seen:
+                    continue
+                seen.add((member_name, asset_id))
+                findings.append(finding(member_name, path, "UNRESOLVED_REFERENCE",
+                                        f"{asset_type} '{asset_id}' is neither in the bundle nor in the promotion map"))
+        record.update(members=members, findings=len(findings))
+    return findings
+
+
+def validate_before_import(bundle_path: str, known_ids=None, check_references: bool = True, workers: int = 1,
+                           max_printed: int = DEFAULT_MAX_PRINTED_FINDINGS, log=print) -> bool:
+    """Runs validate_bundle and logs the outcome. Returns False when the import should not be started."""
+    log(f"Validating bundle {bundle_path} before import...")
+    try:
+        findings = validate_bundle(bundle_path, known_ids, check_references, workers)
+    except (OSError, zipfile.BadZipFile) as e:
+        log(f"Error: Bundle could not be validated: {e}")
+        return False
+    if not findings:
+        log("Bundle validation passed.")
+        return True
+    log(f"Error: Bundle validation found {len(findings)} problems; the import would fail or roll back:")
+    for item in findings[:max_printed]:
+        log(f"  - {format_finding(item)}")
+    if len(findings) > max_printed:
+        log(f"  ... and {len(findings) - max_printed} more.")
+    return False
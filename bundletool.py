@@ -0,0 +1,302 @@
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import zipfile
+
+from bundle_diff import DEFAULT_MAX_PRINTED_PATHS, VOLATILE_KEYS, diff_bundles, format_bundle_diff
+from bundle_rewriter import rewrite_archive, rewrite_bundle
+from bundle_validator import format_finding, validate_bundle
+from id_replacement import ReplacementEngine
+from import_overrides import generate_import_overrides
+from promotion_map import DEFAULT_COMPILED_MAP_DIR, PromotionMapError, load_promotion_map
+from member_transform import MemberTransform
+import run_report
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ZIP_MAGIC = b'PK\x03\x04'
+DEFAULT_MAX_NESTING_DEPTH = 16
+
+
+def is_text(data: bytes) -> bool:
+    """Same decision the `file | grep text` check made: no NUL bytes and valid UTF-8."""
+    if b'\x00' in data:
+        return False
+    try:
+        data.decode('utf-8')
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def is_nested_archive(data: bytes) -> bool:
+    return data[:4] == ZIP_MAGIC and zipfile.is_zipfile(io.BytesIO(data))
+
+
+def fix_custom_sql_datasources(document, datasource_replacements: dict) -> int:
+    """
+    Points CustomSql tables in a dataset definition at a different data source, for datasets whose
+    source cannot be used with SQL (formerly fix_datasource.py). Returns the number of tables changed.
+    """
+    if not isinstance(document, dict) or not isinstance(document.get('DataSetConfiguration'), dict):
+        return 0
+    fixed = 0
+    for table_def in document['DataSetConfiguration'].get('PhysicalTableMap', {}).values():
+        custom_sql = table_def.get('CustomSql') if isinstance(table_def, dict) else None
+        if not custom_sql or 'DataSourceArn' not in custom_sql:
+            continue
+        for old_id, new_id in datasource_replacements.items():
+            if old_id in custom_sql['DataSourceArn']:
+                custom_sql['DataSourceArn'] = custom_sql['DataSourceArn'].replace(old_id, new_id)
+                fixed += 1
+    return fixed
+
+
+class NestedBundleRewriter(MemberTransform):
+    """
+    Applies the promotion rules to every member of a bundle, recursing into nested zips to any depth.
+
+    Text members get the CustomSql data source fix (JSON only) and then the string replacements.
+    Nested archives are rewritten in memory and written once into their parent; an archive in which
+    nothing changed is returned as None, so it is copied through byte-identical. Binary members are
+    left alone.
+    """
+
+    def __init__(self, replacement_engine: ReplacementEngine, datasource_replacements: dict = None,
+                 max_depth: int = DEFAULT_MAX_NESTING_DEPTH, deterministic: bool = False):
+        super().__init__(replacement_engine)
+        self.datasource_replacements = datasource_replacements or {}
+        self.max_depth = max_depth
+        self.deterministic = deterministic
+
+    def _rewrite_text(self, member_name: str, data: bytes):
+        self.stats["text_members"] += 1
+        new_data = data
+        if self.datasource_replacements and member_name.endswith('.json'):
+            try:
+                document = json.loads(data)
+            except ValueError as e:
+                logger.warning(f"Skipping data source fix for {member_name}: {e}")
+            else:
+                fixed = fix_custom_sql_datasources(document, self.datasource_replacements)
+                if fixed:
+                    self.stats["datasource_fixes"] += fixed
+                    logger.info(f"Replaced CustomSql data source in {member_name} ({fixed} tables)")
+                    new_data = json.dumps(document, indent=2).encode('utf-8')
+
+        text, file_hits = self.replacement_engine.replace_ids(new_data.decode('utf-8'))
+        if file_hits:
+            new_data = text.encode('utf-8')
+        if new_data == data:
+            return None
+        self.stats["text_rewritten"] += 1
+        return new_data
+
+    def _rewrite_nested(self, member_name: str, data: bytes, depth: int):
+        if depth > self.max_depth:
+            raise ValueError(f"{member_name} nests archives deeper than {self.max_depth} levels")
+        self.stats["nested_archives"] += 1
+        logger.info(f"Processing nested zip file: {member_name}")
+
+        output = io.BytesIO()
+        with zipfile.ZipFile(io.BytesIO(data), 'r') as source_zip, \
+                zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as target_zip:
+            stats = rewrite_archive(
+                source_zip, target_zip,
+                lambda nested_name, nested_data: self._rewrite_member(f"{member_name}/{nested_name}", nested_data, depth + 1),
+                deterministic=self.deterministic
+            )
+        if not stats["rewritten"]:
+            return None
+        self.stats["nested_rewritten"] += 1
+        return output.getvalue()
+
+    def _rewrite_member(self, member_name: str, data: bytes, depth: int):
+        self.stats["members"] += 1
+        if is_nested_archive(data):
+            return self._rewrite_nested(member_name, data, depth)
+        if is_text(data):
+            return self._rewrite_text(member_name, data)
+        self.stats["binary_members"] += 1
+        return None
+
+    def __call__(self, member_name: str, data: bytes):
+        return self._rewrite_member(member_name, data, 1)
+
+
+def rewrite_nested_bundle(bundle_path: str, output_path: str, replacements: dict,
+                          datasource_replacements: dict = None, workers: int = 1,
+                          replacement_engine: ReplacementEngine = None, deterministic: bool = False) -> dict:
+    """
+    Rewrites a bundle and all archives nested in it in one pass. output_path may equal bundle_path.
+    A prebuilt replacement_engine (e.g. from a promotion map) takes the place of replacements.
+    With deterministic, the bundle and every rewritten nested archive are written byte-reproducibly.
+    """
+    if replacement_engine is None:
+        replacement_engine = ReplacementEngine(replacements)
+    replacements = replacement_engine.id_replacements
+    rewriter = NestedBundleRewriter(replacement_engine, datasource_replacements, deterministic=deterministic)
+    archive_stats = rewrite_bundle(bundle_path, output_path, rewriter, workers=workers, deterministic=deterministic)
+
+    stats = rewriter.stats
+    logger.info(f"Processed {stats['members']} members ({archive_stats['members']} top-level, "
+                f"{stats['nested_archives']} nested archives, {stats['binary_members']} binary)")
+    logger.info(f"Rewrote {stats['text_rewritten']} of {stats['text_members']} text members and "
+                f"{stats['nested_rewritten']} nested archives; {stats['datasource_fixes']} CustomSql data source fixes")
+    for old_value, hit_count in rewriter.replacement_engine.hit_counts.items():
+        logger.info(f"  '{old_value}' -> '{replacements[old_value]}': {hit_count} occurrences")
+    if deterministic:
+        logger.info(f"Content digest: sha256:{archive_stats['content_sha256']}")
+    return stats
+
+
+def replacement_pair(value: str):
+    """Parses OLD=NEW. Values starting with '-' must be passed as --replace=-old-=-new-."""
+    old_value, separator, new_value = value.partition('=')
+    if not separator or not old_value:
+        raise argparse.ArgumentTypeError(f"expected OLD=NEW, got '{value}'")
+    return old_value, new_value
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Offline tools for QuickSight asset bundles')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    rewrite_parser = subparsers.add_parser(
+        'rewrite', help='Apply replacement rules to a bundle and every zip nested in it')
+    rewrite_parser.add_argument('bundle', help='Bundle zip file to rewrite')
+    rewrite_parser.add_argument('--output', help='Output zip file path (default: rewrite the bundle in place)')
+    rules = rewrite_parser.add_mutually_exclusive_group()
+    rules.add_argument('--replace', type=replacement_pair, action='append', default=[], metavar='OLD=NEW',
+                       help='Replace OLD with NEW in every text member; may be repeated')
+    rules.add_argument('--promotion-map', help='Promotion-map file with the replacement rules (see promotion_map.py)')
+    rewrite_parser.add_argument('--custom-sql-datasource', type=replacement_pair, action='append', default=[],
+                                metavar='OLD_ID=NEW_ID',
+                                help='Point dataset CustomSql tables using data source OLD_ID at NEW_ID; may be repeated')
+    rewrite_parser.add_argument('--workers', type=int, default=1,
+                                help='Rewrite top-level members in a process pool of this size (1 = serial)')
+    rewrite_parser.add_argument('--deterministic', action='store_true',
+                                help='Write a byte-reproducible bundle (sorted members, fixed timestamps and '
+                                     'compression) with a <output>.digest.json content digest sidecar')
+
+    validate_parser = subparsers.add_parser(
+        'validate', help='Check a bundle for problems that would make its import fail, before uploading it')
+    validate_parser.add_argument('bundle', help='Bundle zip file to check')
+    validate_parser.add_argument('--promotion-map', help='Promotion map whose IDs count as resolvable references')
+    validate_parser.add_argument('--known-id', action='append', default=[],
+                                 help='Dataset or data source ID that exists in the target account; may be repeated')
+    validate_parser.add_argument('--no-reference-check', action='store_false', dest='check_references',
+                                 help='Do not require referenced datasets/data sources to be in the bundle '
+                                      '(bundles exported without dependencies)')
+    validate_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                                 help='Check members in a process pool of this size (default: CPU count)')
+
+    compile_parser = subparsers.add_parser(
+        'compile-map', help='Validate promotion-map files and cache their compiled matchers')
+    compile_parser.add_argument('maps', nargs='+', help='Promotion-map JSON files')
+    compile_parser.add_argument('--cache-dir', default=DEFAULT_COMPILED_MAP_DIR,
+                                help='Directory for compiled maps (default: %(default)s)')
+
+    overrides_parser = subparsers.add_parser(
+        'overrides', help='Print the import overrides that apply a promotion map without rewriting the bundle')
+    overrides_parser.add_argument('bundle', help='Bundle zip file to import unchanged')
+    overrides_parser.add_argument('--promotion-map', required=True, help='Promotion-map file to express as overrides')
+    overrides_parser.add_argument('--output', help='Write the overrides JSON here (default: standard output)')
+
+    diff_parser = subparsers.add_parser(
+        'diff', help='Summarize what changed per asset between two bundles; exits 1 when they differ')
+    diff_parser.add_argument('old_bundle', help='Bundle to compare against, e.g. the last promoted one')
+    diff_parser.add_argument('new_bundle', help='Bundle to compare, e.g. a new export')
+    diff_parser.add_argument('--ignore-key', action='append', default=[],
+                             help='Also ignore this key path, dot-separated from the member root without '
+                                  'list positions (e.g. version.status); may be repeated '
+                                  f'(always ignored: {", ".join(sorted(VOLATILE_KEYS))})')
+    diff_parser.add_argument('--max-paths', type=int, default=DEFAULT_MAX_PRINTED_PATHS,
+                             help='Changed paths printed per asset (default: %(default)s)')
+    diff_parser.add_argument('--output', help='Also write the full diff as JSON to this path')
+
+    for subparser in (rewrite_parser, validate_parser, diff_parser):
+        subparser.add_argument('--report', help='Write a JSON run report with a timing span per stage to this path')
+        subparser.add_argument('--metrics', help='Write the per-stage totals in OpenMetrics text format to this path')
+
+    return parser.parse_args()
+
+
+def main():
+    """Main execution function"""
+    args = parse_arguments()
+    run_report.write_on_exit(getattr(args, 'report', None), getattr(args, 'metrics', None), log=logger.info)
+    try:
+        if args.command == 'rewrite':
+            replacement_engine = None
+            datasource_replacements = dict(args.custom_sql_datasource)
+            if args.promotion_map:
+                promotion_map = load_promotion_map(args.promotion_map, log=logger.warning)
+                logger.info(f"Using {promotion_map.describe()}")
+                replacement_engine = promotion_map.bundle_replacement_engine()
+                datasource_replacements = {**promotion_map.custom_sql_datasources, **datasource_replacements}
+            rewrite_nested_bundle(args.bundle, args.output or args.bundle, dict(args.replace),
+                                  datasource_replacements, workers=args.workers,
+                                  replacement_engine=replacement_engine, deterministic=args.deterministic)
+        elif args.command == 'validate':
+            known_ids = set(args.known_id)
+            if args.promotion_map:
+                known_ids.update(load_promotion_map(args.promotion_map, log=logger.warning).asset_ids)
+            findings = validate_bundle(args.bundle, known_ids, args.check_references, workers=args.workers)
+            for item in findings:
+                logger.error(format_finding(item))
+            if findings:
+                logger.error(f"{args.bundle}: {len(findings)} problems found")
+                sys.exit(1)
+            logger.info(f"{args.bundle}: no problems found")
+        elif args.command == 'overrides':
+            promotion_map = load_promotion_map(args.promotion_map, log=logger.warning)
+            overrides, findings = generate_import_overrides(args.bundle, promotion_map)
+            for item in findings:
+                logger.error(format_finding(item))
+            if findings:
+                logger.error(f"{args.bundle}: {len(findings)} changes cannot be made through import overrides; "
+                             "rewrite the bundle instead")
+                sys.exit(1)
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    json.dump(overrides, f, indent=2)
+                logger.info(f"Import overrides written to {args.output}")
+            else:
+                print(json.dumps(overrides, indent=2))
+        elif args.command == 'diff':
+            with run_report.span("diff", old_bundle=os.path.basename(args.old_bundle),
+                                 new_bundle=os.path.basename(args.new_bundle)):
+                result = diff_bundles(args.old_bundle, args.new_bundle, VOLATILE_KEYS | set(args.ignore_key))
+            for line in format_bundle_diff(result, args.max_paths):
+                print(line)
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    json.dump(result, f, indent=2, default=str)
+                logger.info(f"Full diff written to {args.output}")
+            if result["assets"]:
+                sys.exit(1)
+        elif args.command == 'compile-map':
+            failed = False
+            for map_path in args.maps:
+                try:
+                    promotion_map = load_promotion_map(map_path, args.cache_dir, log=logger.warning)
+                    logger.info(f"{map_path}: {promotion_map.describe()}")
+                except PromotionMapError as e:
+                    logger.error(f"Invalid {e}")
+                    failed = True
+            if failed:
+                sys.exit(1)
+    except Exception as e:
+        logger.error(f"Process failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
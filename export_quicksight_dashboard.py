@@ -1,15 +1,18 @@
-import boto3
-import time
 import uuid
 import requests
 import argparse
 import os
-import zipfile
-import json
-import tempfile
-import shutil
 import sys # Required for sys.argv check in import_quicksight_bundle
 
+from aws_clients import get_client
+import run_report
+from bundle_rewriter import process_qs_file
+from job_waiter import DEFAULT_JOB_TIMEOUT_SECONDS, PENDING_IMPORT_JOB_STATUSES, JobWaiter
+from bundle_validator import validate_before_import
+from bundle_staging import DEFAULT_S3_IMPORT_THRESHOLD_MB, DEFAULT_STAGING_PREFIX, build_import_source, remove_staged_bundle
+from id_replacement import ReplacementEngine
+from promotion_map import PromotionMapError, load_promotion_map
+
 # --- Configuration for Content Modifications ---
 
 # 1. Specific DEV to QA Dataset ID replacements within JSON files in the 'dashboard' folder
@@ -29,144 +32,6 @@ NEW_ACCOUNT_ID_FOR_REPLACEMENT = "470822489488"
 
 # --- End of Configuration ---
 
-def process_qs_file(
-    downloaded_qs_path: str,
-    output_modified_qs_path: str,
-    dashboard_replacements_map: dict,          # For specific replacements in 'dashboard' folder
-    p_old_account_id: str,                     # Generic Account ID old value for 'dataset' folder
-    p_new_account_id: str                      # Generic Account ID new value for 'dataset' folder
-):
-    """
-    Unzips a .qs file, modifies specified content in JSON files, and zips it back.
-    Modifications include:
-    1. Specific string replacements in 'dashboard' folder JSON files.
-    2. Global string replacement of generic Account ID in 'dataset'/'datasource' folder JSON files.
-    """
-    print(f"\nProcessing downloaded QS file: {downloaded_qs_path}")
-    temp_extract_dir = tempfile.mkdtemp()
-    print(f"Created temporary directory for unzipping: {temp_extract_dir}")
-
-    try:
-        print(f"Unzipping '{downloaded_qs_path}' to '{temp_extract_dir}'...")
-        with zipfile.ZipFile(downloaded_qs_path, 'r') as zip_ref:
-            zip_ref.extractall(temp_extract_dir)
-        print("Unzipping complete.")
-
-        # --- Stage 1: Process files in 'dashboard' folder for specific replacements ---
-        dashboard_folder_path = os.path.join(temp_extract_dir, "dashboard")
-        dashboard_files_processed_count = 0
-        dashboard_string_replacements_done_count = 0
-
-        if os.path.isdir(dashboard_folder_path):
-            print(f"\nProcessing JSON files in 'dashboard' folder: {dashboard_folder_path}")
-            for filename in os.listdir(dashboard_folder_path):
-                if filename.endswith(".json"):
-                    dashboard_files_processed_count += 1
-                    file_path = os.path.join(dashboard_folder_path, filename)
-                    print(f"  Processing dashboard file: {filename}")
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content_string = f.read()
-                        
-                        original_content_string = content_string
-                        for dev_id, qa_id in dashboard_replacements_map.items():
-                            if dev_id in content_string:
-                                content_string = content_string.replace(dev_id, qa_id)
-                                print(f"    Replaced in dashboard file: '{dev_id}' with '{qa_id}'")
-                        
-                        if content_string != original_content_string:
-                            dashboard_string_replacements_done_count +=1
-                            with open(file_path, 'w', encoding='utf-8') as f:
-                                f.write(content_string)
-                            print(f"    Dashboard file {filename} updated with specific replacements.")
-                        else:
-                            print(f"    No specific dashboard replacements made in {filename}.")
-
-                    except Exception as e:
-                        print(f"  ERROR: An unexpected error occurred while processing dashboard file {filename}: {e}")
-            print("\nSummary of 'dashboard' folder modifications:")
-            print(f"  Dashboard JSON files scanned: {dashboard_files_processed_count}")
-            print(f"  Dashboard files where specific string replacements were made: {dashboard_string_replacements_done_count}")
-        else:
-            print("\nWarning: 'dashboard' directory not found in the bundle. Skipping specific dashboard replacements.")
-
-
-        # --- Stage 2: Process files in 'dataset' or 'datasource' folder for generic Account ID replacement ---
-        possible_data_folders = ["dataset", "datasource"]
-        data_folder_path = None
-        for folder_name in possible_data_folders:
-            current_path = os.path.join(temp_extract_dir, folder_name)
-            if os.path.isdir(current_path):
-                data_folder_path = current_path
-                print(f"\nFound data definition folder for generic Account ID replacement: '{folder_name}' at '{data_folder_path}'")
-                break
-
-        dataset_files_scanned = 0
-        account_id_replaced_in_files_count = 0
-        
-        if data_folder_path:
-            print(f"Scanning for JSON files in '{os.path.basename(data_folder_path)}' folder to perform generic Account ID modifications...")
-            for filename in os.listdir(data_folder_path):
-                if filename.endswith(".json"):
-                    dataset_files_scanned += 1
-                    file_path = os.path.join(data_folder_path, filename)
-                    print(f"  Processing dataset/datasource file for Account ID: {filename}")
-
-                    file_had_account_id_replaced = False
-                    
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            raw_content_string = f.read()
-                        modified_content_string = raw_content_string
-
-                        if p_old_account_id in modified_content_string:
-                            temp_str = modified_content_string.replace(p_old_account_id, p_new_account_id)
-                            if temp_str != modified_content_string:
-                                modified_content_string = temp_str
-                                print(f"    Replaced generic Account ID string '{p_old_account_id}' with '{p_new_account_id}'.")
-                                file_had_account_id_replaced = True
-                        
-                        # No need to parse to JSON if only doing string replacement for Account ID
-                        # and not other JSON key specific modifications in this section.
-                        # If other JSON key modifications were needed here, we would parse then dump.
-                        if file_had_account_id_replaced:
-                             with open(file_path, 'w', encoding='utf-8') as f:
-                                f.write(modified_content_string)
-                             account_id_replaced_in_files_count += 1
-
-                    except Exception as e:
-                        print(f"  ERROR: An unexpected error occurred while processing {filename} for Account ID replacement: {e}")
-            
-            print(f"\nSummary of '{os.path.basename(data_folder_path)}' folder modifications (Account ID):")
-            if dataset_files_scanned > 0:
-                print(f"  Files scanned: {dataset_files_scanned}")
-                print(f"  Files where generic Account ID string was replaced: {account_id_replaced_in_files_count}")
-            else:
-                print(f"  No JSON files found or processed in '{os.path.basename(data_folder_path)}'. This is expected if export was run with --no-include-all.")
-        else:
-            print(f"\nWarning: Neither 'dataset' nor 'datasource' directory found for generic Account ID replacements. This is expected if export was run with --no-include-all.")
-
-        # --- Stage 3: Re-zip the bundle ---
-        base_output_name = os.path.splitext(output_modified_qs_path)[0]
-        print(f"\nZipping modified content from '{temp_extract_dir}' to '{output_modified_qs_path}'...")
-        created_zip_file = shutil.make_archive(base_name=base_output_name, format='zip', root_dir=temp_extract_dir)
-        final_qs_path = base_output_name + ".qs"
-        if os.path.exists(final_qs_path) and final_qs_path != created_zip_file:
-            os.remove(final_qs_path)
-        if created_zip_file != final_qs_path:
-            os.rename(created_zip_file, final_qs_path)
-        else:
-             final_qs_path = created_zip_file
-        print(f"Successfully created modified bundle file: {os.path.abspath(final_qs_path)}")
-        return os.path.abspath(final_qs_path)
-    except Exception as e:
-        print(f"An error occurred during QS file processing: {e}")
-        return None
-    finally:
-        if os.path.exists(temp_extract_dir):
-            print(f"Cleaning up temporary directory: {temp_extract_dir}")
-            shutil.rmtree(temp_extract_dir)
-
 def export_quicksight_dashboard_and_modify(
     source_aws_account_id: str,
     source_profile_name: str,
@@ -177,17 +42,18 @@ def export_quicksight_dashboard_and_modify(
     # Pass the modification maps and values
     dashboard_replacements: dict = DASHBOARD_SPECIFIC_REPLACEMENTS,
     old_acct_id: str = OLD_ACCOUNT_ID_TO_REPLACE,
-    new_acct_id: str = NEW_ACCOUNT_ID_FOR_REPLACEMENT
+    new_acct_id: str = NEW_ACCOUNT_ID_FOR_REPLACEMENT,
+    rewrite_mode: str = "text",
+    job_timeout_seconds: float = DEFAULT_JOB_TIMEOUT_SECONDS,
+    workers: int = 1,
+    # Prebuilt engine for the maps above, e.g. from a promotion map
+    replacement_engine: ReplacementEngine = None
 ):
     print(f"Initiating QuickSight dashboard export for Dashboard ID: {dashboard_id} from account {source_aws_account_id} in {source_aws_region}")
     print(f"Include all dependencies: {include_all_dependencies}")
 
     try:
-        session_params = {"region_name": source_aws_region}
-        if source_profile_name:
-            session_params["profile_name"] = source_profile_name
-        session = boto3.Session(**session_params)
-        quicksight_client = session.client('quicksight')
+        quicksight_client = get_client('quicksight', source_aws_region, source_profile_name)
     except Exception as e:
         print(f"Error creating Boto3 session or QuickSight client for source: {e}")
         return None
@@ -206,13 +72,14 @@ def export_quicksight_dashboard_and_modify(
 
     try:
         print(f"\nStarting asset bundle export job (Job ID: {export_job_id})...")
-        start_export_response = quicksight_client.start_asset_bundle_export_job(
-            AwsAccountId=source_aws_account_id,
-            AssetBundleExportJobId=export_job_id,
-            ResourceArns=[dashboard_arn],
-            ExportFormat='QUICKSIGHT_JSON',
-            IncludeAllDependencies=include_all_dependencies,
-        )
+        with run_report.span("export", job_id=export_job_id):
+            start_export_response = quicksight_client.start_asset_bundle_export_job(
+                AwsAccountId=source_aws_account_id,
+                AssetBundleExportJobId=export_job_id,
+                ResourceArns=[dashboard_arn],
+                ExportFormat='QUICKSIGHT_JSON',
+                IncludeAllDependencies=include_all_dependencies,
+            )
         print(f"Export job started successfully. ARN: {start_export_response.get('Arn')}")
     except Exception as e:
         print(f"Error starting asset bundle export job: {e}")
@@ -220,36 +87,26 @@ def export_quicksight_dashboard_and_modify(
 
     print("\nPolling export job status...")
     download_url = None
-    job_status = "UNKNOWN"
-    max_retries = 120
-    retries = 0
-    while retries < max_retries:
-        try:
-            describe_job_response = quicksight_client.describe_asset_bundle_export_job(
-                AwsAccountId=source_aws_account_id, AssetBundleExportJobId=export_job_id)
-            job_status = describe_job_response.get('JobStatus')
-            print(f"Export Job status: {job_status} (Attempt {retries + 1}/{max_retries})")
-            if job_status == 'SUCCESSFUL':
-                download_url = describe_job_response.get('DownloadUrl')
-                print("Export job SUCCEEDED.")
-                break
-            elif job_status in ['FAILED', 'CANCELLED']:
-                print(f"Export job {job_status}.")
-                if 'Errors' in describe_job_response:
-                    print("Errors from export job:")
-                    for error_item in describe_job_response['Errors']: # Renamed to avoid conflict
-                        print(f"  - Type: {error_item.get('Type')}, Message: {error_item.get('Message')}, ARN: {error_item.get('Arn')}")
-                return None
-            retries += 1
-            time.sleep(10)
-        except Exception as e:
-            print(f"Error describing export job status: {e}")
-            time.sleep(10)
-            retries +=1
-            if retries >= max_retries:
-                 print(f"Max retries reached for export job. Last status: {job_status}. Aborting.")
-                 return None
-            continue
+    try:
+        wait_result = JobWaiter(deadline_seconds=job_timeout_seconds).wait(
+            lambda: quicksight_client.describe_asset_bundle_export_job(
+                AwsAccountId=source_aws_account_id, AssetBundleExportJobId=export_job_id),
+            label="Export job")
+    except Exception as e:
+        print(f"Error describing export job status: {e}. Aborting.")
+        return None
+    job_status = wait_result.status
+    describe_job_response = wait_result.response or {}
+    if job_status == 'SUCCESSFUL':
+        download_url = describe_job_response.get('DownloadUrl')
+        print("Export job SUCCEEDED.")
+    elif not wait_result.timed_out:
+        print(f"Export job {job_status}.")
+        if 'Errors' in describe_job_response:
+            print("Errors from export job:")
+            for error_item in describe_job_response['Errors']:
+                print(f"  - Type: {error_item.get('Type')}, Message: {error_item.get('Message')}, ARN: {error_item.get('Arn')}")
+        return None
 
     if not download_url:
         print(f"Export job did not succeed or no download URL was provided. Last status: {job_status}")
@@ -257,11 +114,13 @@ def export_quicksight_dashboard_and_modify(
 
     print(f"\nDownloading dashboard bundle to {os.path.abspath(downloaded_qs_path)}...")
     try:
-        response = requests.get(download_url, stream=True)
-        response.raise_for_status()
-        with open(downloaded_qs_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        with run_report.span("download", bytes=0) as download_span:
+            response = requests.get(download_url, stream=True)
+            response.raise_for_status()
+            with open(downloaded_qs_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    f.write(chunk)
+                    download_span["bytes"] += len(chunk)
         print(f"Dashboard bundle downloaded successfully: {os.path.abspath(downloaded_qs_path)}")
     except Exception as e:
         print(f"Error downloading asset bundle: {e}")
@@ -273,8 +132,11 @@ def export_quicksight_dashboard_and_modify(
         dashboard_replacements,
         # Removed target_dataset_id_json_key_value
         old_acct_id,
-        new_acct_id
+        new_acct_id,
         # Removed p_old_datasource_id, p_new_datasource_id
+        replacement_engine=replacement_engine,
+        rewrite_mode=rewrite_mode,
+        workers=workers
     )
 
     if final_modified_qs_file:
@@ -288,7 +150,18 @@ def import_quicksight_bundle(
     target_aws_account_id: str,
     target_profile: str,
     target_aws_region: str,
-    bundle_file_path: str
+    bundle_file_path: str,
+    job_timeout_seconds: float = DEFAULT_JOB_TIMEOUT_SECONDS,
+    # Bundles larger than s3_import_threshold_mb are staged here and imported via S3Uri
+    staging_bucket: str = None,
+    staging_prefix: str = DEFAULT_STAGING_PREFIX,
+    s3_import_threshold_mb: float = DEFAULT_S3_IMPORT_THRESHOLD_MB,
+    s3_endpoint_url: str = None,
+    # Checked locally before upload (see bundle_validator); known_ids are references that exist in the target
+    validate: bool = True,
+    known_ids=None,
+    check_references: bool = True,
+    validation_workers: int = 1
 ):
     print(f"\nInitiating QuickSight bundle import to target account {target_aws_account_id} in region {target_aws_region}...")
     print(f"Bundle file: {bundle_file_path}")
@@ -301,11 +174,7 @@ def import_quicksight_bundle(
 
 
     try:
-        session_params = {"region_name": target_aws_region}
-        if target_profile:
-            session_params["profile_name"] = target_profile
-        target_session = boto3.Session(**session_params)
-        target_quicksight_client = target_session.client('quicksight')
+        target_quicksight_client = get_client('quicksight', target_aws_region, target_profile)
     except Exception as e:
         print(f"Error creating Boto3 session for target account: {e}")
         return False
@@ -314,84 +183,87 @@ def import_quicksight_bundle(
         print(f"Error: Bundle file not found at path: {bundle_file_path}")
         return False
 
-    try:
-        with open(bundle_file_path, 'rb') as f:
-            bundle_body = f.read()
-
-        file_size_mb = len(bundle_body) / (1024 * 1024)
-        print(f"Bundle file size: {file_size_mb:.2f} MB")
-        if file_size_mb > 40: 
-             print("Warning: Bundle file size is large. AWS API might have limitations for direct upload."
-                   "If import fails, consider using S3 URI based import via AWS Console or an updated script.")
-
-        import_source = {'Body': bundle_body}
-    except Exception as e:
-        print(f"Error reading bundle file '{bundle_file_path}': {e}")
+    if validate and not validate_before_import(bundle_file_path, known_ids, check_references, validation_workers):
         return False
 
-    base_bundle_name = os.path.basename(bundle_file_path).rsplit('.', 1)[0].replace('_modified', '').replace('_original', '')
-    import_job_id = f"import-{base_bundle_name}-{uuid.uuid4()}"
-    print(f"Generated Import Job ID: {import_job_id}")
-
+    staging_s3_client = None
     try:
-        start_import_params = {
-            'AwsAccountId': target_aws_account_id,
-            'AssetBundleImportJobId': import_job_id,
-            'AssetBundleImportSource': import_source
-        }
-
-        start_import_response = target_quicksight_client.start_asset_bundle_import_job(**start_import_params)
-        print(f"Import job started successfully. ARN: {start_import_response.get('Arn')}")
+        if staging_bucket:
+            staging_s3_client = get_client('s3', target_aws_region, target_profile, endpoint_url=s3_endpoint_url)
+        import_source, staged = build_import_source(
+            bundle_file_path,
+            s3_client=staging_s3_client,
+            staging_bucket=staging_bucket,
+            staging_prefix=staging_prefix,
+            s3_import_threshold_mb=s3_import_threshold_mb
+        )
     except Exception as e:
-        print(f"Error starting asset bundle import job: {e}")
+        print(f"Error preparing bundle file '{bundle_file_path}' for import: {e}")
         return False
 
-    print("\nPolling import job status (this may take a few minutes)...")
-    max_retries = 120
-    retries = 0
-    final_status = "UNKNOWN"
+    timed_out = False
+    try:
+        base_bundle_name = os.path.basename(bundle_file_path).rsplit('.', 1)[0].replace('_modified', '').replace('_original', '')
+        import_job_id = f"import-{base_bundle_name}-{uuid.uuid4()}"
+        print(f"Generated Import Job ID: {import_job_id}")
 
-    while retries < max_retries:
         try:
-            describe_job_response = target_quicksight_client.describe_asset_bundle_import_job(
-                AwsAccountId=target_aws_account_id,
-                AssetBundleImportJobId=import_job_id
-            )
-            job_status = describe_job_response.get('JobStatus')
-            final_status = job_status
-            print(f"Import Job status: {job_status} (Attempt {retries + 1}/{max_retries})")
-
-            if job_status == 'SUCCESSFUL':
-                print("Import job SUCCEEDED.")
-                print(f"Imported assets should now be available in account {target_aws_account_id}, region {target_aws_region}.")
-                print("Please verify their functionality, especially data source connections and dataset refresh capabilities.")
-                return True
-            elif job_status in ['FAILED', 'CANCELLED']:
-                print(f"Import job {job_status}.")
-                if 'Errors' in describe_job_response:
-                    print("Errors from import job:")
-                    for error_item in describe_job_response['Errors']: # Renamed to avoid conflict
-                        error_message = f"  - Type: {error_item.get('Type')}, Message: {error_item.get('Message')}"
-                        if 'ViolatedEntities' in error_item and error_item['ViolatedEntities']:
-                             error_message += f", Violated Entities: {error_item.get('ViolatedEntities')}"
-                        print(error_message)
-                        if 'Errors' in error_item and isinstance(error_item['Errors'], list):
-                            for sub_error in error_item['Errors']:
-                                print(f"    - Sub-Type: {sub_error.get('Type')}, Sub-Message: {sub_error.get('Message')}")
-                return False
-            retries += 1
-            time.sleep(10)
+            start_import_params = {
+                'AwsAccountId': target_aws_account_id,
+                'AssetBundleImportJobId': import_job_id,
+                'AssetBundleImportSource': import_source
+            }
+
+            with run_report.span("import", job_id=import_job_id, source=next(iter(import_source)),
+                                 bytes=os.path.getsize(bundle_file_path)):
+                start_import_response = target_quicksight_client.start_asset_bundle_import_job(**start_import_params)
+            print(f"Import job started successfully. ARN: {start_import_response.get('Arn')}")
         except Exception as e:
-            print(f"Error describing asset bundle import job: {e}")
-            time.sleep(10)
-            retries +=1
-            if retries >= max_retries:
-                print(f"Max retries reached. Last import job status: {final_status}. Aborting.")
-                return False
-            continue
+            print(f"Error starting asset bundle import job: {e}")
+            return False
 
-    print(f"Import job did not reach a terminal state after {max_retries} retries. Last status: {final_status}.")
-    return False
+        print("\nPolling import job status (this may take a few minutes)...")
+        try:
+            wait_result = JobWaiter(deadline_seconds=job_timeout_seconds).wait(
+                lambda: target_quicksight_client.describe_asset_bundle_import_job(
+                    AwsAccountId=target_aws_account_id,
+                    AssetBundleImportJobId=import_job_id
+                ),
+                pending_statuses=PENDING_IMPORT_JOB_STATUSES,
+                label="Import job")
+        except Exception as e:
+            print(f"Error describing asset bundle import job: {e}. Aborting.")
+            return False
+
+        job_status = wait_result.status
+        describe_job_response = wait_result.response or {}
+        if job_status == 'SUCCESSFUL':
+            print("Import job SUCCEEDED.")
+            print(f"Imported assets should now be available in account {target_aws_account_id}, region {target_aws_region}.")
+            print("Please verify their functionality, especially data source connections and dataset refresh capabilities.")
+            return True
+        if wait_result.timed_out:
+            timed_out = True
+            print(f"Import job did not reach a terminal state within {job_timeout_seconds}s. Last status: {job_status}.")
+            return False
+
+        print(f"Import job {job_status}.")
+        if 'Errors' in describe_job_response:
+            print("Errors from import job:")
+            for error_item in describe_job_response['Errors']:
+                error_message = f"  - Type: {error_item.get('Type')}, Message: {error_item.get('Message')}"
+                if 'ViolatedEntities' in error_item and error_item['ViolatedEntities']:
+                    error_message += f", Violated Entities: {error_item.get('ViolatedEntities')}"
+                print(error_message)
+                if 'Errors' in error_item and isinstance(error_item['Errors'], list):
+                    for sub_error in error_item['Errors']:
+                        print(f"    - Sub-Type: {sub_error.get('Type')}, Sub-Message: {sub_error.get('Message')}")
+        return False
+    finally:
+        if timed_out and staged:
+            print(f"Keeping staged bundle s3://{staged[0]}/{staged[1]} while the import job may still be reading it.")
+        else:
+            remove_staged_bundle(staging_s3_client, staged)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -420,17 +292,82 @@ if __name__ == "__main__":
              "This may require dependencies to exist and be accessible in the target account.\n"
              "By default, all dependencies ARE included."
     )
+    export_group.add_argument("--promotion-map", help="Path to a promotion-map file (see promotion-maps/) to use instead of the\n"
+                                                      "replacement constants at the top of this script.")
+    export_group.add_argument(
+        "--rewrite-mode",
+        choices=["text", "json"],
+        default="text",
+        help="How bundle contents are rewritten (default: text).\n"
+             "text: raw string replacement in dashboard and dataset/datasource files.\n"
+             "json: parse each JSON member once and rewrite only known ID/ARN fields."
+    )
+    export_group.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Rewrite bundle members in a process pool of this size; output is identical to a serial run (default: 1)."
+    )
+
+    parser.add_argument(
+        "--job-timeout-seconds",
+        type=float,
+        default=DEFAULT_JOB_TIMEOUT_SECONDS,
+        help=f"Overall deadline for each export/import job to finish (default: {DEFAULT_JOB_TIMEOUT_SECONDS}s)."
+    )
 
     import_group = parser.add_argument_group('Import Options (required if not --export-only)')
     import_group.add_argument("--target-account-id", help="Target AWS Account ID for import.")
     import_group.add_argument("--target-profile", help="AWS CLI profile for the target account (optional).")
     import_group.add_argument("--target-aws-region", help="AWS Region for the target QuickSight account.")
     import_group.add_argument("--input-bundle-file", help="Path to the .qs bundle file to import (required for --import-only).")
+    import_group.add_argument(
+        "--staging-bucket",
+        help="S3 bucket in the target account/region for staging bundles larger than --s3-import-threshold-mb.\n"
+             "Staged bundles are uploaded with concurrent multipart parts and imported via S3Uri."
+    )
+    import_group.add_argument("--staging-prefix", default=DEFAULT_STAGING_PREFIX,
+                              help=f"Key prefix for staged bundles (default: {DEFAULT_STAGING_PREFIX}).")
+    import_group.add_argument(
+        "--s3-import-threshold-mb",
+        type=float,
+        default=DEFAULT_S3_IMPORT_THRESHOLD_MB,
+        help=f"Bundles above this size are imported from the staging bucket (default: {DEFAULT_S3_IMPORT_THRESHOLD_MB})."
+    )
+    import_group.add_argument("--s3-endpoint-url",
+                              help="Endpoint for the staging S3 client, e.g. a local MinIO (optional).")
+    import_group.add_argument(
+        "--skip-validation",
+        action="store_true",
+        help="Do not check the bundle locally before import (unparsable JSON, field IDs missing from\n"
+             "field wells, dataset/data source references that resolve nowhere)."
+    )
+
+    parser.add_argument("--report", help="Write a JSON run report with a timing span per stage to this path.")
+    parser.add_argument("--metrics", help="Write the per-stage totals in OpenMetrics text format to this path.")
 
     args = parser.parse_args()
+    run_report.write_on_exit(args.report, args.metrics)
 
     modified_qs_file_to_import = None
 
+    # A promotion-map file replaces the built-in replacement constants above
+    dashboard_replacements = DASHBOARD_SPECIFIC_REPLACEMENTS
+    old_acct_id, new_acct_id = OLD_ACCOUNT_ID_TO_REPLACE, NEW_ACCOUNT_ID_FOR_REPLACEMENT
+    replacement_engine = None
+    if args.promotion_map:
+        try:
+            promotion_map = load_promotion_map(args.promotion_map)
+        except (OSError, PromotionMapError) as e:
+            print(f"ERROR: Could not load promotion map: {e}")
+            sys.exit(1)
+        print(f"Using {promotion_map.describe()}")
+        dashboard_replacements = promotion_map.id_replacements
+        old_acct_id, new_acct_id = promotion_map.old_account_id, promotion_map.new_account_id
+        replacement_engine = promotion_map.replacement_engine()
+    # References to these IDs resolve in the target even when the bundle does not carry the asset
+    known_ids = set(dashboard_replacements) | set(dashboard_replacements.values())
+
     if args.export_only or args.export_and_import:
         if not all([args.source_account_id, args.dashboard_id, args.source_aws_region]):
             parser.error("--source-account-id, --dashboard-id, and --source-aws-region are required for export actions.")
@@ -443,11 +380,15 @@ if __name__ == "__main__":
             include_all_dependencies=args.include_all_dependencies,
             output_file_path_base=args.output_file_base,
             # Constants are used by default for modifications
-            dashboard_replacements=DASHBOARD_SPECIFIC_REPLACEMENTS,
+            dashboard_replacements=dashboard_replacements,
             # target_json_key_ds_id_val is removed
-            old_acct_id=OLD_ACCOUNT_ID_TO_REPLACE,
-            new_acct_id=NEW_ACCOUNT_ID_FOR_REPLACEMENT
+            old_acct_id=old_acct_id,
+            new_acct_id=new_acct_id,
             # old_ds_id and new_ds_id are removed
+            rewrite_mode=args.rewrite_mode,
+            job_timeout_seconds=args.job_timeout_seconds,
+            workers=args.workers,
+            replacement_engine=replacement_engine
         )
         if not modified_qs_file_to_import:
             print("\nExport and modification process failed or did not produce a file. Aborting.")
@@ -479,7 +420,16 @@ if __name__ == "__main__":
             target_aws_account_id=args.target_account_id,
             target_profile=args.target_profile,
             target_aws_region=args.target_aws_region,
-            bundle_file_path=modified_qs_file_to_import
+            bundle_file_path=modified_qs_file_to_import,
+            job_timeout_seconds=args.job_timeout_seconds,
+            staging_bucket=args.staging_bucket,
+            staging_prefix=args.staging_prefix,
+            s3_import_threshold_mb=args.s3_import_threshold_mb,
+            s3_endpoint_url=args.s3_endpoint_url,
+            validate=not args.skip_validation,
+            known_ids=known_ids,
+            check_references=args.include_all_dependencies,
+            validation_workers=args.workers
         )
         if import_successful:
             print("\n--- Import process completed successfully. Please verify assets in the target QuickSight account. ---")
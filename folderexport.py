@@ -1,64 +1,78 @@
-import boto3
 import json
 import os
-import urllib3
-import zipfile
 import sys
-import time
 import logging
-import shutil
 import argparse
 from botocore.exceptions import ClientError
 
+from aws_clients import get_client
+from bundle_download import DEFAULT_CHUNK_SIZE, download_bundle as download_bundle_streaming
+from bundle_rewriter import remove_digest_sidecar, rewrite_bundle
+from job_journal import DEFAULT_JOURNAL_MAX_AGE_HOURS, JobJournal, reattach_job, run_key
+from job_waiter import DEFAULT_JOB_TIMEOUT_SECONDS, PENDING_JOB_STATUSES, JobWaiter
+from member_transform import MemberTransform
+import promotion_manifest
+import run_report
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Default directories and files
-TEMP_DIR = './DevState'
+# Default files
 TEMP_ZIP = 'QuickSightAssetBundle.zip'
 OUTPUT_ZIP = './src/QuickSightAssetBundle-Modified.zip'
+MANIFEST_FILE = './promotion-manifest.json'
 
 
 def cleanup_temp_files():
-    """Clean up temporary files and directories"""
+    """Clean up temporary files"""
     try:
-        if os.path.exists(TEMP_DIR):
-            shutil.rmtree(TEMP_DIR)
         if os.path.exists(TEMP_ZIP):
             os.remove(TEMP_ZIP)
     except Exception as e:
         logger.error(f"Error during cleanup: {e}")
 
 
-def start_export_job(aws_account_id, aws_region, folder_id):
-    """Start and monitor the QuickSight asset bundle export job"""
+def start_export_job(aws_account_id, aws_region, folder_id, job_timeout_seconds=DEFAULT_JOB_TIMEOUT_SECONDS,
+                     journal_run=None):
+    """Start (or, with a journal, reattach to) and monitor the QuickSight asset bundle export job"""
     try:
-        quicksight = boto3.client('quicksight', region_name=aws_region)
-
-        # Start export job
-        response = quicksight.start_asset_bundle_export_job(
+        quicksight = get_client('quicksight', aws_region)
+        describe_job = lambda job_id: quicksight.describe_asset_bundle_export_job(
             AwsAccountId=aws_account_id,
-            AssetBundleExportJobId=folder_id,
-            ExportFormat='QUICKSIGHT_JSON',
-            IncludeFolderMembers='RECURSE',
-            IncludeAllDependencies=True,
-            IncludePermissions=True,
-            ResourceArns=[f'arn:aws:quicksight:{aws_region}:{aws_account_id}:folder/{folder_id}']
+            AssetBundleExportJobId=job_id
         )
 
+        # Start export job, unless an interrupted run's job is still running
+        journal_stage = f"export:{folder_id}"
+        if not reattach_job(journal_run, journal_stage, describe_job, PENDING_JOB_STATUSES, "Export job", log=logger.info):
+            with run_report.span("export", job_id=folder_id):
+                response = quicksight.start_asset_bundle_export_job(
+                    AwsAccountId=aws_account_id,
+                    AssetBundleExportJobId=folder_id,
+                    ExportFormat='QUICKSIGHT_JSON',
+                    IncludeFolderMembers='RECURSE',
+                    IncludeAllDependencies=True,
+                    IncludePermissions=True,
+                    ResourceArns=[f'arn:aws:quicksight:{aws_region}:{aws_account_id}:folder/{folder_id}']
+                )
+            if journal_run:
+                journal_run.started(journal_stage, folder_id)
+
         # Monitor job status
-        status = 'QUEUED_FOR_IMMEDIATE_EXECUTION'
-        while status in ['QUEUED_FOR_IMMEDIATE_EXECUTION', 'IN_PROGRESS']:
-            response = quicksight.describe_asset_bundle_export_job(
-                AwsAccountId=aws_account_id,
-                AssetBundleExportJobId=folder_id
-            )
-            status = response['JobStatus']
-            logger.info(f"Export job status: {status}")
-            time.sleep(5)
-
-        return response['DownloadUrl']
+        wait_result = JobWaiter(deadline_seconds=job_timeout_seconds, log=logger.info).wait(
+            lambda: describe_job(folder_id),
+            label="Export job"
+        )
+        if wait_result.status != 'SUCCESSFUL':
+            if journal_run and not wait_result.timed_out:
+                journal_run.failed(journal_stage, folder_id)
+            for error in (wait_result.response or {}).get('Errors', []):
+                logger.error(f"Export job error: {error}")
+            raise RuntimeError(f"Export job finished with status {wait_result.status}"
+                               + (" (timed out)" if wait_result.timed_out else ""))
+
+        return wait_result.response['DownloadUrl']
 
     except ClientError as e:
         logger.error(f"AWS error: {e}")
@@ -68,85 +82,112 @@ def start_export_job(aws_account_id, aws_region, folder_id):
         raise
 
 
-def download_and_extract(download_url):
-    """Download and extract the asset bundle"""
+def download_bundle(download_url, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream the asset bundle to TEMP_ZIP with bounded memory, resuming and verifying as it goes"""
     try:
-        http = urllib3.PoolManager()
         logger.info("Downloading asset bundle...")
-        qs_file_content = http.request('GET', download_url).data
-
-        with open(TEMP_ZIP, "wb") as qs_file:
-            qs_file.write(qs_file_content)
-
-        logger.info("Extracting asset bundle...")
-        with zipfile.ZipFile(TEMP_ZIP, "r") as zip_ref:
-            zip_ref.extractall(TEMP_DIR)
+        return download_bundle_streaming(download_url, TEMP_ZIP, chunk_size=chunk_size)
 
     except Exception as e:
-        logger.error(f"Error in download and extract: {e}")
+        logger.error(f"Error in download: {e}")
         raise
 
 
-def modify_file_permissions(filepath):
-    """Modify permissions for a single file"""
+def modify_file_permissions(member_name, data, stats=None):
+    """
+    Strip the top-level permissions from a single bundle member.
+    Returns compact JSON bytes when permissions were removed, or None to keep the member
+    byte-identical. Members that do not mention permissions are never parsed.
+    """
+    # Cheap substring check first; only members that can contain the key get a full parse
+    if b'"permissions"' not in data:
+        return None
+
     try:
-        with open(filepath, "r") as file:
-            content = json.load(file)
+        content = json.loads(data)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        logger.warning(f"Skipping non-JSON member {member_name}: {e}")
+        return None
 
-        if 'permissions' in content:
-            content.pop('permissions')
+    if not isinstance(content, dict) or 'permissions' not in content:
+        return None
 
-        with open(filepath, "w") as file:
-            json.dump(content, file, indent=4)
+    content.pop('permissions')
+    new_data = json.dumps(content, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    if stats is not None:
+        stats['touched'] += 1
+        stats['bytes_saved'] += len(data) - len(new_data)
+    return new_data
 
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON parsing error in file {filepath}: {e}")
-        raise
-    except IOError as e:
-        logger.error(f"IO error while processing file {filepath}: {e}")
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error while processing file {filepath}: {e}")
-        raise
+
+class PermissionStripper(MemberTransform):
+    """Picklable wrapper around modify_file_permissions so it can run in rewrite_bundle worker processes"""
+
+    def __call__(self, member_name, data):
+        return modify_file_permissions(member_name, data, self.stats)
 
 
-def modify_permissions():
-    """Modify the permissions in all extracted files"""
+def modify_permissions(workers=1, deterministic=False):
+    """
+    Strip permissions from every bundle member, streaming TEMP_ZIP straight into OUTPUT_ZIP.
+    With deterministic, OUTPUT_ZIP is byte-reproducible and gets a digest sidecar (see rewrite_bundle).
+    """
     logger.info("Starting permission modification process...")
 
-    if not os.path.exists(TEMP_DIR):
-        logger.error(f"Directory {TEMP_DIR} does not exist")
-        raise FileNotFoundError(f"Directory {TEMP_DIR} not found")
+    if not os.path.exists(TEMP_ZIP):
+        logger.error(f"Bundle {TEMP_ZIP} does not exist")
+        raise FileNotFoundError(f"Bundle {TEMP_ZIP} not found")
 
     try:
-        file_count = 0
-        for root, _, files in os.walk(TEMP_DIR):
-            for filename in files:
-                filepath = os.path.join(root, filename)
-                modify_file_permissions(filepath)
-                file_count += 1
-
-        logger.info(f"Successfully modified permissions in {file_count} files")
+        os.makedirs(os.path.dirname(OUTPUT_ZIP) or '.', exist_ok=True)
+        stripper = PermissionStripper()
+        stats = rewrite_bundle(TEMP_ZIP, OUTPUT_ZIP, stripper, workers=workers, deterministic=deterministic)
+        permission_stats = stripper.stats
+        if deterministic:
+            # Every member is recompressed in this mode, so none is a raw copy of the source
+            untouched = f"{stats['members'] - stats['rewritten']} left unchanged and recompressed"
+        else:
+            untouched = f"{stats['raw_copied']} left byte-identical"
+        logger.info(f"Stripped permissions from {permission_stats['touched']} of {stats['members']} members; {untouched}")
+        logger.info(f"Uncompressed bytes saved: {permission_stats['bytes_saved']}; "
+                    f"bundle size {os.path.getsize(TEMP_ZIP)} -> {os.path.getsize(OUTPUT_ZIP)} bytes")
+        if deterministic:
+            unchanged = " (unchanged since the previous output)" if stats["content_unchanged"] else ""
+            logger.info(f"Content digest: sha256:{stats['content_sha256']}{unchanged}")
 
     except Exception as e:
         logger.error(f"Failed to modify permissions: {e}")
         raise
 
 
-def create_modified_bundle():
-    """Create the modified asset bundle"""
+def create_incremental_bundle(manifest_path, deterministic=False):
+    """
+    Reduce the modified bundle to the assets that changed since the last promotion, plus the
+    assets they depend on. The new manifest is left pending until folderimport confirms the import.
+    Returns the number of members kept.
+    """
     try:
-        logger.info("Creating modified asset bundle...")
-        os.makedirs(os.path.dirname(OUTPUT_ZIP), exist_ok=True)
-        with zipfile.ZipFile(OUTPUT_ZIP, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(TEMP_DIR):
-                for filename in files:
-                    filepath = os.path.join(root, filename)
-                    arcname = os.path.relpath(filepath, TEMP_DIR)
-                    zipf.write(filepath, arcname)
+        logger.info(f"Comparing bundle against last promoted manifest {manifest_path}...")
+        previous = promotion_manifest.load_manifest(manifest_path)
+        current = promotion_manifest.build_manifest(OUTPUT_ZIP)
+        changed = promotion_manifest.changed_members(current, previous)
+        selected = promotion_manifest.with_dependencies(OUTPUT_ZIP, changed) if changed else []
+        logger.info(f"{len(changed)} of {len(current)} assets changed; "
+                    f"{len(selected) - len(changed)} dependencies added")
+        for name in changed:
+            logger.info(f"  Changed: {name}")
+
+        promotion_manifest.save_manifest(promotion_manifest.pending_manifest_path(manifest_path), current, selected)
+        if selected:
+            promotion_manifest.write_incremental_bundle(OUTPUT_ZIP, OUTPUT_ZIP, selected, deterministic)
+        else:
+            os.remove(OUTPUT_ZIP)
+            remove_digest_sidecar(OUTPUT_ZIP)
+            logger.info("No assets changed since the last promotion; no bundle written")
+        return len(selected)
 
     except Exception as e:
-        logger.error(f"Error creating modified bundle: {e}")
+        logger.error(f"Error creating incremental bundle: {e}")
         raise
 
 
@@ -157,37 +198,77 @@ def parse_arguments():
     parser.add_argument('--region', required=True, help='AWS Region')
     parser.add_argument('--folder-id', required=True, help='QuickSight Folder ID')
     parser.add_argument('--output', default=OUTPUT_ZIP, help='Output zip file path')
+    parser.add_argument('--download-chunk-mb', type=float, default=DEFAULT_CHUNK_SIZE / (1024 * 1024),
+                        help='Chunk size in MB for the streaming bundle download')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only bundle assets that changed since the last promotion, plus their dependencies')
+    parser.add_argument('--manifest', default=MANIFEST_FILE,
+                        help='Promotion manifest used by --incremental')
+    parser.add_argument('--job-timeout-seconds', type=float, default=DEFAULT_JOB_TIMEOUT_SECONDS,
+                        help='Overall deadline for the export job to finish')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Strip permissions in a process pool of this size (1 = serial)')
+    parser.add_argument('--deterministic', action='store_true',
+                        help='Write a byte-reproducible bundle (sorted members, fixed timestamps and compression) '
+                             'with a <output>.digest.json content digest sidecar')
+    parser.add_argument('--journal',
+                        help='SQLite job journal; a rerun after a crash reattaches to the running export job '
+                             'or reuses the bundle already downloaded')
+    parser.add_argument('--journal-max-age-hours', type=float, default=DEFAULT_JOURNAL_MAX_AGE_HOURS,
+                        help=f'Ignore journal entries older than this (default: {DEFAULT_JOURNAL_MAX_AGE_HOURS})')
+    parser.add_argument('--report', help='Write a JSON run report with a timing span per stage to this path')
+    parser.add_argument('--metrics', help='Write the per-stage totals in OpenMetrics text format to this path')
     
     return parser.parse_args()
 
 
 def main():
     """Main execution function"""
+    journal_run = None
+    succeeded = False
     try:
         # Parse command line arguments
         args = parse_arguments()
+        run_report.write_on_exit(args.report, args.metrics, log=logger.info)
         
         # Update output path if specified
         global OUTPUT_ZIP
         if args.output:
             OUTPUT_ZIP = args.output
             
-        # Clean up any existing temporary files
-        cleanup_temp_files()
-        
-        # Execute the workflow
-        download_url = start_export_job(args.account_id, args.region, args.folder_id)
-        download_and_extract(download_url)
-        modify_permissions()
-        create_modified_bundle()
+        if args.journal:
+            journal_run = JobJournal(args.journal, args.journal_max_age_hours, log=logger.info).run(run_key(
+                script="folderexport", account_id=args.account_id, region=args.region, folder_id=args.folder_id,
+                output=OUTPUT_ZIP, incremental=args.incremental, manifest=args.manifest))
 
+        # Execute the workflow
+        export_stage = f"export:{args.folder_id}"
+        if journal_run and journal_run.completed_artifact(export_stage):
+            logger.info(f"Reusing {TEMP_ZIP} downloaded by an interrupted run; export job skipped")
+        else:
+            # Clean up any existing temporary files
+            cleanup_temp_files()
+            download_url = start_export_job(args.account_id, args.region, args.folder_id, args.job_timeout_seconds,
+                                            journal_run)
+            download_bundle(download_url, chunk_size=int(args.download_chunk_mb * 1024 * 1024))
+            if journal_run:
+                journal_run.completed(export_stage, args.folder_id, TEMP_ZIP)
+        modify_permissions(args.workers, args.deterministic)
+        if args.incremental:
+            create_incremental_bundle(args.manifest, args.deterministic)
+
+        if journal_run:
+            journal_run.finish()
+        succeeded = True
         logger.info(f"Process completed successfully! Modified bundle saved to {OUTPUT_ZIP}")
 
     except Exception as e:
         logger.error(f"Process failed: {e}")
         sys.exit(1)
     finally:
-        cleanup_temp_files()
+        # A journaled run that failed keeps the download for the rerun
+        if succeeded or not journal_run:
+            cleanup_temp_files()
 
 
 if __name__ == "__main__":
@@ -1,11 +1,18 @@
-import boto3
 import json
 import os
 import logging
-import time
 import argparse
 from botocore.exceptions import ClientError
 
+from aws_clients import get_client
+from bundle_validator import validate_before_import
+from bundle_staging import DEFAULT_S3_IMPORT_THRESHOLD_MB, DEFAULT_STAGING_PREFIX, build_import_source, remove_staged_bundle
+from job_journal import DEFAULT_JOURNAL_MAX_AGE_HOURS, JobJournal, file_sha256, reattach_job, run_key
+from job_waiter import PENDING_IMPORT_JOB_STATUSES, JobWaiter
+import promotion_manifest
+from promotion_map import load_promotion_map
+import run_report
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,78 +22,112 @@ AwsAccountId = os.environ.get('AWS_ACCOUNT_ID', '476621446285')
 AwsRegion = os.environ.get('AWS_REGION', 'us-east-1')
 UniqueId = 'MigratedDEV'
 
-def import_quicksight_bundle(asset_bundle_path):
+def import_quicksight_bundle(asset_bundle_path, job_timeout_seconds=900, staging_bucket=None,
+                             staging_prefix=DEFAULT_STAGING_PREFIX,
+                             s3_import_threshold_mb=DEFAULT_S3_IMPORT_THRESHOLD_MB, s3_endpoint_url=None,
+                             validate=True, known_ids=None, check_references=True, validation_workers=1,
+                             journal_run=None):
+    # With a journal, a rerun skips an import this run already finished and reattaches to one still running
+    journal_stage = f"import:{os.path.basename(asset_bundle_path)}"
+    bundle_sha256 = file_sha256(asset_bundle_path) if journal_run and os.path.exists(asset_bundle_path) else None
+    if bundle_sha256 and journal_run.is_completed(journal_stage, bundle_sha256=bundle_sha256):
+        logger.info(f"{asset_bundle_path} was already imported by an interrupted run; skipping the import")
+        return True
+
+    if validate and os.path.exists(asset_bundle_path) and not validate_before_import(
+            asset_bundle_path, known_ids, check_references, validation_workers, log=logger.info):
+        return False
+
+    s3 = None
+    staged = None
+    timed_out = False
     try:
         # Initialize QuickSight client
-        quicksight = boto3.client('quicksight', region_name=AwsRegion)
+        quicksight = get_client('quicksight', AwsRegion)
+        describe_job = lambda job_id: quicksight.describe_asset_bundle_import_job(
+            AwsAccountId=AwsAccountId,
+            AssetBundleImportJobId=job_id
+        )
+        reattached = bundle_sha256 and reattach_job(journal_run, journal_stage, describe_job, PENDING_IMPORT_JOB_STATUSES,
+                                                    "Import job", log=logger.info, bundle_sha256=bundle_sha256)
+        if not reattached:
+            if staging_bucket:
+                s3 = get_client('s3', AwsRegion, endpoint_url=s3_endpoint_url)
+
+            # Read (or stage) the asset bundle file
+            try:
+                import_source, staged = build_import_source(
+                    asset_bundle_path,
+                    s3_client=s3,
+                    staging_bucket=staging_bucket,
+                    staging_prefix=staging_prefix,
+                    s3_import_threshold_mb=s3_import_threshold_mb,
+                    log=logger.info
+                )
+                logger.info(f"Successfully prepared asset bundle file: {asset_bundle_path}")
+            except FileNotFoundError:
+                logger.error(f"Asset bundle file not found: {asset_bundle_path}")
+                return False
+            except Exception as e:
+                logger.error(f"Error preparing asset bundle file: {e}")
+                return False
 
-        # Read the asset bundle file
-        try:
-            with open(asset_bundle_path, "rb") as qsFile:
-                qsFileContents = qsFile.read()
-            logger.info(f"Successfully read asset bundle file: {asset_bundle_path}")
-        except FileNotFoundError:
-            logger.error(f"Asset bundle file not found: {asset_bundle_path}")
-            return False
-        except Exception as e:
-            logger.error(f"Error reading asset bundle file: {e}")
-            return False
+            # Start the import job
+            logger.info(f"Starting import job: AAB-{UniqueId}")
 
-        # Start the import job
-        logger.info(f"Starting import job: AAB-{UniqueId}")
+            try:
+                with run_report.span("import", job_id=f'AAB-{UniqueId}', source=next(iter(import_source)),
+                                     bytes=os.path.getsize(asset_bundle_path)):
+                    response = quicksight.start_asset_bundle_import_job(
+                        AwsAccountId=AwsAccountId,
+                        AssetBundleImportJobId=f'AAB-{UniqueId}',
+                        AssetBundleImportSource=import_source
+                    )
+                logger.info(f"Import job started: {response}")
+            except ClientError as e:
+                logger.error(f"Error starting import job: {e}")
+                return False
+            if journal_run:
+                journal_run.started(journal_stage, f'AAB-{UniqueId}', bundle_sha256=bundle_sha256)
 
+        # Monitor the import job status
         try:
-            response = quicksight.start_asset_bundle_import_job(
-                AwsAccountId=AwsAccountId,
-                AssetBundleImportJobId=f'AAB-{UniqueId}',
-                AssetBundleImportSource={
-                    'Body': qsFileContents
-                }
+            wait_result = JobWaiter(deadline_seconds=job_timeout_seconds, log=logger.info).wait(
+                lambda: describe_job(f'AAB-{UniqueId}'),
+                label="Import job"
             )
-            logger.info(f"Import job started: {response}")
         except ClientError as e:
-            logger.error(f"Error starting import job: {e}")
+            logger.error(f"Error checking job status: {e}")
             return False
 
-        # Monitor the import job status
-        status = 'QUEUED_FOR_IMMEDIATE_EXECUTION'
-        start_time = time.time()
-        timeout = 900  # 15 minutes timeout
-
-        while status in ['QUEUED_FOR_IMMEDIATE_EXECUTION', 'IN_PROGRESS']:
-            if time.time() - start_time > timeout:
-                logger.error("Import job timed out")
-                return False
-
-            try:
-                response = quicksight.describe_asset_bundle_import_job(
-                    AwsAccountId=AwsAccountId,
-                    AssetBundleImportJobId=f'AAB-{UniqueId}'
-                )
-                status = response['JobStatus']
-                logger.info(f"Current status: {status}")
-
-                if status == 'SUCCESSFUL':
-                    logger.info("Import job completed successfully")
-                    return True
-                elif status == 'FAILED_ROLLBACK_IN_PROGRESS':
-                    for error in response.get('Errors', []):
-                        logger.error(f"Import job failed and rollback in progress: {error}")
-                    return False
-                elif status == 'FAILED':
-                    for error in response.get('Errors', []):
-                        logger.error(f"Import job failed: {error}")
-                    return False
-
-                time.sleep(5)
-
-            except ClientError as e:
-                logger.error(f"Error checking job status: {e}")
-                return False
+        status = wait_result.status
+        if journal_run and not wait_result.timed_out:
+            if status == 'SUCCESSFUL':
+                journal_run.completed(journal_stage, f'AAB-{UniqueId}', bundle_sha256=bundle_sha256)
+            else:
+                journal_run.failed(journal_stage, f'AAB-{UniqueId}')
+        if status == 'SUCCESSFUL':
+            logger.info("Import job completed successfully")
+            return True
+        if wait_result.timed_out:
+            timed_out = True
+            logger.error("Import job timed out")
+        elif status == 'FAILED_ROLLBACK_IN_PROGRESS':
+            for error in wait_result.response.get('Errors', []):
+                logger.error(f"Import job failed and rollback in progress: {error}")
+        else:
+            for error in wait_result.response.get('Errors', []):
+                logger.error(f"Import job failed: {error}")
+        return False
 
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
         return False
+    finally:
+        if timed_out and staged:
+            logger.warning(f"Keeping staged bundle s3://{staged[0]}/{staged[1]} while the import job may still be reading it")
+        else:
+            remove_staged_bundle(s3, staged, log=logger.info)
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Import QuickSight asset bundle')
@@ -99,11 +140,42 @@ def parse_arguments():
                         help='AWS Region (overrides environment variable)')
     parser.add_argument('--unique-id', '-u',
                         help='Unique ID for the import job (default: MigratedDEV)')
-
+    parser.add_argument('--manifest',
+                        help='Promotion manifest written by folderexport.py --incremental; '
+                             'marked as promoted once the import succeeds')
+    parser.add_argument('--job-timeout-seconds', type=float, default=900,
+                        help='Overall deadline for the import job to finish (default: 900)')
+    parser.add_argument('--staging-bucket',
+                        help='S3 bucket for staging bundles above --s3-import-threshold-mb; '
+                             'they are uploaded in concurrent multipart parts and imported via S3Uri')
+    parser.add_argument('--staging-prefix', default=DEFAULT_STAGING_PREFIX,
+                        help=f'Key prefix for staged bundles (default: {DEFAULT_STAGING_PREFIX})')
+    parser.add_argument('--s3-import-threshold-mb', type=float, default=DEFAULT_S3_IMPORT_THRESHOLD_MB,
+                        help=f'Bundles above this size are imported from the staging bucket (default: {DEFAULT_S3_IMPORT_THRESHOLD_MB})')
+    parser.add_argument('--s3-endpoint-url',
+                        help='Endpoint for the staging S3 client, e.g. a local MinIO (optional)')
+
+    parser.add_argument('--skip-validation', action='store_true',
+                        help='Do not check the bundle locally before import (unparsable JSON, field IDs missing '
+                             'from field wells, dataset/data source references that resolve nowhere)')
+    parser.add_argument('--promotion-map',
+                        help='Promotion map the bundle was rewritten with; references to its IDs count as resolvable')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Validate bundle members in a process pool of this size (1 = serial)')
+
+    parser.add_argument('--journal',
+                        help='SQLite job journal; a rerun after a crash reattaches to the running import job '
+                             'or skips an import that already finished')
+    parser.add_argument('--journal-max-age-hours', type=float, default=DEFAULT_JOURNAL_MAX_AGE_HOURS,
+                        help=f'Ignore journal entries older than this (default: {DEFAULT_JOURNAL_MAX_AGE_HOURS})')
+
+    parser.add_argument('--report', help='Write a JSON run report with a timing span per stage to this path')
+    parser.add_argument('--metrics', help='Write the per-stage totals in OpenMetrics text format to this path')
     return parser.parse_args()
 
 def main():
     args = parse_arguments()
+    run_report.write_on_exit(args.report, args.metrics, log=logger.info)
 
     # Update global variables if provided in arguments
     global AwsAccountId, AwsRegion, UniqueId
@@ -123,7 +195,36 @@ def main():
     logger.info(f"AWS Region: {AwsRegion}")
     logger.info(f"Import Job ID: AAB-{UniqueId}")
 
-    if import_quicksight_bundle(args.file):
+    if args.manifest and promotion_manifest.pending_changes(args.manifest) == []:
+        promotion_manifest.commit_pending_manifest(args.manifest)
+        logger.info("No assets changed since the last promotion; nothing to import")
+        return
+
+    known_ids = None
+    if args.promotion_map:
+        try:
+            known_ids = load_promotion_map(args.promotion_map, log=logger.warning).asset_ids
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load promotion map: {e}")
+            exit(1)
+
+    journal_run = None
+    if args.journal:
+        journal_run = JobJournal(args.journal, args.journal_max_age_hours, log=logger.info).run(run_key(
+            script="folderimport", account_id=AwsAccountId, region=AwsRegion, unique_id=UniqueId,
+            file=os.path.abspath(args.file), manifest=args.manifest))
+
+    # An incremental bundle only carries changed assets; the rest are already in the target
+    if import_quicksight_bundle(args.file, args.job_timeout_seconds, args.staging_bucket, args.staging_prefix,
+                                args.s3_import_threshold_mb, args.s3_endpoint_url,
+                                validate=not args.skip_validation, known_ids=known_ids,
+                                check_references=not args.manifest,
+                                validation_workers=args.workers,
+                                journal_run=journal_run):
+        if journal_run:
+            journal_run.finish()
+        if args.manifest and promotion_manifest.commit_pending_manifest(args.manifest):
+            logger.info(f"Promotion manifest updated: {args.manifest}")
         logger.info("Asset bundle import process completed successfully")
     else:
         logger.error("Asset bundle import process failed")
@@ -0,0 +1,109 @@
+import re
+from collections import Counter
+
+
+def _trie_pattern(trie: dict) -> str:
+    """Turns a character trie into a regex fragment. The empty-string key marks the end of a word."""
+    if "" in trie and len(trie) == 1:
+        return ""
+    alternatives = []
+    single_chars = []
+    optional = "" in trie
+    for char in sorted(key for key in trie if key):
+        branch = _trie_pattern(trie[char])
+        if branch:
+            alternatives.append(re.escape(char) + branch)
+        else:
+            single_chars.append(re.escape(char))
+
+    if single_chars:
+        alternatives.append(single_chars[0] if len(single_chars) == 1 else "[" + "".join(single_chars) + "]")
+    if len(alternatives) == 1 and not optional:
+        return alternatives[0]
+    pattern = "(?:" + "|".join(alternatives) + ")"
+    return pattern + "?" if optional else pattern
+
+
+def compile_matcher(keys):
+    """
+    Compiles a set of literal strings into one regex that finds any of them in a single scan.
+    The keys are folded into a trie, so shared prefixes (every ARN, every UUID with the same
+    leading characters) are only tested once. Longer keys win over their own prefixes.
+    Returns None when there is nothing to match.
+    """
+    keys = [key for key in keys if key]
+    if not keys:
+        return None
+    trie = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return re.compile(_trie_pattern(trie))
+
+
+class ReplacementEngine:
+    """
+    Rewrites IDs in bundle text in a single pass per file.
+
+    Built once per run from the ID replacement map and the old/new account IDs. Every match is
+    looked up in the map exactly once, so chained mappings (A->B, B->C) never cascade: text that
+    held A ends up holding B, not C. Hit counts are kept per ID for the whole run.
+    """
+
+    def __init__(self, id_replacements: dict, old_account_id: str = None, new_account_id: str = None,
+                 patterns: dict = None):
+        self.id_replacements = {old_id: new_id for old_id, new_id in (id_replacements or {}).items() if old_id}
+        self.account_replacements = {}
+        if old_account_id and new_account_id:
+            self.account_replacements[old_account_id] = new_account_id
+        self.all_replacements = dict(self.account_replacements)
+        self.all_replacements.update(self.id_replacements)
+
+        if patterns is None:
+            self._id_matcher = compile_matcher(self.id_replacements)
+            self._account_matcher = compile_matcher(self.account_replacements)
+            self._all_matcher = compile_matcher(self.all_replacements)
+        else:
+            # Precompiled by patterns() for these same maps (see promotion_map); skips building the tries
+            self._id_matcher, self._account_matcher, self._all_matcher = (
+                re.compile(patterns[name]) if patterns.get(name) else None for name in ("ids", "accounts", "all"))
+        self.hit_counts = Counter()
+
+    def patterns(self) -> dict:
+        """The matcher regexes as strings, to rebuild an identical engine later via patterns=."""
+        return {name: matcher.pattern if matcher is not None else None
+                for name, matcher in (("ids", self._id_matcher), ("accounts", self._account_matcher), ("all", self._all_matcher))}
+
+    def _rewrite(self, text: str, matcher, replacements: dict):
+        file_hits = Counter()
+        if matcher is None:
+            return text, file_hits
+
+        def substitute(match):
+            old_value = match.group(0)
+            file_hits[old_value] += 1
+            return replacements[old_value]
+
+        new_text = matcher.sub(substitute, text)
+        self.hit_counts.update(file_hits)
+        return new_text, file_hits
+
+    def replace_ids(self, text: str):
+        """Applies the ID replacement map. Returns (new_text, Counter of hits per old ID)."""
+        return self._rewrite(text, self._id_matcher, self.id_replacements)
+
+    def replace_account_id(self, text: str):
+        """Applies the generic account ID replacement. Returns (new_text, Counter of hits)."""
+        return self._rewrite(text, self._account_matcher, self.account_replacements)
+
+    def replace_all(self, text: str):
+        """Applies the ID map and the account ID replacement together in one scan."""
+        return self._rewrite(text, self._all_matcher, self.all_replacements)
+
+    def print_summary(self):
+        """Prints the per-ID hit counts collected across every file rewritten with this engine."""
+        print("\nReplacement hit counts:")
+        for old_value, new_value in self.all_replacements.items():
+            print(f"  '{old_value}' -> '{new_value}': {self.hit_counts.get(old_value, 0)}")
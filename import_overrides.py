@@ -0,0 +1,245 @@
+import io
+import zipfile
+
+from bundle_reader import Bundle
+from bundle_validator import ZIP_MAGIC, finding
+from id_replacement import ReplacementEngine
+
+# Bundle folder (lower-cased) -> (override list key, ID key of an override entry, ID list key of a
+# permissions/tags entry)
+OVERRIDE_ASSET_TYPES = {
+    "vpcconnection": ("VPCConnections", "VPCConnectionId", "VPCConnectionIds"),
+    "datasource": ("DataSources", "DataSourceId", "DataSourceIds"),
+    "dataset": ("DataSets", "DataSetId", "DataSetIds"),
+    "theme": ("Themes", "ThemeId", "ThemeIds"),
+    "analysis": ("Analyses", "AnalysisId", "AnalysisIds"),
+    "dashboard": ("Dashboards", "DashboardId", "DashboardIds"),
+    "folder": ("Folders", "FolderId", "FolderIds"),
+}
+# Member fields an override replaces, so their contents need no rewrite: folder -> bundle key -> API key
+OVERRIDDEN_FIELDS = {
+    "datasource": {"dataSourceParameters": "DataSourceParameters", "vpcConnectionProperties": "VpcConnectionProperties"},
+    "folder": {"parentFolderArn": "ParentFolderArn"},
+    "vpcconnection": {"subnetIds": "SubnetIds", "securityGroupIds": "SecurityGroupIds",
+                      "dnsResolvers": "DnsResolvers", "roleArn": "RoleArn"},
+}
+# Asset types OverridePermissions has no list for; permission changes on them are not overridable
+NO_PERMISSION_OVERRIDES = {"vpcconnection"}
+COMMON_OVERRIDDEN_KEYS = {"name", "permissions", "tags"}
+# Strings the import resolves in the target account by itself: only the IDs in them matter, not the account
+ACCOUNT_SCOPED_KEYS = {"arn", "awsaccountid"}
+
+
+def _lower_keys(node: dict) -> dict:
+    return {key.lower(): value for key, value in node.items() if isinstance(key, str)}
+
+
+def _api_shape(node):
+    """A bundle structure with its keys in API casing ('rdsParameters' -> 'RdsParameters')."""
+    if isinstance(node, dict):
+        return {key[:1].upper() + key[1:]: _api_shape(value) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_api_shape(value) for value in node]
+    return node
+
+
+def _replace_strings(node, engine: ReplacementEngine):
+    """The structure with the engine's replacements applied to every string value."""
+    if isinstance(node, dict):
+        return {key: _replace_strings(value, engine) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_replace_strings(value, engine) for value in node]
+    if isinstance(node, str):
+        return engine.replace_ids(node)[0]
+    return node
+
+
+def _permission_key(permissions, replace):
+    """((principal, actions), ...) with replace applied to the principals; None when there are no permissions."""
+    if not isinstance(permissions, list):
+        return None
+    entries = []
+    for permission in permissions:
+        lowered = _lower_keys(permission) if isinstance(permission, dict) else {}
+        if isinstance(lowered.get("principal"), str):
+            entries.append((replace(lowered["principal"]), tuple(sorted(lowered.get("actions") or ()))))
+    return tuple(sorted(entries))
+
+
+def _tag_key(tags, replace):
+    """((key, value), ...) with replace applied; None when there are no tags."""
+    if not isinstance(tags, list):
+        return None
+    entries = []
+    for tag in tags:
+        lowered = _lower_keys(tag) if isinstance(tag, dict) else {}
+        if isinstance(lowered.get("key"), str):
+            entries.append((replace(lowered["key"]), replace(str(lowered.get("value", "")))))
+    return tuple(sorted(entries))
+
+
+def _residuals(member_name: str, document, overridden_keys: set, engines: dict, findings: list):
+    """
+    Findings for every value the promotion map would change outside the overridden fields.
+    engines[(in_custom_sql, account_scoped)] is the engine for a string in that position.
+    """
+
+    def check(value: str, path: str, engine: ReplacementEngine):
+        _, hits = engine.replace_ids(value)
+        for old_value in hits:
+            findings.append(finding(member_name, path, "NOT_OVERRIDABLE",
+                                    f"'{old_value}' cannot be replaced through import overrides"))
+
+    def walk(node, path, in_custom_sql, account_scoped, top_level):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                lowered = key.lower() if isinstance(key, str) else key
+                if top_level and lowered in overridden_keys:
+                    continue
+                child_path = f"{path}.{key}" if path else str(key)
+                if isinstance(key, str):
+                    check(key, child_path, engines[(in_custom_sql, True)])
+                walk(value, child_path, in_custom_sql or lowered == "customsql",
+                     account_scoped or lowered in ACCOUNT_SCOPED_KEYS, False)
+        elif isinstance(node, list):
+            for index, value in enumerate(node):
+                walk(value, f"{path}[{index}]", in_custom_sql, account_scoped, False)
+        elif isinstance(node, str):
+            # ARNs are rebound to the target account by the import; only the IDs in them have to match
+            check(node, path, engines[(in_custom_sql, account_scoped or node.startswith("arn:"))])
+
+    walk(document, "", False, False, True)
+
+
+def _non_json_residuals(member_name: str, data: bytes, engine: ReplacementEngine, findings: list):
+    """
+    Findings for every value the promotion map would change in a non-JSON member, looking into
+    nested archives; a member the map leaves alone is imported as it is.
+    """
+    if data.startswith(ZIP_MAGIC):
+        with zipfile.ZipFile(io.BytesIO(data), 'r') as nested_zip:
+            for info in nested_zip.infolist():
+                if not info.is_dir():
+                    _non_json_residuals(f"{member_name}/{info.filename}", nested_zip.read(info), engine, findings)
+        return
+    # latin-1 maps every byte to one character, so IDs match whatever the encoding
+    _, hits = engine.replace_ids(data.decode("latin-1"))
+    for old_value in hits:
+        findings.append(finding(member_name, "", "NOT_OVERRIDABLE",
+                                f"'{old_value}' cannot be replaced through import overrides; rewrite this bundle instead"))
+
+
+def _grouped_entries(keys: dict, ids_key: str, entry):
+    """One entry per group of assets with the same key: entry(asset_ids, key) -> list of entries."""
+    groups = {}
+    for asset_id, key in keys.items():
+        groups.setdefault(key, []).append(asset_id)
+    entries = []
+    for key, asset_ids in groups.items():
+        entries.extend(entry({ids_key: sorted(asset_ids)}, key))
+    return entries
+
+
+def _permission_entries(ids_entry: dict, key) -> list:
+    by_actions = {}
+    for principal, actions in key:
+        by_actions.setdefault(actions, []).append(principal)
+    return [dict(ids_entry, Permissions={"Principals": principals, "Actions": list(actions)})
+            for actions, principals in by_actions.items()]
+
+
+def _tag_entries(ids_entry: dict, key) -> list:
+    return [dict(ids_entry, Tags=[{"Key": tag_key, "Value": value} for tag_key, value in key])]
+
+
+def generate_import_overrides(bundle_path: str, promotion_map):
+    """
+    Expresses a promotion map as the OverrideParameters, OverridePermissions and OverrideTags of
+    StartAssetBundleImportJob, so the exported bundle can be imported as it is, without a local
+    unzip, rewrite and rezip. One pass over the bundle index: asset names, data source parameters,
+    data source VPC connection properties, VPC connection subnets, security groups, DNS resolvers
+    and roles, parent folder ARNs, permission principals and tags that the map changes become
+    overrides. ARNs of bundled assets need none; the import rebinds them to the target account.
+
+    Asset IDs cannot be changed by an import, nor can text such as CustomSql queries or calculated
+    fields, so whatever the map would still change elsewhere is returned as NOT_OVERRIDABLE findings
+    (see bundle_validator.format_finding); such a bundle has to be rewritten instead.
+    Returns (start_asset_bundle_import_job keyword arguments, findings).
+    """
+    text_engine = promotion_map.bundle_replacement_engine()
+    custom_sql = promotion_map.custom_sql_datasources
+    engines = {
+        (False, False): text_engine,
+        (False, True): ReplacementEngine(promotion_map.id_replacements),
+        (True, False): ReplacementEngine({**promotion_map.text_replacements, **custom_sql}),
+        (True, True): ReplacementEngine({**promotion_map.id_replacements, **custom_sql}),
+    }
+
+    def replace(value: str) -> str:
+        return text_engine.replace_ids(value)[0]
+
+    parameters = {}
+    permission_keys = {}
+    tag_keys = {}
+    findings = []
+
+    with Bundle(bundle_path) as bundle:
+        for member in bundle.members:
+            if not member.name.endswith(".json"):
+                _non_json_residuals(member.name, bundle.read(member.name), text_engine, findings)
+                continue
+            try:
+                document = bundle.document(member.name)
+            except (ValueError, UnicodeDecodeError) as e:
+                findings.append(finding(member.name, "", "INVALID_JSON", f"Member does not parse: {e}"))
+                continue
+            if not isinstance(document, dict):
+                continue
+            lowered = _lower_keys(document)
+            asset_type = (member.asset_type or "").lower()
+            fields = {bundle_key.lower(): api_key for bundle_key, api_key in OVERRIDDEN_FIELDS.get(asset_type, {}).items()}
+            override_keys = OVERRIDE_ASSET_TYPES.get(asset_type)
+            overridden_keys = COMMON_OVERRIDDEN_KEYS | set(fields) if override_keys else set()
+            _residuals(member.name, document, overridden_keys, engines, findings)
+            bundle.forget(member.name)
+            if not override_keys:
+                continue
+
+            list_key, id_key, ids_key = override_keys
+            asset_id = lowered.get(id_key.lower()) or member.asset_id
+            entry = {}
+            if isinstance(lowered.get("name"), str):
+                name = replace(lowered["name"])
+                if name != lowered["name"]:
+                    entry["Name"] = name
+            for field, api_key in fields.items():
+                if field in lowered:
+                    value = _api_shape(_replace_strings(lowered[field], text_engine))
+                    if value != _api_shape(lowered[field]):
+                        entry[api_key] = value
+            if entry:
+                parameters.setdefault(list_key, []).append(dict({id_key: asset_id}, **entry))
+
+            permissions = _permission_key(lowered.get("permissions"), replace)
+            if permissions and permissions != _permission_key(lowered.get("permissions"), str):
+                if asset_type in NO_PERMISSION_OVERRIDES:
+                    findings.append(finding(member.name, "permissions", "NOT_OVERRIDABLE",
+                                            f"Permissions of a {member.asset_type} cannot be overridden on import"))
+                else:
+                    permission_keys.setdefault(asset_type, {})[asset_id] = permissions
+            tags = _tag_key(lowered.get("tags"), replace)
+            if tags and tags != _tag_key(lowered.get("tags"), str):
+                tag_keys.setdefault(asset_type, {})[asset_id] = tags
+
+    overrides = {}
+    if parameters:
+        overrides["OverrideParameters"] = parameters
+    if permission_keys:
+        overrides["OverridePermissions"] = {
+            OVERRIDE_ASSET_TYPES[asset_type][0]: _grouped_entries(keys, OVERRIDE_ASSET_TYPES[asset_type][2], _permission_entries)
+            for asset_type, keys in permission_keys.items()}
+    if tag_keys:
+        overrides["OverrideTags"] = {
+            OVERRIDE_ASSET_TYPES[asset_type][0]: _grouped_entries(keys, OVERRIDE_ASSET_TYPES[asset_type][2], _tag_entries)
+            for asset_type, keys in tag_keys.items()}
+    return overrides, findings
@@ -0,0 +1,188 @@
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_JOURNAL_MAX_AGE_HOURS = 24.0
+
+# A stage is STARTED once its QuickSight job exists, COMPLETED once its artifact (or import) is done
+STARTED = "STARTED"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stages (
+    run_key TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    job_id TEXT,
+    artifact_path TEXT,
+    artifact_sha256 TEXT,
+    details TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_key, stage)
+)
+"""
+
+
+def run_key(**inputs) -> str:
+    """Identity of a promotion run: a hash of everything that determines its outcome."""
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def reattach_job(journal_run, stage: str, describe_job, pending_statuses, label: str, log=print, **details):
+    """
+    The job ID an interrupted run started for stage (with these details), if describe_job(job_id) shows
+    the job still running or succeeded; waiting on it replaces starting a new job. None when there is
+    no journal or nothing to reattach to.
+    """
+    job_id = journal_run.job_to_reattach(stage, **details) if journal_run else None
+    if not job_id:
+        return None
+    try:
+        job_status = describe_job(job_id).get('JobStatus')
+    except Exception as e:
+        log(f"{label} {job_id} from an interrupted run cannot be described ({e}); starting a new job.")
+        return None
+    if job_status in pending_statuses or job_status == 'SUCCESSFUL':
+        log(f"Reattaching to {label.lower()} {job_id} started by an interrupted run (status {job_status}).")
+        return job_id
+    log(f"{label} {job_id} from an interrupted run ended {job_status}; starting a new job.")
+    return None
+
+
+class JobJournal:
+    """
+    A local SQLite journal of promotion stages, so a run that crashed or was cancelled can be
+    resumed: a rerun with the same inputs reattaches to the QuickSight jobs it had started and
+    reuses the artifacts it had completed (checked against their sha256) instead of starting over.
+
+    Entries belong to a run (see run_key) and are cleared when the run finishes successfully, so a
+    later run never picks up stale exports. Entries older than max_age_hours are ignored.
+    One connection is opened per journal and shared by its calls under a lock, so a journal can be
+    shared by threads; separate processes open their own journal on the same file.
+    """
+
+    def __init__(self, path: str, max_age_hours: float = DEFAULT_JOURNAL_MAX_AGE_HOURS, log=print):
+        self.path = path
+        self.max_age_seconds = max_age_hours * 3600
+        self.log = log
+        journal_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(journal_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._transaction() as connection:
+            connection.execute(SCHEMA)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """The journal's connection, held by one thread at a time; commits when the block succeeds."""
+        with self._lock, self._connection:
+            yield self._connection
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def run(self, key: str) -> "JournalRun":
+        return JournalRun(self, key)
+
+    def get(self, key: str, stage: str):
+        """The stage's entry as a dict, or None when there is none or it is older than max_age_hours."""
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT status, job_id, artifact_path, artifact_sha256, details, updated_at FROM stages "
+                "WHERE run_key = ? AND stage = ?", (key, stage)).fetchone()
+        if row is None or time.time() - row[5] > self.max_age_seconds:
+            return None
+        return {"status": row[0], "job_id": row[1], "artifact_path": row[2], "artifact_sha256": row[3],
+                "details": json.loads(row[4] or "{}"), "updated_at": row[5]}
+
+    def record(self, key: str, stage: str, status: str, job_id: str = None, artifact_path: str = None,
+               artifact_sha256: str = None, **details):
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO stages (run_key, stage, status, job_id, artifact_path, artifact_sha256, "
+                "details, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, stage, status, job_id, artifact_path, artifact_sha256, json.dumps(details), time.time()))
+
+    def clear(self, key: str):
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM stages WHERE run_key = ?", (key,))
+
+
+class JournalRun:
+    """The journal entries of one run. Stage names are free-form, e.g. 'export:<dashboard_id>'."""
+
+    def __init__(self, journal: JobJournal, key: str):
+        self.journal = journal
+        self.key = key
+
+    def get(self, stage: str):
+        return self.journal.get(self.key, stage)
+
+    def started(self, stage: str, job_id: str, **details):
+        self.journal.record(self.key, stage, STARTED, job_id=job_id, **details)
+
+    def failed(self, stage: str, job_id: str = None, **details):
+        self.journal.record(self.key, stage, FAILED, job_id=job_id, **details)
+
+    def completed(self, stage: str, job_id: str = None, artifact_path: str = None, source_stage: str = None,
+                  **details):
+        """
+        Records the stage as done. An artifact is recorded with its sha256 so it can be verified on
+        reuse; source_stage names the stage whose artifact it was made from (e.g. the export a
+        rewrite read), so the artifact is only reused while that input is unchanged.
+        """
+        artifact_sha256 = file_sha256(artifact_path) if artifact_path else None
+        if source_stage:
+            details["source_sha256"] = (self.get(source_stage) or {}).get("artifact_sha256")
+        self.journal.record(self.key, stage, COMPLETED, job_id=job_id,
+                            artifact_path=os.path.abspath(artifact_path) if artifact_path else None,
+                            artifact_sha256=artifact_sha256, **details)
+
+    def completed_artifact(self, stage: str, source_stage: str = None):
+        """
+        The artifact path of a completed stage if the file is still there and unchanged (and was
+        made from source_stage's current artifact, when given), else None.
+        """
+        entry = self.get(stage)
+        if not entry or entry["status"] != COMPLETED or not entry["artifact_path"]:
+            return None
+        if source_stage and entry["details"].get("source_sha256") != (self.get(source_stage) or {}).get("artifact_sha256"):
+            return None
+        path = entry["artifact_path"]
+        if not os.path.exists(path) or file_sha256(path) != entry["artifact_sha256"]:
+            self.journal.log(f"Journaled artifact {path} is missing or changed; redoing stage {stage}.")
+            return None
+        return path
+
+    def is_completed(self, stage: str, **details) -> bool:
+        """Whether the stage completed with these details, e.g. is_completed('import:x', bundle_sha256=...)."""
+        entry = self.get(stage)
+        return bool(entry) and entry["status"] == COMPLETED and \
+            all(entry["details"].get(key) == value for key, value in details.items())
+
+    def job_to_reattach(self, stage: str, **details):
+        """The job ID of a stage that was started (with these details) but not finished, else None."""
+        entry = self.get(stage)
+        if not entry or entry["status"] != STARTED:
+            return None
+        if any(entry["details"].get(key) != value for key, value in details.items()):
+            return None
+        return entry["job_id"]
+
+    def finish(self):
+        """Clears the run's entries once the whole run succeeded."""
+        self.journal.clear(self.key)
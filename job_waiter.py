@@ -0,0 +1,182 @@
+import asyncio
+import random
+import time
+
+import run_report
+
+# Statuses in which an asset bundle export or import job is still running
+PENDING_JOB_STATUSES = ('QUEUED_FOR_IMMEDIATE_EXECUTION', 'IN_PROGRESS')
+# Import jobs that fail roll back first; waiting through the rollback gives the final status
+PENDING_IMPORT_JOB_STATUSES = PENDING_JOB_STATUSES + ('FAILED_ROLLBACK_IN_PROGRESS',)
+
+DEFAULT_JOB_TIMEOUT_SECONDS = 1200
+THROTTLING_ERROR_CODES = ('ThrottlingException', 'Throttling', 'TooManyRequestsException', 'RequestLimitExceeded')
+
+
+def error_code(error: Exception):
+    """Returns the AWS error code of a botocore ClientError, or None for any other exception."""
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        return response.get('Error', {}).get('Code')
+    return None
+
+
+class JobWaitResult:
+    """Outcome of waiting on a job: the last Describe response and where the time went."""
+
+    def __init__(self):
+        self.response = None
+        self.status = "UNKNOWN"
+        self.attempts = 0
+        self.throttled = 0
+        self.elapsed_seconds = 0.0
+        self.timed_out = False
+        self.status_durations = {}
+
+    def summary(self) -> str:
+        durations = ", ".join(f"{status}={seconds:.1f}s" for status, seconds in self.status_durations.items())
+        return (f"status {self.status} after {self.elapsed_seconds:.1f}s, {self.attempts} describe calls, "
+                f"{self.throttled} throttled; time per status: {durations or 'n/a'}")
+
+
+class JobWaiter:
+    """
+    Polls an asset bundle job until it leaves its pending statuses.
+
+    The first poll happens quickly, then the delay grows exponentially up to max_delay with full
+    jitter, so short jobs are picked up right away and long ones make few Describe calls.
+    ThrottlingException responses back off without counting as errors. Other errors are retried
+    up to max_consecutive_errors times before being raised. The whole wait is bounded by
+    deadline_seconds. Time spent in each JobStatus is recorded on the result.
+    """
+
+    def __init__(
+        self,
+        deadline_seconds: float = DEFAULT_JOB_TIMEOUT_SECONDS,
+        initial_delay: float = 1.0,
+        max_delay: float = 30.0,
+        multiplier: float = 2.0,
+        max_consecutive_errors: int = 5,
+        log=print,
+        sleep=time.sleep,
+        clock=time.monotonic,
+    ):
+        self.deadline_seconds = deadline_seconds
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.max_consecutive_errors = max_consecutive_errors
+        self.log = log
+        self.sleep = sleep
+        self.clock = clock
+
+    def _next_delay(self, backoff: float) -> float:
+        return random.uniform(self.initial_delay / 2, max(backoff, self.initial_delay))
+
+    def wait(self, describe, pending_statuses=PENDING_JOB_STATUSES, label: str = "Job") -> JobWaitResult:
+        """Calls describe() until JobStatus is not in pending_statuses or the deadline passes."""
+        with run_report.span("poll", job=label) as record:
+            steps = self._poll(pending_statuses, label)
+            try:
+                step = next(steps)
+                while True:
+                    if step is None:
+                        try:
+                            outcome = (describe(), None)
+                        except Exception as e:
+                            outcome = (None, e)
+                        step = steps.send(outcome)
+                    else:
+                        self.sleep(step)
+                        step = next(steps)
+            except StopIteration as stop:
+                result = stop.value
+            self._record(record, result)
+        return result
+
+    async def wait_async(self, describe, pending_statuses=PENDING_JOB_STATUSES, label: str = "Job",
+                         run_blocking=None) -> JobWaitResult:
+        """
+        wait() for asyncio: describe() runs through run_blocking (a coroutine function, by default the
+        event loop's executor) and the delays are asyncio.sleep, so a job being waited on holds no thread.
+        """
+        if run_blocking is None:
+            run_blocking = lambda func: asyncio.get_event_loop().run_in_executor(None, func)
+        with run_report.span("poll", job=label) as record:
+            steps = self._poll(pending_statuses, label)
+            try:
+                step = next(steps)
+                while True:
+                    if step is None:
+                        try:
+                            outcome = (await run_blocking(describe), None)
+                        except Exception as e:
+                            outcome = (None, e)
+                        step = steps.send(outcome)
+                    else:
+                        await asyncio.sleep(step)
+                        step = next(steps)
+            except StopIteration as stop:
+                result = stop.value
+            self._record(record, result)
+        return result
+
+    @staticmethod
+    def _record(record: dict, result: JobWaitResult):
+        record.update(status=result.status, attempts=result.attempts, throttled=result.throttled,
+                      timed_out=result.timed_out, status_seconds=result.status_durations)
+
+    def _poll(self, pending_statuses, label: str):
+        """
+        The polling loop shared by wait() and wait_async(), as a generator: it yields None to have
+        describe() called, and gets (response, error) sent back, or yields a delay to sleep for.
+        Returns the JobWaitResult.
+        """
+        result = JobWaitResult()
+        started = self.clock()
+        status_since = started
+        backoff = self.initial_delay
+        consecutive_errors = 0
+
+        while True:
+            response, error = yield None
+            if error is None:
+                consecutive_errors = 0
+            elif error_code(error) in THROTTLING_ERROR_CODES:
+                result.throttled += 1
+                backoff = min(backoff * self.multiplier, self.max_delay)
+                self.log(f"{label} status check throttled, backing off")
+            else:
+                consecutive_errors += 1
+                self.log(f"Error describing {label.lower()} status: {error} ({consecutive_errors}/{self.max_consecutive_errors})")
+                if consecutive_errors >= self.max_consecutive_errors:
+                    raise error
+
+            now = self.clock()
+            if response is not None:
+                result.attempts += 1
+                result.response = response
+                status = response.get('JobStatus', "UNKNOWN")
+                if status != result.status:
+                    if result.status != "UNKNOWN":
+                        result.status_durations[result.status] = result.status_durations.get(result.status, 0.0) + now - status_since
+                    status_since = now
+                    result.status = status
+                self.log(f"{label} status: {status} (Attempt {result.attempts}, {now - started:.1f}s elapsed)")
+                if status not in pending_statuses:
+                    break
+
+            if now - started >= self.deadline_seconds:
+                result.timed_out = True
+                self.log(f"{label} did not reach a terminal state within {self.deadline_seconds:.0f}s. Last status: {result.status}")
+                break
+
+            delay = min(self._next_delay(backoff), self.deadline_seconds - (now - started))
+            yield max(delay, 0)
+            backoff = min(backoff * self.multiplier, self.max_delay)
+
+        now = self.clock()
+        result.status_durations[result.status] = result.status_durations.get(result.status, 0.0) + now - status_since
+        result.elapsed_seconds = now - started
+        self.log(f"{label} wait finished: {result.summary()}")
+        return result
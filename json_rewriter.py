@@ -0,0 +1,160 @@
+import json
+import time
+
+try:
+    import orjson  # Optional fast JSON backend
+except ImportError:
+    orjson = None
+
+from id_replacement import ReplacementEngine
+from member_transform import MemberTransform
+
+# Paths (lower-cased keys, '*' matches any key or list index) that carry IDs or ARNs in
+# QUICKSIGHT_JSON bundle members. Everything else in a document is never visited.
+ID_ARN_PATHS = [
+    # Shared
+    "arn",
+    "themearn",
+    "definition.datasetidentifierdeclarations.*.datasetarn",
+    "sourceentity.sourcetemplate.arn",
+    "sourceentity.sourcetemplate.datasetreferences.*.datasetarn",
+    "sourceentity.sourceanalysis.arn",
+    "sourceentity.sourceanalysis.datasetreferences.*.datasetarn",
+    "datasetarns",
+    # dashboard / analysis
+    "dashboardid",
+    "analysisid",
+    # dataset
+    "datasetid",
+    "physicaltablemap.*.relationaltable.datasourcearn",
+    "physicaltablemap.*.customsql.datasourcearn",
+    "physicaltablemap.*.s3source.datasourcearn",
+    "logicaltablemap.*.source.datasetarn",
+    "datasetconfiguration.physicaltablemap.*.customsql.datasourcearn",
+    "datasetconfiguration.physicaltablemap.*.relationaltable.datasourcearn",
+    "rowlevelpermissiondataset.arn",
+    # datasource
+    "datasourceid",
+    "vpcconnectionproperties.vpcconnectionarn",
+    "credentials.copysourcearn",
+    # theme / vpc connection
+    "themeid",
+    "basethemeid",
+    "vpcconnectionid",
+]
+
+_LEAF = ""
+
+
+def compile_path_index(paths):
+    """Folds dotted paths into a nested dict keyed by path segment. A leaf is marked by the '' key."""
+    index = {}
+    for path in paths:
+        node = index
+        for segment in path.split('.'):
+            node = node.setdefault(segment, {})
+        node[_LEAF] = True
+    return index
+
+
+DEFAULT_PATH_INDEX = compile_path_index(ID_ARN_PATHS)
+
+
+def loads(data: bytes):
+    """Parses JSON bytes with orjson when available, otherwise the standard library."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(document) -> bytes:
+    """Serializes a document to compact JSON bytes with orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(document)
+    return json.dumps(document, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class JsonRewriter(MemberTransform):
+    """
+    Rewrites IDs and ARNs in bundle JSON by visiting only the paths in a precompiled index.
+
+    Each member is parsed once, only indexed string values are passed through the
+    ReplacementEngine, and the document is serialized again only when something changed.
+    Time spent parsing, rewriting and serializing is accumulated across the run in self.stats.
+    """
+
+    def __init__(self, replacement_engine: ReplacementEngine, path_index: dict = None):
+        super().__init__(replacement_engine)
+        self.path_index = path_index if path_index is not None else DEFAULT_PATH_INDEX
+
+    def _rewrite_value(self, value):
+        if isinstance(value, str):
+            new_value, _ = self.replacement_engine.replace_all(value)
+            if new_value != value:
+                self.stats["values_changed"] += 1
+            return new_value
+        if isinstance(value, list):
+            return [self._rewrite_value(item) for item in value]
+        return value
+
+    def _visit(self, node, index_node):
+        """Walks node along index_node only. Returns True if any value changed."""
+        changed = False
+        if isinstance(node, dict):
+            items = node.items()
+        elif isinstance(node, list):
+            items = enumerate(node)
+        else:
+            return False
+
+        wildcard = index_node.get("*")
+        for key, value in list(items):
+            for child_index in (index_node.get(key.lower()) if isinstance(key, str) else None, wildcard):
+                if not child_index:
+                    continue
+                if child_index.get(_LEAF):
+                    new_value = self._rewrite_value(value)
+                    if new_value != value:
+                        node[key] = new_value
+                        value = new_value
+                        changed = True
+                if self._visit(value, child_index):
+                    changed = True
+        return changed
+
+    def rewrite(self, member_name: str, data: bytes):
+        """Returns the rewritten member bytes, or None when the member is not JSON or nothing changed."""
+        self.stats["documents"] += 1
+
+        started = time.perf_counter()
+        try:
+            document = loads(data)
+        except ValueError as e:
+            self.stats["parse_errors"] += 1
+            self.messages.append(f"  ERROR: Could not parse {member_name} as JSON: {e}")
+            return None
+        finally:
+            self.stats["parse_seconds"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        changed = self._visit(document, self.path_index)
+        self.stats["rewrite_seconds"] += time.perf_counter() - started
+        if not changed:
+            return None
+
+        started = time.perf_counter()
+        new_data = dumps(document)
+        self.stats["serialize_seconds"] += time.perf_counter() - started
+        self.stats["rewritten"] += 1
+        return new_data
+
+    __call__ = rewrite
+
+    def print_report(self):
+        """Prints the per-run counts and timings for parse, rewrite and serialize."""
+        backend = "orjson" if orjson is not None else "json"
+        print(f"\nStructure-aware JSON rewrite report (backend: {backend}):")
+        print(f"  Documents parsed: {self.stats['documents']}, rewritten: {self.stats['rewritten']}, "
+              f"values changed: {self.stats['values_changed']}, parse errors: {self.stats['parse_errors']}")
+        print(f"  Parse: {self.stats['parse_seconds']:.3f}s, rewrite: {self.stats['rewrite_seconds']:.3f}s, "
+              f"serialize: {self.stats['serialize_seconds']:.3f}s (summed across workers)")
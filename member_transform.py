@@ -0,0 +1,45 @@
+from collections import Counter
+
+
+class MemberTransform:
+    """
+    Base for bundle member transforms that rewrite_bundle can run in worker processes.
+
+    Subclasses implement __call__(member_name, data) returning new bytes, or None to keep the
+    member unchanged, and keep their counters in self.stats. When the transform runs in a
+    worker, the worker's counters (and the replacement engine's hit counts) are shipped back
+    after each member and merged into the parent's copy. So the totals read the same as in
+    a serial run. Per-member progress lines go to self.messages rather than stdout, travel
+    the same way, and are printed by the parent with print_messages, in archive order.
+    """
+
+    def __init__(self, replacement_engine=None):
+        self.stats = Counter()
+        self.messages = []
+        self.replacement_engine = replacement_engine
+
+    def __call__(self, member_name: str, data: bytes):
+        raise NotImplementedError
+
+    def take_stats(self):
+        """Returns and resets the counters gathered since the last call (used inside workers)."""
+        stats, self.stats = self.stats, Counter()
+        messages, self.messages = self.messages, []
+        hits = Counter()
+        if self.replacement_engine is not None:
+            hits, self.replacement_engine.hit_counts = self.replacement_engine.hit_counts, Counter()
+        return stats, hits, messages
+
+    def merge_stats(self, worker_stats):
+        """Adds counters and messages returned by take_stats in a worker to this (parent) instance."""
+        stats, hits, messages = worker_stats
+        self.stats.update(stats)
+        self.messages.extend(messages)
+        if self.replacement_engine is not None:
+            self.replacement_engine.hit_counts.update(hits)
+
+    def print_messages(self, log=print):
+        """Prints and clears the per-member messages gathered so far."""
+        messages, self.messages = self.messages, []
+        for message in messages:
+            log(message)
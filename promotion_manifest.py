@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import zipfile
+
+import run_report
+from bundle_reader import Bundle
+from bundle_rewriter import (archive_members, copy_member_raw, remove_digest_sidecar, write_digest_sidecar,
+                             write_member_deterministic)
+from id_replacement import compile_matcher
+
+MANIFEST_VERSION = 1
+
+# Keys that change on every export without the asset itself changing
+VOLATILE_KEYS = {"permissions", "createdtime", "lastupdatedtime", "lastpublishedtime", "lastrefreshtime"}
+
+
+def _strip_volatile(node):
+    if isinstance(node, dict):
+        return {key: _strip_volatile(value) for key, value in node.items() if key.lower() not in VOLATILE_KEYS}
+    if isinstance(node, list):
+        return [_strip_volatile(item) for item in node]
+    return node
+
+
+def normalized_content_hash(data: bytes) -> str:
+    """
+    SHA-256 of a member's normalized content. JSON members are hashed with volatile keys
+    (timestamps, permissions) removed and keys sorted, so re-exports of an unchanged asset
+    hash the same. Anything that is not JSON is hashed as-is.
+    """
+    try:
+        document = json.loads(data)
+    except (ValueError, UnicodeDecodeError):
+        return hashlib.sha256(data).hexdigest()
+    canonical = json.dumps(_strip_volatile(document), sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def asset_id(member_name: str) -> str:
+    """Asset ID of a bundle member, e.g. 'dataset/<id>.json' -> '<id>'."""
+    return os.path.splitext(os.path.basename(member_name))[0]
+
+
+def build_manifest(bundle_path: str) -> dict:
+    """Returns {member_name: normalized content hash} for every file member of a bundle."""
+    with Bundle(bundle_path) as bundle:
+        return {member.name: normalized_content_hash(bundle.read(member.name)) for member in bundle.members}
+
+
+def load_manifest(manifest_path: str) -> dict:
+    """Loads the asset hashes of the last promoted bundle, or {} when there is no manifest yet."""
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported promotion manifest version {manifest.get('version')} in {manifest_path}")
+    return manifest.get("assets", {})
+
+
+def save_manifest(manifest_path: str, assets: dict, changed: list = None):
+    """Writes a promotion manifest. 'changed' lists the members that went into the incremental bundle."""
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    os.makedirs(manifest_dir, exist_ok=True)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": MANIFEST_VERSION, "assets": assets, "changed": changed or []}, f, indent=2, sort_keys=True)
+
+
+def changed_members(current: dict, previous: dict) -> list:
+    """Members that are new or whose normalized hash differs from the last promoted manifest."""
+    return sorted(name for name, digest in current.items() if previous.get(name) != digest)
+
+
+def with_dependencies(bundle_path: str, member_names: list) -> list:
+    """
+    Adds every member that the given members reference, transitively. A reference is any
+    occurrence of another member's asset ID in the content (bare ID or inside an ARN).
+    """
+    with Bundle(bundle_path) as bundle:
+        members_by_id = {}
+        for member in bundle.members:
+            # Short names (e.g. 'manifest') would match ordinary text; asset IDs are UUID-length
+            if len(member.asset_id) >= 8:
+                members_by_id.setdefault(member.asset_id, []).append(member.name)
+        matcher = compile_matcher(members_by_id)
+
+        selected = set(member_names)
+        pending = list(member_names)
+        while pending and matcher is not None:
+            name = pending.pop()
+            content = bundle.read(name).decode('utf-8', errors='replace')
+            for referenced_id in set(matcher.findall(content)):
+                for referenced_name in members_by_id[referenced_id]:
+                    if referenced_name not in selected:
+                        selected.add(referenced_name)
+                        pending.append(referenced_name)
+    return sorted(selected)
+
+
+def write_incremental_bundle(bundle_path: str, output_path: str, member_names: list, deterministic: bool = False):
+    """
+    Writes a bundle holding only member_names, copied as raw compressed bytes in their original order.
+    With deterministic, members are written as bundle_rewriter.rewrite_bundle does, with a digest sidecar.
+    """
+    keep = set(member_names)
+    partial_output_path = f"{output_path}.partial"
+    digest = hashlib.sha256() if deterministic else None
+    written = 0
+    with run_report.span("zip", bundle=os.path.basename(output_path), members=len(keep)) as record:
+        try:
+            with zipfile.ZipFile(bundle_path, 'r') as source_zip, \
+                    zipfile.ZipFile(partial_output_path, 'w', zipfile.ZIP_DEFLATED) as target_zip:
+                for info in archive_members(source_zip, deterministic):
+                    if info.filename not in keep:
+                        continue
+                    written += 1
+                    if deterministic:
+                        write_member_deterministic(target_zip, info.filename, source_zip.read(info), digest)
+                    else:
+                        copy_member_raw(source_zip, target_zip, info)
+            os.replace(partial_output_path, output_path)
+        finally:
+            if os.path.exists(partial_output_path):
+                os.remove(partial_output_path)
+        if deterministic:
+            write_digest_sidecar(output_path, digest.hexdigest(), written)
+        else:
+            remove_digest_sidecar(output_path)
+        record["bytes"] = os.path.getsize(output_path)
+
+
+def pending_manifest_path(manifest_path: str) -> str:
+    """Where an export leaves its manifest until the import confirms the promotion."""
+    return f"{manifest_path}.pending"
+
+
+def commit_pending_manifest(manifest_path: str) -> bool:
+    """Makes the pending manifest the last promoted one. Returns False when there is nothing pending."""
+    pending_path = pending_manifest_path(manifest_path)
+    if not os.path.exists(pending_path):
+        return False
+    os.replace(pending_path, manifest_path)
+    return True
+
+
+def pending_changes(manifest_path: str):
+    """Members listed as changed in the pending manifest, or None when there is no pending manifest."""
+    pending_path = pending_manifest_path(manifest_path)
+    if not os.path.exists(pending_path):
+        return None
+    with open(pending_path, 'r', encoding='utf-8') as f:
+        return json.load(f).get("changed", [])
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import re
+import uuid
+
+from id_replacement import ReplacementEngine
+
+# Versions of the promotion-map file format this code understands
+SUPPORTED_VERSIONS = (1,)
+# Bump when the compiled artifact layout or the validation rules change, so stale artifacts are rebuilt
+COMPILED_FORMAT = 1
+DEFAULT_COMPILED_MAP_DIR = os.environ.get(
+    "QUICKSIGHT_PROMOTION_MAP_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "quicksight-promotion-maps"))
+
+MAP_SECTIONS = ("account_ids", "ids", "strings", "custom_sql_datasources")
+
+ACCOUNT_ID_PATTERN = re.compile(r"^\d{12}$")
+UUID_PATTERN = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$")
+# Five dash-separated hex groups: meant to be a UUID, so it has to be a well-formed one
+UUID_LIKE_PATTERN = re.compile(r"^[0-9a-fA-F]+(?:-[0-9a-fA-F]+){4}$")
+QUICKSIGHT_ID_PATTERN = re.compile(r"^[\w-]{1,512}$")
+
+
+class PromotionMapError(ValueError):
+    """A promotion-map file that cannot be used; the message lists every problem found."""
+
+
+def _validate_id(section: str, value: str, errors: list):
+    if UUID_LIKE_PATTERN.match(value):
+        if not UUID_PATTERN.match(value):
+            errors.append(f"{section}: '{value}' looks like a UUID but is malformed ({len(value)} characters)")
+    elif not QUICKSIGHT_ID_PATTERN.match(value):
+        errors.append(f"{section}: '{value}' is not a valid QuickSight ID")
+
+
+def validate_promotion_map(document) -> list:
+    """
+    Checks a parsed promotion-map file. Returns a list of problems (empty when the map is usable):
+    unknown version or sections, malformed account IDs and UUIDs, identity mappings, a value in
+    two sections mapped differently, more than one account ID pair, and chains or cycles
+    (a replacement value that is itself replaced).
+    """
+    if not isinstance(document, dict):
+        return ["the promotion map must be a JSON object"]
+    errors = []
+    if document.get("version") not in SUPPORTED_VERSIONS:
+        errors.append(f"unsupported version {document.get('version')!r} (supported: {', '.join(map(str, SUPPORTED_VERSIONS))})")
+    unknown = set(document) - set(MAP_SECTIONS) - {"version", "source", "target", "description"}
+    if unknown:
+        errors.append(f"unknown keys: {', '.join(sorted(unknown))}")
+
+    replacements = {}
+    for section in MAP_SECTIONS:
+        mapping = document.get(section, {})
+        if not isinstance(mapping, dict):
+            errors.append(f"{section}: must be an object of OLD: NEW pairs")
+            continue
+        for old_value, new_value in mapping.items():
+            if not isinstance(new_value, str) or not old_value or not new_value:
+                errors.append(f"{section}: '{old_value}' must map to a non-empty string")
+                continue
+            if old_value == new_value:
+                errors.append(f"{section}: '{old_value}' maps to itself")
+            if section == "account_ids":
+                for value in (old_value, new_value):
+                    if not ACCOUNT_ID_PATTERN.match(value):
+                        errors.append(f"account_ids: '{value}' is not a 12-digit AWS account ID")
+            elif section in ("ids", "custom_sql_datasources"):
+                _validate_id(section, old_value, errors)
+                _validate_id(section, new_value, errors)
+            if section == "custom_sql_datasources":
+                continue  # Applied to CustomSql data source ARNs only, not to the text
+            if replacements.get(old_value, new_value) != new_value:
+                errors.append(f"{section}: '{old_value}' is mapped to both '{replacements[old_value]}' and '{new_value}'")
+            replacements[old_value] = new_value
+    if len(document.get("account_ids") or {}) > 1:
+        errors.append("account_ids: at most one account ID pair is supported")
+
+    for old_value in replacements:
+        seen = [old_value]
+        value = replacements[old_value]
+        while value in replacements and value not in seen:
+            seen.append(value)
+            value = replacements[value]
+        if len(seen) > 1:
+            kind = "cycle" if value in seen else "chain"
+            errors.append(f"{kind}: {' -> '.join(seen + [value])} (replacements are applied once, never chained)")
+    return errors
+
+
+class PromotionMap:
+    """
+    A validated promotion map for one environment pair (e.g. dev -> qa).
+
+    ids and strings are replaced wherever IDs are rewritten, account_ids in the data definition
+    folders, custom_sql_datasources in dataset CustomSql tables (bundletool only). The matcher
+    regexes are compiled once and kept in the artifact, so loading a compiled map skips both the
+    validation and the trie construction.
+    """
+
+    def __init__(self, document: dict, digest: str, patterns: dict = None, bundle_patterns: dict = None):
+        self.document = document
+        self.digest = digest
+        self.source = document.get("source")
+        self.target = document.get("target")
+        self.account_ids = dict(document.get("account_ids") or {})
+        self.ids = dict(document.get("ids") or {})
+        self.strings = dict(document.get("strings") or {})
+        self.custom_sql_datasources = dict(document.get("custom_sql_datasources") or {})
+        self.old_account_id, self.new_account_id = next(iter(self.account_ids.items()), (None, None))
+        self._patterns = patterns or ReplacementEngine(
+            self.id_replacements, self.old_account_id, self.new_account_id).patterns()
+        self._bundle_patterns = bundle_patterns or ReplacementEngine(self.text_replacements).patterns()
+
+    @property
+    def id_replacements(self) -> dict:
+        """The ID map for the dashboard folder: ids plus strings."""
+        return {**self.ids, **self.strings}
+
+    @property
+    def text_replacements(self) -> dict:
+        """Everything replaced in a whole-text rewrite: account IDs, ids and strings."""
+        return {**self.account_ids, **self.ids, **self.strings}
+
+    @property
+    def asset_ids(self) -> set:
+        """Every asset ID the map mentions, as source or target; bundle_validator treats these as resolvable."""
+        ids = set()
+        for mapping in (self.ids, self.custom_sql_datasources):
+            ids.update(mapping)
+            ids.update(mapping.values())
+        return ids
+
+    def replacement_engine(self) -> ReplacementEngine:
+        """A fresh engine (own hit counts) for process_qs_file: ids/strings in dashboards, account IDs in data files."""
+        return ReplacementEngine(self.id_replacements, self.old_account_id, self.new_account_id,
+                                 patterns=self._patterns)
+
+    def bundle_replacement_engine(self) -> ReplacementEngine:
+        """A fresh engine whose replace_ids applies text_replacements, for bundletool's whole-text rewrite."""
+        return ReplacementEngine(self.text_replacements, patterns=self._bundle_patterns)
+
+    def describe(self) -> str:
+        return (f"promotion map {self.source or '?'} -> {self.target or '?'} ({self.digest[:12]}): "
+                f"{len(self.ids)} IDs, {len(self.strings)} strings, {len(self.account_ids)} account IDs, "
+                f"{len(self.custom_sql_datasources)} CustomSql data sources")
+
+    def to_artifact(self) -> dict:
+        return {"format": COMPILED_FORMAT, "digest": self.digest, "map": self.document,
+                "patterns": self._patterns, "bundle_patterns": self._bundle_patterns}
+
+
+def compile_promotion_map(content: bytes) -> PromotionMap:
+    """Parses and validates a promotion-map file's content. Raises PromotionMapError listing every problem."""
+    try:
+        document = json.loads(content)
+    except ValueError as e:
+        raise PromotionMapError(f"not valid JSON: {e}")
+    errors = validate_promotion_map(document)
+    if errors:
+        raise PromotionMapError("\n".join(errors))
+    return PromotionMap(document, hashlib.sha256(content).hexdigest())
+
+
+def load_promotion_map(map_path: str, cache_dir: str = DEFAULT_COMPILED_MAP_DIR, log=print) -> PromotionMap:
+    """
+    Loads a promotion-map file through the compiled-artifact cache, keyed by the file's sha256:
+    an unchanged map is loaded from its artifact without re-validating or recompiling it.
+    A cache that cannot be read or written only costs the compile.
+    """
+    with open(map_path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    artifact_path = os.path.join(cache_dir, f"{digest}.json") if cache_dir else None
+
+    if artifact_path and os.path.exists(artifact_path):
+        try:
+            with open(artifact_path, 'r', encoding='utf-8') as f:
+                artifact = json.load(f)
+            if artifact.get("format") == COMPILED_FORMAT and artifact.get("digest") == digest:
+                return PromotionMap(artifact["map"], digest, artifact["patterns"], artifact["bundle_patterns"])
+        except (OSError, ValueError, KeyError) as e:
+            log(f"Warning: Ignoring unreadable compiled promotion map {artifact_path}: {e}")
+
+    try:
+        promotion_map = compile_promotion_map(content)
+    except PromotionMapError as e:
+        raise PromotionMapError(f"{map_path}:\n{e}")
+    if artifact_path:
+        partial_path = f"{artifact_path}.{uuid.uuid4().hex}.partial"
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(partial_path, 'w', encoding='utf-8') as f:
+                json.dump(promotion_map.to_artifact(), f)
+            os.replace(partial_path, artifact_path)
+        except OSError as e:
+            log(f"Warning: Could not cache the compiled promotion map in {cache_dir}: {e}")
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+    return promotion_map
@@ -0,0 +1,136 @@
+import atexit
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+METRIC_PREFIX = "quicksight_promotion"
+
+# Numeric span attributes that are summed per stage in the summary and the OpenMetrics output
+SUMMED_ATTRIBUTES = ("bytes", "members")
+
+
+class RunReport:
+    """
+    Timing spans for one promotion run: one span per stage execution (export, poll, download,
+    rewrite, zip, upload, import) with the bytes and member counts it handled.
+
+    Spans can be recorded from any thread or asyncio task. Attributes set with context() (e.g. the
+    dashboard ID in a batch worker) are added to every span recorded by that thread or task.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._attributes = contextvars.ContextVar("run_report_attributes", default={})
+        self.spans = []
+
+    def _context(self) -> dict:
+        return self._attributes.get()
+
+    @contextlib.contextmanager
+    def context(self, **attributes):
+        token = self._attributes.set({**self._context(), **attributes})
+        try:
+            yield
+        finally:
+            self._attributes.reset(token)
+
+    @contextlib.contextmanager
+    def span(self, stage: str, **attributes):
+        """Times the with-block. The yielded dict takes further attributes, e.g. span["bytes"] = n."""
+        record = OrderedDict(stage=stage, start_offset_seconds=round(time.perf_counter() - self._started, 6))
+        record.update(self._context())
+        record.update(attributes)
+        started = time.perf_counter()
+        try:
+            yield record
+            record.setdefault("status", "ok")
+        except BaseException as e:
+            record["status"] = "error"
+            record["error"] = str(e)
+            raise
+        finally:
+            record["seconds"] = round(time.perf_counter() - started, 6)
+            with self._lock:
+                self.spans.append(record)
+
+    def summary(self) -> dict:
+        """Per stage: number of spans, total seconds, and totals of the summed attributes."""
+        stages = OrderedDict()
+        with self._lock:
+            spans = list(self.spans)
+        for record in spans:
+            totals = stages.setdefault(record["stage"], OrderedDict(count=0, seconds=0.0, errors=0))
+            totals["count"] += 1
+            totals["seconds"] = round(totals["seconds"] + record["seconds"], 6)
+            totals["errors"] += record["status"] == "error"
+            for attribute in SUMMED_ATTRIBUTES:
+                if isinstance(record.get(attribute), (int, float)):
+                    totals[attribute] = totals.get(attribute, 0) + record[attribute]
+        return stages
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "started_at": self.started_at,
+            "wall_seconds": round(time.perf_counter() - self._started, 6),
+            "stages": self.summary(),
+            "spans": spans,
+        }
+
+    def to_openmetrics(self) -> str:
+        """The per-stage summary in OpenMetrics text format."""
+        summary = self.summary()
+        lines = [
+            f"# TYPE {METRIC_PREFIX}_run_seconds gauge",
+            f"# UNIT {METRIC_PREFIX}_run_seconds seconds",
+            f"{METRIC_PREFIX}_run_seconds {time.perf_counter() - self._started:.6f}",
+        ]
+        families = [("stage_seconds", "seconds", "seconds"), ("stage_spans", "count", None),
+                     ("stage_errors", "errors", None)] + [(f"stage_{attribute}", attribute, None) for attribute in SUMMED_ATTRIBUTES]
+        for family, key, unit in families:
+            samples = [(stage, totals[key]) for stage, totals in summary.items() if key in totals]
+            if not samples:
+                continue
+            lines.append(f"# TYPE {METRIC_PREFIX}_{family} counter")
+            if unit:
+                lines.append(f"# UNIT {METRIC_PREFIX}_{family} {unit}")
+            for stage, value in samples:
+                lines.append(f'{METRIC_PREFIX}_{family}_total{{stage="{stage}"}} {value}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path: str = None, openmetrics_path: str = None, log=print):
+        """Writes the JSON report and/or the OpenMetrics text file."""
+        for path, render in ((json_path, lambda: json.dumps(self.to_dict(), indent=2)), (openmetrics_path, self.to_openmetrics)):
+            if not path:
+                continue
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(render())
+            log(f"Run report written to {path}")
+
+
+# The process-wide report that the library modules record into
+REPORT = RunReport()
+
+
+def span(stage: str, **attributes):
+    return REPORT.span(stage, **attributes)
+
+
+def context(**attributes):
+    return REPORT.context(**attributes)
+
+
+def write_on_exit(json_path: str = None, openmetrics_path: str = None, log=print):
+    """Writes the process-wide report when the script exits, including via sys.exit on failure."""
+    if json_path or openmetrics_path:
+        atexit.register(REPORT.write, json_path, openmetrics_path, log)
@@ -0,0 +1,114 @@
+import datetime
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bundle_cache import BundleCache, bundle_cache_key  # noqa: E402
+
+ACCOUNT_ID = "111111111111"
+ARN_PREFIX = f"arn:aws:quicksight:us-east-1:{ACCOUNT_ID}"
+DASHBOARD_ARN = f"{ARN_PREFIX}:dashboard/sales"
+DATASET_ARN = f"{ARN_PREFIX}:dataset/orders"
+DATASOURCE_ARN = f"{ARN_PREFIX}:datasource/warehouse"
+
+
+class StubQuickSight:
+    """A dashboard on a dataset on a data source, each with a LastUpdatedTime from last_updated."""
+
+    def __init__(self, **last_updated):
+        self.last_updated = dict({"sales": datetime.datetime(2024, 1, 1), "orders": datetime.datetime(2024, 1, 2),
+                                  "warehouse": datetime.datetime(2024, 1, 3)}, **last_updated)
+
+    def _times(self, asset_id: str) -> dict:
+        return {"LastUpdatedTime": self.last_updated[asset_id]} if self.last_updated[asset_id] else {}
+
+    def describe_dashboard(self, DashboardId, **kwargs):
+        return {"Dashboard": dict(self._times(DashboardId), Version={"DataSetArns": [DATASET_ARN]})}
+
+    def describe_data_set(self, DataSetId, **kwargs):
+        return {"DataSet": dict(self._times(DataSetId), PhysicalTableMap={
+            "t1": {"RelationalTable": {"DataSourceArn": DATASOURCE_ARN}}})}
+
+    def describe_data_source(self, DataSourceId, **kwargs):
+        return {"DataSource": self._times(DataSourceId)}
+
+
+def _key(client, include_all_dependencies=True):
+    return bundle_cache_key(client, ACCOUNT_ID, "us-east-1", [DASHBOARD_ARN], include_all_dependencies, log=lambda message: None)
+
+
+class BundleCacheKeyTest(unittest.TestCase):
+
+    def test_unchanged_assets_give_the_same_key(self):
+        self.assertEqual(_key(StubQuickSight()), _key(StubQuickSight()))
+
+    def test_changed_dependency_misses(self):
+        changed = StubQuickSight(warehouse=datetime.datetime(2024, 2, 1))
+        self.assertNotEqual(_key(StubQuickSight()), _key(changed))
+        # Without dependencies in the bundle, only the exported assets count
+        self.assertEqual(_key(StubQuickSight(), False), _key(changed, False))
+
+    def test_export_options_are_part_of_the_key(self):
+        self.assertNotEqual(_key(StubQuickSight()), _key(StubQuickSight(), False))
+        self.assertNotEqual(_key(StubQuickSight()),
+                            bundle_cache_key(StubQuickSight(), ACCOUNT_ID, "eu-west-1", [DASHBOARD_ARN], True, log=lambda m: None))
+
+    def test_missing_timestamp_disables_the_cache(self):
+        self.assertIsNone(_key(StubQuickSight(orders=None)))
+
+
+class BundleCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory = temp_dir.name
+        self.cache = BundleCache(os.path.join(self.directory, "cache"), max_bytes=2500, log=lambda message: None)
+
+    def _store(self, key: str, size: int, mtime: float):
+        path = os.path.join(self.directory, f"{key}.download")
+        with open(path, "wb") as f:
+            f.write(key.encode()[:1] * size)
+        self.cache.store(key, path)
+        if os.path.exists(self.cache._entry_path(key)):
+            os.utime(self.cache._entry_path(key), (mtime, mtime))
+
+    def _cached(self) -> list:
+        return sorted(name[:-len(".qs")] for name in os.listdir(self.cache.cache_dir))
+
+    def _size(self) -> int:
+        return sum(os.path.getsize(os.path.join(self.cache.cache_dir, name)) for name in os.listdir(self.cache.cache_dir))
+
+    def test_fetch(self):
+        self._store("a", 100, 1000)
+        output_path = os.path.join(self.directory, "fetched.qs")
+        self.assertTrue(self.cache.fetch("a", output_path))
+        with open(output_path, "rb") as f:
+            self.assertEqual(f.read(), b"a" * 100)
+        self.assertFalse(self.cache.fetch("b", output_path))
+
+    def test_eviction_stays_under_the_limit(self):
+        for index, key in enumerate("abcdef"):
+            self._store(key, 1000, 1000 + index)
+            self.assertLessEqual(self._size(), self.cache.max_bytes)
+        self.assertEqual(self._cached(), ["e", "f"])
+
+    def test_least_recently_used_is_evicted_first(self):
+        self._store("a", 1000, 1000)
+        self._store("b", 1000, 1001)
+        # A hit refreshes a's mtime, so b is now the least recently used
+        self.assertTrue(self.cache.fetch("a", os.path.join(self.directory, "fetched.qs")))
+        self._store("c", 1000, 2 ** 31)  # store() evicts before this mtime is set
+        self.assertEqual(self._cached(), ["a", "c"])
+
+    def test_bundle_larger_than_the_cache_is_not_kept(self):
+        self._store("a", 1000, 1000)
+        self._store("b", 3000, 1001)
+        self.assertEqual(self._cached(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bundle_diff import ADDED, CHANGED, REMOVED, VOLATILE_KEYS, diff_documents  # noqa: E402
+
+
+class DiffDocumentsTest(unittest.TestCase):
+
+    def test_volatile_keys_are_ignored_at_the_top_level_only(self):
+        old = {"Status": 200, "RequestId": "a", "CreatedTime": 1, "Version": {"CreatedTime": 1, "Status": "CREATION_SUCCESSFUL"},
+               "Definition": {"Parameters": {"Status": "ACTIVE"}, "LastUpdatedTime": 1}}
+        new = {"Status": 201, "RequestId": "b", "CreatedTime": 2, "Version": {"CreatedTime": 2, "Status": "CREATION_FAILED"},
+               "Definition": {"Parameters": {"Status": "DISABLED"}, "LastUpdatedTime": 2}}
+        self.assertEqual(sorted(path for _, path, _, _ in diff_documents(old, new)), [
+            "Definition.LastUpdatedTime", "Definition.Parameters.Status", "Version.Status"])
+
+    def test_path_qualified_ignore_keys(self):
+        old = {"Version": {"Status": "CREATION_SUCCESSFUL"}, "Sheets": [{"Status": "a"}]}
+        new = {"Version": {"Status": "CREATION_FAILED"}, "Sheets": [{"Status": "b"}]}
+        changes = diff_documents(old, new, VOLATILE_KEYS | {"version.status", "sheets.status"})
+        self.assertEqual(changes, [])
+
+    def test_renamed_list_item_is_a_change(self):
+        old = {"Columns": [{"Name": "region", "Type": "STRING"}, {"Name": "sales", "Type": "DECIMAL"}]}
+        new = {"Columns": [{"Name": "area", "Type": "STRING"}, {"Name": "sales", "Type": "DECIMAL"}]}
+        self.assertEqual(diff_documents(old, new), [(CHANGED, "Columns[0].Name", "region", "area")])
+
+    def test_list_items_matched_by_id(self):
+        old = {"Sheets": [{"SheetId": "a", "Name": "A"}, {"SheetId": "b", "Name": "B"}]}
+        new = {"Sheets": [{"SheetId": "c", "Name": "C"}, {"SheetId": "a", "Name": "A"}, {"SheetId": "b", "Name": "B2"}]}
+        self.assertEqual(diff_documents(old, new), [
+            (CHANGED, "Sheets[SheetId=b].Name", "B", "B2"),
+            (ADDED, "Sheets[SheetId=c]", None, {"SheetId": "c", "Name": "C"}),
+        ])
+        self.assertIn((REMOVED, "Sheets[SheetId=c]", {"SheetId": "c", "Name": "C"}, None), diff_documents(new, old))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import urllib3  # noqa: E402
+
+from bundle_download import download_bundle  # noqa: E402
+
+BUNDLE = os.urandom(3000)
+
+
+class StubResponse:
+
+    def __init__(self, status: int, headers: dict, chunks: list, drop: bool = False):
+        self.status = status
+        self.headers = headers
+        self.chunks = chunks
+        self.drop = drop
+
+    def stream(self, chunk_size):
+        yield from self.chunks
+        if self.drop:
+            raise urllib3.exceptions.ProtocolError("Connection broken")
+
+    def release_conn(self):
+        pass
+
+
+class StubPoolManager:
+    """Serves BUNDLE: the first transfer drops after 1000 bytes, the first resume cannot connect."""
+
+    def __init__(self):
+        self.ranges = []
+
+    def request(self, method, url, headers=None, **kwargs):
+        self.ranges.append(headers.get("Range"))
+        if len(self.ranges) == 1:
+            return StubResponse(200, {"Content-Length": str(len(BUNDLE))}, [BUNDLE[:1000]], drop=True)
+        if len(self.ranges) == 2:
+            raise urllib3.exceptions.NewConnectionError(None, "Failed to establish a new connection")
+        start = int(headers["Range"][len("bytes="):-1])
+        return StubResponse(206, {"Content-Range": f"bytes {start}-{len(BUNDLE) - 1}/{len(BUNDLE)}"}, [BUNDLE[start:]])
+
+
+class DownloadBundleTest(unittest.TestCase):
+
+    def test_connection_error_on_resume_is_resumed(self):
+        http = StubPoolManager()
+        with tempfile.TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, "bundle.qs")
+            metrics = download_bundle("https://example.com/bundle", output_path, chunk_size=1024,
+                                      expected_sha256=hashlib.sha256(BUNDLE).hexdigest(), http=http)
+            with open(output_path, "rb") as f:
+                self.assertEqual(f.read(), BUNDLE)
+        self.assertEqual(http.ranges, [None, "bytes=1000-", "bytes=1000-"])
+        self.assertEqual(metrics["resumes"], 2)
+        self.assertEqual(metrics["bytes"], len(BUNDLE))
+
+    def test_connection_errors_stop_after_max_resumes(self):
+        http = StubPoolManager()
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(urllib3.exceptions.NewConnectionError):
+                download_bundle("https://example.com/bundle", os.path.join(directory, "bundle.qs"), max_resumes=1, http=http)
+
+
+if __name__ == "__main__":
+    unittest.main()
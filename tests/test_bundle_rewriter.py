@@ -0,0 +1,147 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bundle_rewriter  # noqa: E402
+from benchmark import NEW_ACCOUNT_ID, OLD_ACCOUNT_ID, generate_bundle  # noqa: E402
+from bundle_rewriter import copy_member_raw, process_qs_file, process_qs_file_fanout, read_digest_sidecar  # noqa: E402
+from id_replacement import ReplacementEngine  # noqa: E402
+
+
+def _contents(path: str) -> dict:
+    with zipfile.ZipFile(path) as bundle_zip:
+        assert bundle_zip.testzip() is None
+        return {info.filename: bundle_zip.read(info) for info in bundle_zip.infolist()}
+
+
+class BundleTestCase(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory = temp_dir.name
+        self.source = os.path.join(self.directory, "source.zip")
+        self.replacements = generate_bundle(self.source, dashboards=4, visuals_per_dashboard=3, datasets=3, nested_zips=1)
+
+    def _process(self, name: str, **kwargs) -> str:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return process_qs_file(self.source, os.path.join(self.directory, name), self.replacements,
+                                   OLD_ACCOUNT_ID, NEW_ACCOUNT_ID, **kwargs)
+
+    def _assert_rewritten(self, output_path: str):
+        self.assertIsNotNone(output_path)
+        self.assertTrue(output_path.endswith(".qs"))
+        source, output = _contents(self.source), _contents(output_path)
+        self.assertEqual(sorted(source), sorted(output))
+        for name, data in output.items():
+            if name.startswith("dataset/"):
+                self.assertIn(f":{NEW_ACCOUNT_ID}:dataset/".encode(), data)
+                self.assertNotIn(f":{OLD_ACCOUNT_ID}:dataset/".encode(), data)
+            if name.startswith("dashboard/"):
+                for old_id in self.replacements:
+                    self.assertNotIn(f"dataset/{old_id}".encode(), data)
+        # Nested archives are not selected by the text rewrite and are raw-copied byte for byte
+        self.assertEqual(source["attachments/0.zip"], output["attachments/0.zip"])
+
+
+class ProcessQsFileTest(BundleTestCase):
+
+    def test_text_rewrite(self):
+        self._assert_rewritten(self._process("text.zip"))
+
+    def test_json_rewrite(self):
+        self._assert_rewritten(self._process("json.zip", rewrite_mode="json"))
+
+    def test_rewrite_without_raw_copy_support(self):
+        with mock.patch.object(bundle_rewriter, "RAW_COPY_SUPPORTED", False):
+            self._assert_rewritten(self._process("fallback.zip"))
+
+    def test_parallel_output_matches_serial(self):
+        outputs = []
+        for workers in (1, 2):
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                process_qs_file(self.source, os.path.join(self.directory, f"workers-{workers}.zip"), self.replacements,
+                                OLD_ACCOUNT_ID, NEW_ACCOUNT_ID, workers=workers)
+            outputs.append(stdout.getvalue().replace(f"workers-{workers}", "output"))
+        self.assertIn("Processing dashboard file", outputs[0])
+        self.assertEqual(outputs[0], outputs[1])
+
+
+class DeterministicRewriteTest(BundleTestCase):
+
+    def _read(self, path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    def _assert_identical(self, first: str, second: str):
+        self.assertEqual(self._read(first), self._read(second))
+        first_digest, second_digest = read_digest_sidecar(first), read_digest_sidecar(second)
+        self.assertIsNotNone(first_digest)
+        self.assertEqual(first_digest, second_digest)
+
+    def test_rewrites_are_byte_identical(self):
+        first = self._process("first.zip", deterministic=True)
+        second = self._process("second.zip", deterministic=True)
+        self._assert_identical(first, second)
+        self._assert_rewritten(first)
+
+    def test_source_order_and_timestamps_do_not_matter(self):
+        reordered = os.path.join(self.directory, "reordered.zip")
+        with zipfile.ZipFile(self.source) as source_zip, zipfile.ZipFile(reordered, 'w', zipfile.ZIP_STORED) as target_zip:
+            for info in reversed(source_zip.infolist()):
+                target_zip.writestr(zipfile.ZipInfo(info.filename, date_time=(2024, 5, 6, 7, 8, 10)), source_zip.read(info))
+        first = self._process("first.zip", deterministic=True)
+        self.source = reordered
+        self._assert_identical(first, self._process("second.zip", deterministic=True))
+
+    def test_parallel_and_fanout_match_serial(self):
+        serial = self._process("serial.zip", deterministic=True, rewrite_mode="json")
+        self._assert_identical(serial, self._process("parallel.zip", deterministic=True, rewrite_mode="json", workers=2))
+        engine = ReplacementEngine(self.replacements, OLD_ACCOUNT_ID, NEW_ACCOUNT_ID)
+        with contextlib.redirect_stdout(io.StringIO()):
+            fanout = process_qs_file_fanout(self.source, [(os.path.join(self.directory, "fanout.zip"), engine)],
+                                            rewrite_mode="json", deterministic=True)
+        self._assert_identical(serial, fanout[0])
+
+
+class CopyMemberRawTest(unittest.TestCase):
+
+    def test_member_with_data_descriptor(self):
+        # A member streamed to an unseekable file carries a data descriptor after its data
+        class Unseekable(io.RawIOBase):
+            def __init__(self):
+                self.buffer = bytearray()
+
+            def writable(self):
+                return True
+
+            def write(self, data):
+                self.buffer += data
+                return len(data)
+
+        stream = Unseekable()
+        with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as source_zip:
+            with source_zip.open("dashboard/a.json", 'w') as member:
+                member.write(b'{"dashboardId": "a"}' * 100)
+        source = io.BytesIO(bytes(stream.buffer))
+        target = io.BytesIO()
+        with zipfile.ZipFile(source) as source_zip, zipfile.ZipFile(target, 'w') as target_zip:
+            info = source_zip.getinfo("dashboard/a.json")
+            self.assertTrue(info.flag_bits & bundle_rewriter.DATA_DESCRIPTOR_FLAG)
+            copy_member_raw(source_zip, target_zip, info)
+        with zipfile.ZipFile(target) as target_zip:
+            self.assertIsNone(target_zip.testzip())
+            self.assertEqual(target_zip.read("dashboard/a.json"), b'{"dashboardId": "a"}' * 100)
+            self.assertFalse(target_zip.getinfo("dashboard/a.json").flag_bits & bundle_rewriter.DATA_DESCRIPTOR_FLAG)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import boto3  # noqa: E402
+from botocore.exceptions import ClientError  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+import folderimport  # noqa: E402
+from bundle_staging import DEFAULT_PART_SIZE, build_import_source  # noqa: E402
+
+BUCKET = "staging-bucket"
+MB = 1024 * 1024
+
+
+class StubQuickSight:
+    """Records the import request and checks the staged object is in S3 when the job starts."""
+
+    def __init__(self, s3_client, final_status="SUCCESSFUL", start_error=None):
+        self.s3_client = s3_client
+        self.final_status = final_status
+        self.start_error = start_error
+        self.import_source = None
+        self.staged_parts = None
+
+    def start_asset_bundle_import_job(self, **kwargs):
+        self.import_source = kwargs["AssetBundleImportSource"]
+        if "S3Uri" in self.import_source:
+            key = self.import_source["S3Uri"][len(f"s3://{BUCKET}/"):]
+            etag = self.s3_client.head_object(Bucket=BUCKET, Key=key)["ETag"].strip('"')
+            # A multipart upload's ETag ends in -<number of parts>
+            self.staged_parts = int(etag.rpartition("-")[2]) if "-" in etag else 1
+        if self.start_error:
+            raise self.start_error
+        return {"AssetBundleImportJobId": kwargs["AssetBundleImportJobId"], "Status": 202}
+
+    def describe_asset_bundle_import_job(self, **kwargs):
+        return {"JobStatus": self.final_status, "Errors": []}
+
+
+@mock_aws
+class StagedImportTest(unittest.TestCase):
+
+    def setUp(self):
+        environment = mock.patch.dict(os.environ, {"AWS_ACCESS_KEY_ID": "testing", "AWS_SECRET_ACCESS_KEY": "testing",
+                                                   "AWS_SESSION_TOKEN": "testing", "AWS_DEFAULT_REGION": "us-east-1"})
+        environment.start()
+        self.addCleanup(environment.stop)
+        self.s3 = boto3.client("s3", region_name="us-east-1")
+        self.s3.create_bucket(Bucket=BUCKET)
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory = temp_dir.name
+
+    def _bundle(self, size: int) -> str:
+        path = os.path.join(self.directory, f"bundle-{size}.qs")
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        return path
+
+    def _import(self, bundle_path: str, quicksight: StubQuickSight) -> bool:
+        clients = {"quicksight": quicksight, "s3": self.s3}
+        with mock.patch.object(folderimport, "get_client", lambda service, *args, **kwargs: clients[service]):
+            return folderimport.import_quicksight_bundle(bundle_path, staging_bucket=BUCKET, validate=False)
+
+    def _staged_objects(self) -> list:
+        return self.s3.list_objects_v2(Bucket=BUCKET).get("Contents", [])
+
+    def test_threshold(self):
+        small_path, large_path = self._bundle(20 * MB), self._bundle(20 * MB + 1)
+        source, staged = build_import_source(small_path, self.s3, BUCKET, log=lambda message: None)
+        self.assertEqual(list(source), ["Body"])
+        self.assertIsNone(staged)
+        source, staged = build_import_source(large_path, self.s3, BUCKET, log=lambda message: None)
+        self.assertEqual(source, {"S3Uri": f"s3://{BUCKET}/{staged[1]}"})
+        self.assertEqual(staged[0], BUCKET)
+        self.assertTrue(staged[1].endswith("/bundle-20971521.qs"))
+
+    def test_small_bundle_is_sent_inline(self):
+        quicksight = StubQuickSight(self.s3)
+        self.assertTrue(self._import(self._bundle(MB), quicksight))
+        self.assertEqual(list(quicksight.import_source), ["Body"])
+        self.assertEqual(self._staged_objects(), [])
+
+    def test_large_bundle_is_staged_and_removed_after_success(self):
+        quicksight = StubQuickSight(self.s3)
+        self.assertTrue(self._import(self._bundle(40 * MB), quicksight))
+        self.assertTrue(quicksight.import_source["S3Uri"].startswith(f"s3://{BUCKET}/quicksight-bundles/"))
+        self.assertEqual(quicksight.staged_parts, -(-40 * MB // DEFAULT_PART_SIZE))
+        self.assertEqual(self._staged_objects(), [])
+
+    def test_staged_bundle_is_removed_after_failed_job(self):
+        quicksight = StubQuickSight(self.s3, final_status="FAILED")
+        self.assertFalse(self._import(self._bundle(21 * MB), quicksight))
+        self.assertIn("S3Uri", quicksight.import_source)
+        self.assertEqual(self._staged_objects(), [])
+
+    def test_staged_bundle_is_removed_when_the_job_does_not_start(self):
+        error = ClientError({"Error": {"Code": "ValidationException", "Message": "bad bundle"}}, "StartAssetBundleImportJob")
+        quicksight = StubQuickSight(self.s3, start_error=error)
+        self.assertFalse(self._import(self._bundle(21 * MB), quicksight))
+        self.assertEqual(quicksight.staged_parts, 2)
+        self.assertEqual(self._staged_objects(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bundle_validator import validate_member  # noqa: E402
+
+
+def _dashboard(visual: dict, **definition) -> bytes:
+    return json.dumps({"dashboardId": "d1", "definition": dict(
+        {"sheets": [{"sheetId": "s1", "visuals": [visual]}]}, **definition)}).encode()
+
+
+def _table_visual(field_wells: dict, **configuration) -> dict:
+    return {"TableVisual": {"VisualId": "v1", "ChartConfiguration": dict({"FieldWells": field_wells}, **configuration)}}
+
+
+AGGREGATED_WELLS = {"TableAggregatedFieldWells": {
+    "GroupBy": [{"CategoricalDimensionField": {"FieldId": "region", "Column": {"DataSetIdentifier": "ds", "ColumnName": "region"}}}],
+    "Values": [{"CalculatedMeasureField": {"FieldId": "margin", "Expression": "sum({profit}) / sum({sales})"}}],
+}}
+
+
+def _checks(data: bytes) -> list:
+    return [(item["check"], item["path"]) for item in validate_member("dashboard/d1.json", data)["findings"]]
+
+
+class VisualFieldTest(unittest.TestCase):
+
+    def test_calculated_measure_is_declared(self):
+        self.assertEqual(_checks(_dashboard(_table_visual(AGGREGATED_WELLS))), [])
+
+    def test_sort_and_tooltip_on_calculated_field(self):
+        visual = _table_visual(AGGREGATED_WELLS, SortConfiguration={"RowSort": [
+            {"FieldSort": {"FieldId": "margin", "Direction": "DESC"}}]},
+            Tooltip={"FieldBasedTooltip": {"TooltipFields": [{"FieldTooltipItem": {"FieldId": "margin"}}]}})
+        self.assertEqual(_checks(_dashboard(visual)), [])
+
+    def test_undeclared_field_is_reported(self):
+        visual = _table_visual(AGGREGATED_WELLS, SortConfiguration={"RowSort": [
+            {"FieldSort": {"FieldId": "missing", "Direction": "DESC"}}]})
+        self.assertEqual(_checks(_dashboard(visual)), [(
+            "COLUMN_NOT_FOUND", "definition.sheets[0].visuals[0].TableVisual.ChartConfiguration.SortConfiguration.RowSort[0].FieldSort")])
+
+    def test_visual_id_outside_sheet_visuals_is_not_checked(self):
+        # Actions and navigation targets name a VisualId without being visuals
+        visual = _table_visual(AGGREGATED_WELLS)
+        visual["TableVisual"]["Actions"] = [{"CustomActionId": "a1", "ActionOperations": [{"FilterOperation": {
+            "TargetVisualsConfiguration": {"VisualId": "v2", "FieldSort": {"FieldId": "v2_field"}}}}]}]
+        data = _dashboard(visual, navigationTargets=[{"VisualId": "v3", "FieldSort": {"FieldId": "v3_field"}}])
+        findings = _checks(data)
+        self.assertEqual(len(findings), 1)
+        self.assertIn(".visuals[0].TableVisual.Actions", findings[0][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import zipfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmark import generate_bundle  # noqa: E402
+
+
+def _text_members(data: bytes) -> dict:
+    """Every member of an archive and of the archives nested in it, as name -> content."""
+    members = {}
+    with zipfile.ZipFile(io.BytesIO(data)) as bundle_zip:
+        assert bundle_zip.testzip() is None
+        for info in bundle_zip.infolist():
+            content = bundle_zip.read(info)
+            if info.filename.endswith(".zip"):
+                members.update({f"{info.filename}/{name}": value for name, value in _text_members(content).items()})
+            else:
+                members[info.filename] = content
+    return members
+
+
+class RewriteCommandTest(unittest.TestCase):
+
+    def test_rewrite_with_promotion_map(self):
+        # The 'Process QuickSight Bundle' step of .github/workflows/quicksight.yaml
+        with tempfile.TemporaryDirectory() as directory:
+            bundle_path = os.path.join(directory, "QuickSightBundle.zip")
+            generate_bundle(bundle_path, dashboards=3, visuals_per_dashboard=2, datasets=3, nested_zips=2)
+            with open(bundle_path, "rb") as f:
+                source = _text_members(f.read())
+
+            result = subprocess.run(
+                [sys.executable, "bundletool.py", "rewrite", bundle_path,
+                 "--promotion-map", "promotion-maps/dev-to-tst.json",
+                 "--report", os.path.join(directory, "run-report", "rewrite.json")],
+                cwd=REPO_DIR, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+            self.assertEqual(result.returncode, 0, result.stdout)
+
+            with open(bundle_path, "rb") as f:
+                output = _text_members(f.read())
+            self.assertEqual(sorted(source), sorted(output))
+            self.assertTrue(any(b"-dev-" in data for data in source.values()))
+            for name, data in output.items():
+                self.assertNotIn(b"-dev-", data, name)
+                self.assertEqual(data, source[name].replace(b"-dev-", b"-tst-"), name)
+            self.assertTrue(os.path.exists(os.path.join(directory, "run-report", "rewrite.json")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import folderexport  # noqa: E402
+
+
+class ModifyPermissionsTest(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        for name in ("TEMP_ZIP", "OUTPUT_ZIP"):
+            patcher = mock.patch.object(folderexport, name, os.path.join(temp_dir.name, name.lower() + ".zip"))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        with zipfile.ZipFile(folderexport.TEMP_ZIP, 'w', zipfile.ZIP_DEFLATED) as bundle_zip:
+            bundle_zip.writestr("dashboard/d1.json", json.dumps({"dashboardId": "d1", "permissions": [{"principal": "p"}]}))
+            bundle_zip.writestr("dataset/s1.json", json.dumps({"dataSetId": "s1"}))
+            bundle_zip.writestr("dataset/s2.json", json.dumps({"dataSetId": "s2"}))
+
+    def _summary(self, **kwargs) -> str:
+        with self.assertLogs(folderexport.logger, "INFO") as logs:
+            folderexport.modify_permissions(**kwargs)
+        return next(line for line in logs.output if "Stripped permissions" in line)
+
+    def test_untouched_members_are_raw_copied(self):
+        self.assertTrue(self._summary().endswith("Stripped permissions from 1 of 3 members; 2 left byte-identical"))
+
+    def test_deterministic_reports_untouched_members(self):
+        summary = self._summary(deterministic=True)
+        self.assertTrue(summary.endswith("Stripped permissions from 1 of 3 members; 2 left unchanged and recompressed"))
+
+
+if __name__ == "__main__":
+    unittest.main()
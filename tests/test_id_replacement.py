@@ -0,0 +1,88 @@
+import os
+import random
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from id_replacement import ReplacementEngine, compile_matcher  # noqa: E402
+
+
+def _naive_replace(text: str, replacements: dict) -> str:
+    """Leftmost, then longest, non-overlapping replacement; the behavior the trie regex has to match."""
+    keys = sorted(replacements, key=len, reverse=True)
+    output = []
+    position = 0
+    while position < len(text):
+        key = next((key for key in keys if text.startswith(key, position)), None)
+        if key is None:
+            output.append(text[position])
+            position += 1
+        else:
+            output.append(replacements[key])
+            position += len(key)
+    return "".join(output)
+
+
+class CompileMatcherTest(unittest.TestCase):
+
+    def test_empty_map(self):
+        self.assertIsNone(compile_matcher([]))
+        self.assertIsNone(compile_matcher([""]))
+
+    def test_longest_key_wins_over_its_prefixes(self):
+        matcher = compile_matcher(["abc", "ab", "abcde", "a"])
+        self.assertEqual(matcher.findall("abcdef abcd ab a"), ["abcde", "abc", "ab", "a"])
+        self.assertEqual(compile_matcher(["dashboard/1", "dashboard/12"]).findall("dashboard/123"), ["dashboard/12"])
+
+    def test_regex_metacharacters_are_literal(self):
+        keys = ["a.b", "a*b", "(x)", "[y]", "c|d", "e+f?", "^g$", "h\\i", "j{2}", "k-l", "m]n", "-", "]", "^"]
+        matcher = compile_matcher(keys)
+        for key in keys:
+            self.assertEqual(matcher.findall(f" {key} "), [key], key)
+        self.assertEqual(matcher.findall("aXb aab cd e ff x y gg hi jj kl mn"), [])
+
+    def test_matches_naive_replacement(self):
+        rng = random.Random(0)
+        alphabet = "ab.-[]"
+        for _ in range(300):
+            replacements = {"".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))): str(index)
+                            for index in range(rng.randint(1, 8))}
+            text = "".join(rng.choice(alphabet) for _ in range(40))
+            matcher = compile_matcher(replacements)
+            self.assertEqual(matcher.sub(lambda match: replacements[match.group(0)], text),
+                             _naive_replace(text, replacements), (replacements, text))
+
+
+class ReplacementEngineTest(unittest.TestCase):
+
+    def test_empty_map(self):
+        engine = ReplacementEngine({})
+        self.assertEqual(engine.replace_ids("nothing to do"), ("nothing to do", {}))
+        self.assertEqual(engine.replace_all("nothing to do")[0], "nothing to do")
+        self.assertEqual(engine.patterns(), {"ids": None, "accounts": None, "all": None})
+
+    def test_hit_counts(self):
+        engine = ReplacementEngine({"ds-1": "ds-9", "ds-10": "ds-90"}, "111111111111", "222222222222")
+        text, hits = engine.replace_ids("ds-1 ds-10 ds-1 ds-100")
+        self.assertEqual(text, "ds-9 ds-90 ds-9 ds-900")
+        self.assertEqual(hits, {"ds-1": 2, "ds-10": 2})
+        _, hits = engine.replace_account_id("arn:aws:quicksight:us-east-1:111111111111:dataset/ds-1")
+        self.assertEqual(hits, {"111111111111": 1})
+        # Hit counts add up over the whole run
+        self.assertEqual(engine.hit_counts, {"ds-1": 2, "ds-10": 2, "111111111111": 1})
+
+    def test_chained_mappings_do_not_cascade(self):
+        engine = ReplacementEngine({"a-1": "a-2", "a-2": "a-3"})
+        self.assertEqual(engine.replace_ids("a-1 a-2")[0], "a-2 a-3")
+
+    def test_precompiled_patterns(self):
+        replacements = {"x.y": "1", "x": "2"}
+        engine = ReplacementEngine(replacements, patterns=ReplacementEngine(replacements).patterns())
+        self.assertEqual(engine.replace_ids("x.y xzy x")[0], "1 2zy 2")
+        self.assertIsInstance(re.compile(engine.patterns()["ids"]), re.Pattern)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from import_overrides import generate_import_overrides  # noqa: E402
+from promotion_map import compile_promotion_map  # noqa: E402
+
+OLD_ACCOUNT_ID = "111111111111"
+NEW_ACCOUNT_ID = "222222222222"
+PROMOTION_MAP = compile_promotion_map(json.dumps({
+    "version": 1, "source": "dev", "target": "tst",
+    "account_ids": {OLD_ACCOUNT_ID: NEW_ACCOUNT_ID},
+    "strings": {"-dev-": "-tst-", "sg-0dev": "sg-0tst"},
+}).encode())
+
+DATASOURCE = {
+    "dataSourceId": "sales-ds", "arn": f"arn:aws:quicksight:us-east-1:{OLD_ACCOUNT_ID}:datasource/sales-ds",
+    "name": "sales-dev-db", "type": "POSTGRESQL",
+    "dataSourceParameters": {"rdsParameters": {"instanceId": "sales-dev-db", "database": "sales"}},
+    "vpcConnectionProperties": {"vpcConnectionArn": f"arn:aws:quicksight:us-east-1:{OLD_ACCOUNT_ID}:vpcConnection/vpc-1"},
+}
+DASHBOARD = {
+    "dashboardId": "sales", "arn": f"arn:aws:quicksight:us-east-1:{OLD_ACCOUNT_ID}:dashboard/sales",
+    "name": "Sales-dev-report",
+    "permissions": [
+        {"principal": f"arn:aws:quicksight:us-east-1:{OLD_ACCOUNT_ID}:group/default/readers",
+         "actions": ["quicksight:QueryDashboard", "quicksight:DescribeDashboard"]},
+        {"principal": f"arn:aws:quicksight:us-east-1:{OLD_ACCOUNT_ID}:group/default/owners",
+         "actions": ["quicksight:DescribeDashboard", "quicksight:QueryDashboard"]},
+    ],
+    "tags": [{"key": "stage", "value": "team-dev-a"}, {"key": "owner", "value": "bi"}],
+}
+VPC_CONNECTION = {
+    "vpcConnectionId": "vpc-1", "name": "shared", "subnetIds": ["subnet-1"],
+    "securityGroupIds": ["sg-0dev", "sg-0shared"], "roleArn": "arn:aws:iam::111111111111:role/qs-vpc",
+    "tags": [{"key": "stage", "value": "team-dev-a"}],
+}
+
+
+def _write_bundle(path: str, members: dict):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as bundle_zip:
+        for name, content in members.items():
+            bundle_zip.writestr(name, content if isinstance(content, bytes) else json.dumps(content))
+
+
+def _nested_zip(members: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as nested_zip:
+        for name, content in members.items():
+            nested_zip.writestr(name, content)
+    return buffer.getvalue()
+
+
+class GenerateImportOverridesTest(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.bundle_path = os.path.join(temp_dir.name, "bundle.qs")
+
+    def _generate(self, members: dict):
+        _write_bundle(self.bundle_path, members)
+        return generate_import_overrides(self.bundle_path, PROMOTION_MAP)
+
+    def test_datasource_parameters(self):
+        overrides, findings = self._generate({"datasource/sales-ds.json": DATASOURCE})
+        self.assertEqual(findings, [])
+        self.assertEqual(overrides, {"OverrideParameters": {"DataSources": [{
+            "DataSourceId": "sales-ds",
+            "Name": "sales-tst-db",
+            "DataSourceParameters": {"RdsParameters": {"InstanceId": "sales-tst-db", "Database": "sales"}},
+            "VpcConnectionProperties": {
+                "VpcConnectionArn": f"arn:aws:quicksight:us-east-1:{NEW_ACCOUNT_ID}:vpcConnection/vpc-1"},
+        }]}})
+
+    def test_dashboard_name_permissions_and_tags(self):
+        overrides, findings = self._generate({"dashboard/sales.json": DASHBOARD})
+        self.assertEqual(findings, [])
+        self.assertEqual(overrides, {
+            "OverrideParameters": {"Dashboards": [{"DashboardId": "sales", "Name": "Sales-tst-report"}]},
+            "OverridePermissions": {"Dashboards": [{
+                "DashboardIds": ["sales"],
+                "Permissions": {
+                    "Principals": [f"arn:aws:quicksight:us-east-1:{NEW_ACCOUNT_ID}:group/default/owners",
+                                   f"arn:aws:quicksight:us-east-1:{NEW_ACCOUNT_ID}:group/default/readers"],
+                    "Actions": ["quicksight:DescribeDashboard", "quicksight:QueryDashboard"],
+                },
+            }]},
+            "OverrideTags": {"Dashboards": [{
+                "DashboardIds": ["sales"],
+                "Tags": [{"Key": "owner", "Value": "bi"}, {"Key": "stage", "Value": "team-tst-a"}],
+            }]},
+        })
+
+    def test_tag_set_shared_by_assets(self):
+        other = dict(DASHBOARD, dashboardId="returns", name="Returns", permissions=[])
+        overrides, _ = self._generate({"dashboard/sales.json": DASHBOARD, "dashboard/returns.json": other})
+        self.assertEqual(overrides["OverrideTags"], {"Dashboards": [{
+            "DashboardIds": ["returns", "sales"],
+            "Tags": [{"Key": "owner", "Value": "bi"}, {"Key": "stage", "Value": "team-tst-a"}],
+        }]})
+
+    def test_vpc_connection(self):
+        overrides, findings = self._generate({"vpcConnection/vpc-1.json": VPC_CONNECTION})
+        self.assertEqual(findings, [])
+        self.assertEqual(overrides, {
+            "OverrideParameters": {"VPCConnections": [{
+                "VPCConnectionId": "vpc-1",
+                "SecurityGroupIds": ["sg-0tst", "sg-0shared"],
+                "RoleArn": f"arn:aws:iam::{NEW_ACCOUNT_ID}:role/qs-vpc",
+            }]},
+            "OverrideTags": {"VPCConnections": [{
+                "VPCConnectionIds": ["vpc-1"], "Tags": [{"Key": "stage", "Value": "team-tst-a"}],
+            }]},
+        })
+
+    def test_vpc_connection_permissions_are_not_overridable(self):
+        vpc_connection = dict(VPC_CONNECTION, permissions=DASHBOARD["permissions"])
+        _, findings = self._generate({"vpcConnection/vpc-1.json": vpc_connection})
+        self.assertEqual([(item["path"], item["check"]) for item in findings], [("permissions", "NOT_OVERRIDABLE")])
+
+    def test_non_json_members_only_block_when_changed(self):
+        overrides, findings = self._generate({
+            "dashboard/sales.json": DASHBOARD,
+            "attachments/logo.png": b"\x89PNG\r\n\x1a\n\x00\xff",
+            "attachments/unchanged.zip": _nested_zip({"readme.txt": "nothing to promote"}),
+        })
+        self.assertEqual(findings, [])
+        self.assertIn("OverrideParameters", overrides)
+
+        _, findings = self._generate({"attachments/changed.zip": _nested_zip({"inner/notes.txt": "see sales-dev-db"})})
+        self.assertEqual([(item["member"], item["check"]) for item in findings],
+                         [("attachments/changed.zip/inner/notes.txt", "NOT_OVERRIDABLE")])
+
+
+if __name__ == "__main__":
+    unittest.main()
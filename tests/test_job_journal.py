@@ -0,0 +1,188 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import folderexport  # noqa: E402
+from benchmark import generate_bundle  # noqa: E402
+from job_journal import COMPLETED, JobJournal, reattach_job  # noqa: E402
+from job_waiter import PENDING_JOB_STATUSES  # noqa: E402
+
+
+def _describe(*statuses):
+    """describe_job returning each JobStatus in turn, then the last forever; the job IDs asked for are kept."""
+    statuses = list(statuses)
+    calls = []
+
+    def describe(job_id=None, **kwargs):
+        calls.append(job_id or kwargs.get("AssetBundleExportJobId"))
+        return {"JobStatus": statuses.pop(0) if len(statuses) > 1 else statuses[0], "DownloadUrl": "https://example.com/b"}
+    describe.calls = calls
+    return describe
+
+
+class JournalTestCase(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory = temp_dir.name
+        self.journal_path = os.path.join(self.directory, "journal", "promotion.db")
+        self.messages = []
+
+    def _journal(self) -> JobJournal:
+        journal = JobJournal(self.journal_path, log=self.messages.append)
+        self.addCleanup(journal.close)
+        return journal
+
+
+class ReattachJobTest(JournalTestCase):
+
+    def test_reattach_to_in_progress_job(self):
+        self._journal().run("run-1").started("import:b.qs", "job-1", bundle_sha256="abc")
+        # A rerun opens the journal afresh
+        run = self._journal().run("run-1")
+        describe = _describe("IN_PROGRESS")
+        self.assertEqual(reattach_job(run, "import:b.qs", describe, PENDING_JOB_STATUSES, "Import job",
+                                      log=self.messages.append, bundle_sha256="abc"), "job-1")
+        self.assertEqual(describe.calls, ["job-1"])
+
+    def test_no_reattach(self):
+        run = self._journal().run("run-1")
+        run.started("import:b.qs", "job-1", bundle_sha256="abc")
+        cases = [
+            ("ended", _describe("FAILED"), {"bundle_sha256": "abc"}),
+            ("other bundle", _describe("IN_PROGRESS"), {"bundle_sha256": "def"}),
+            ("describe fails", mock.Mock(side_effect=RuntimeError("not found")), {"bundle_sha256": "abc"}),
+        ]
+        for name, describe, details in cases:
+            with self.subTest(name):
+                self.assertIsNone(reattach_job(run, "import:b.qs", describe, PENDING_JOB_STATUSES, "Import job",
+                                               log=self.messages.append, **details))
+        self.assertIsNone(reattach_job(None, "import:b.qs", _describe("IN_PROGRESS"), PENDING_JOB_STATUSES, "Import job"))
+        run.completed("import:b.qs", "job-1", bundle_sha256="abc")
+        self.assertIsNone(reattach_job(run, "import:b.qs", _describe("IN_PROGRESS"), PENDING_JOB_STATUSES, "Import job",
+                                       log=self.messages.append))
+
+    def test_export_job_is_reattached_not_restarted(self):
+        run = self._journal().run("run-1")
+        run.started("export:folder-1", "folder-1")
+        quicksight = mock.Mock()
+        quicksight.describe_asset_bundle_export_job.side_effect = _describe("IN_PROGRESS", "SUCCESSFUL")
+        with mock.patch.object(folderexport, "get_client", return_value=quicksight):
+            url = folderexport.start_export_job("111111111111", "us-east-1", "folder-1", journal_run=run)
+        self.assertEqual(url, "https://example.com/b")
+        quicksight.start_asset_bundle_export_job.assert_not_called()
+
+
+class CompletedStageTest(JournalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.run = self._journal().run("run-1")
+        self.export_path = os.path.join(self.directory, "export.qs")
+        self.rewrite_path = os.path.join(self.directory, "rewrite.qs")
+        for path in (self.export_path, self.rewrite_path):
+            with open(path, "wb") as f:
+                f.write(path.encode())
+        self.run.completed("export", "job-1", self.export_path)
+        self.run.completed("rewrite", artifact_path=self.rewrite_path, source_stage="export")
+
+    def test_completed_artifacts_are_reused(self):
+        self.assertEqual(self.run.completed_artifact("export"), self.export_path)
+        self.assertEqual(self.run.completed_artifact("rewrite", source_stage="export"), self.rewrite_path)
+        self.assertEqual(self._journal().run("run-1").get("export")["status"], COMPLETED)
+
+    def test_changed_artifact_is_redone(self):
+        with open(self.rewrite_path, "ab") as f:
+            f.write(b"changed")
+        self.assertIsNone(self.run.completed_artifact("rewrite", source_stage="export"))
+        self.assertIn("missing or changed", self.messages[-1])
+
+    def test_changed_source_redoes_the_stage(self):
+        with open(self.export_path, "ab") as f:
+            f.write(b"new export")
+        self.run.completed("export", "job-2", self.export_path)
+        self.assertIsNone(self.run.completed_artifact("rewrite", source_stage="export"))
+
+    def test_is_completed_with_details(self):
+        self.run.completed("import:b.qs", "job-3", bundle_sha256="abc")
+        self.assertTrue(self.run.is_completed("import:b.qs", bundle_sha256="abc"))
+        self.assertFalse(self.run.is_completed("import:b.qs", bundle_sha256="def"))
+        self.assertFalse(self.run.is_completed("import:other.qs"))
+
+    def test_old_entries_and_finished_runs_are_ignored(self):
+        stale = JobJournal(self.journal_path, max_age_hours=0)
+        self.addCleanup(stale.close)
+        self.assertIsNone(stale.run("run-1").completed_artifact("export"))
+        self.assertIsNone(self._journal().run("run-2").get("export"))
+        self.run.finish()
+        self.assertIsNone(self.run.get("export"))
+
+    def test_shared_by_threads(self):
+        threads = [threading.Thread(target=lambda index=index: [self.run.started(f"stage-{index}-{n}", f"job-{n}")
+                                                                  for n in range(20)]) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(1 for index in range(8) for n in range(20) if self.run.get(f"stage-{index}-{n}")), 160)
+
+
+class FolderExportResumeTest(JournalTestCase):
+    """folderexport keeps TEMP_ZIP after a failed journaled run and the rerun reuses it instead of exporting."""
+
+    def setUp(self):
+        super().setUp()
+        self.source = os.path.join(self.directory, "export.qs")
+        generate_bundle(self.source, dashboards=2, visuals_per_dashboard=1, datasets=2)
+        self.output = os.path.join(self.directory, "out", "modified.zip")
+        os.makedirs(os.path.dirname(self.output))
+        for name, value in (("TEMP_ZIP", os.path.join(self.directory, "temp.zip")), ("OUTPUT_ZIP", self.output)):
+            patcher = mock.patch.object(folderexport, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.argv = ["folderexport.py", "--account-id", "111111111111", "--region", "us-east-1",
+                     "--folder-id", "folder-1", "--output", self.output, "--journal", self.journal_path]
+
+    def _main(self, start_export_job, modify_permissions=folderexport.modify_permissions):
+        download = lambda url, chunk_size: shutil.copyfile(self.source, folderexport.TEMP_ZIP)
+        with mock.patch.object(sys, "argv", self.argv), \
+                mock.patch.object(folderexport, "start_export_job", start_export_job), \
+                mock.patch.object(folderexport, "download_bundle", download), \
+                mock.patch.object(folderexport, "modify_permissions", modify_permissions):
+            folderexport.main()
+
+    def test_rerun_reuses_the_download(self):
+        export = mock.Mock(return_value="https://example.com/b")
+        with self.assertRaises(SystemExit):
+            self._main(export, mock.Mock(side_effect=RuntimeError("interrupted")))
+        self.assertEqual(export.call_count, 1)
+        self.assertTrue(os.path.exists(folderexport.TEMP_ZIP))
+
+        export.reset_mock()
+        self._main(export)
+        export.assert_not_called()
+        self.assertTrue(os.path.exists(self.output))
+        self.assertFalse(os.path.exists(folderexport.TEMP_ZIP))
+        # The finished run cleared its entries, so the next run exports again
+        self._main(export)
+        self.assertEqual(export.call_count, 1)
+
+    def test_changed_download_is_not_reused(self):
+        export = mock.Mock(return_value="https://example.com/b")
+        with self.assertRaises(SystemExit):
+            self._main(export, mock.Mock(side_effect=RuntimeError("interrupted")))
+        with open(folderexport.TEMP_ZIP, "ab") as f:
+            f.write(b"truncated download")
+        self._main(export)
+        self.assertEqual(export.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import job_waiter  # noqa: E402
+from job_waiter import JobWaiter  # noqa: E402
+
+
+class ClientError(Exception):
+    """Shaped like botocore's ClientError, which is all error_code looks at."""
+
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    async def async_sleep(self, seconds):
+        self.sleep(seconds)
+
+
+def scripted(*outcomes):
+    """describe() returning each outcome in turn (a JobStatus, or an exception to raise), then the last forever."""
+    outcomes = list(outcomes)
+
+    def describe():
+        outcome = outcomes.pop(0) if len(outcomes) > 1 else outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return {"JobStatus": outcome}
+    return describe
+
+
+def _waiter(clock: FakeClock, **kwargs) -> JobWaiter:
+    return JobWaiter(log=lambda message: None, sleep=clock.sleep, clock=clock, **kwargs)
+
+
+class JobWaiterTest(unittest.TestCase):
+
+    def setUp(self):
+        # Full jitter picks the upper bound, so the schedule is the backoff itself
+        patcher = mock.patch.object(job_waiter.random, "uniform", lambda low, high: high)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clock = FakeClock()
+
+    def test_backoff_schedule(self):
+        result = _waiter(self.clock, max_delay=10).wait(scripted(*["IN_PROGRESS"] * 7 + ["SUCCESSFUL"]))
+        self.assertEqual(self.clock.sleeps, [1, 2, 4, 8, 10, 10, 10])
+        self.assertEqual(result.status, "SUCCESSFUL")
+        self.assertEqual(result.attempts, 8)
+        self.assertEqual(result.elapsed_seconds, 45)
+        self.assertEqual(result.status_durations, {"IN_PROGRESS": 45, "SUCCESSFUL": 0})
+
+    def test_first_poll_is_immediate(self):
+        result = _waiter(self.clock).wait(scripted("SUCCESSFUL"))
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual((result.status, result.attempts, result.timed_out), ("SUCCESSFUL", 1, False))
+
+    def test_throttling_backs_off_without_counting_as_errors(self):
+        throttles = [ClientError(code) for code in job_waiter.THROTTLING_ERROR_CODES] * 2
+        result = _waiter(self.clock, max_consecutive_errors=2).wait(scripted(*throttles + ["SUCCESSFUL"]))
+        self.assertEqual(result.status, "SUCCESSFUL")
+        self.assertEqual(result.throttled, len(throttles))
+        # A throttled call doubles the backoff once more before the usual growth
+        self.assertEqual(self.clock.sleeps[:3], [2, 8, 30])
+
+    def test_other_errors_are_raised_after_max_consecutive_errors(self):
+        describe = scripted(ClientError("InternalFailure"), "IN_PROGRESS", ClientError("InternalFailure"),
+                            ClientError("InternalFailure"), ClientError("InternalFailure"))
+        with self.assertRaises(ClientError):
+            _waiter(self.clock, max_consecutive_errors=3).wait(describe)
+        # The success in between reset the count: two errors, one status, then three errors
+        self.assertEqual(len(self.clock.sleeps), 4)
+
+    def test_deadline(self):
+        result = _waiter(self.clock, deadline_seconds=20).wait(scripted("IN_PROGRESS"))
+        self.assertTrue(result.timed_out)
+        self.assertEqual(result.status, "IN_PROGRESS")
+        # The last delay is cut short so the final check lands on the deadline
+        self.assertEqual(self.clock.sleeps, [1, 2, 4, 8, 5])
+        self.assertEqual(result.elapsed_seconds, 20)
+
+    def test_import_rollback_is_waited_through(self):
+        result = _waiter(self.clock).wait(scripted("IN_PROGRESS", "FAILED_ROLLBACK_IN_PROGRESS", "FAILED_ROLLBACK_COMPLETED"),
+                                          job_waiter.PENDING_IMPORT_JOB_STATUSES)
+        self.assertEqual(result.status, "FAILED_ROLLBACK_COMPLETED")
+        self.assertEqual(result.status_durations, {"IN_PROGRESS": 1, "FAILED_ROLLBACK_IN_PROGRESS": 2, "FAILED_ROLLBACK_COMPLETED": 0})
+
+    def test_wait_async_matches_wait(self):
+        outcomes = ["QUEUED_FOR_IMMEDIATE_EXECUTION", ClientError("ThrottlingException"), "IN_PROGRESS",
+                    ClientError("InternalFailure"), "IN_PROGRESS", "SUCCESSFUL"]
+        result = _waiter(self.clock).wait(scripted(*outcomes))
+
+        async_clock = FakeClock()
+
+        async def run_blocking(func):
+            return func()
+
+        with mock.patch.object(job_waiter.asyncio, "sleep", async_clock.async_sleep):
+            async_result = asyncio.run(_waiter(async_clock).wait_async(scripted(*outcomes), run_blocking=run_blocking))
+        self.assertEqual(async_clock.sleeps, self.clock.sleeps)
+        self.assertEqual(vars(async_result), vars(result))
+
+
+if __name__ == "__main__":
+    unittest.main()
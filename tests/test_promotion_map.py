@@ -0,0 +1,157 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import promotion_map  # noqa: E402
+from promotion_map import PromotionMapError, compile_promotion_map, load_promotion_map, validate_promotion_map  # noqa: E402
+
+DEV_ID = "347f0c50-33a1-4fd2-bdd5-6f8867a05601"
+TST_ID = "1e39287a-aafe-48a8-a81d-7d8e25a93c4f"
+QA_ID = "3519323f-3db4-4585-a0c1-a1df2698e3e0"
+VALID_MAP = {"version": 1, "source": "dev", "target": "tst", "account_ids": {"111111111111": "222222222222"},
+             "ids": {DEV_ID: TST_ID}, "strings": {"-dev-": "-tst-"}}
+
+
+def _errors(**changes) -> list:
+    return validate_promotion_map(dict(VALID_MAP, **changes))
+
+
+class ValidatePromotionMapTest(unittest.TestCase):
+
+    def test_valid_map(self):
+        self.assertEqual(validate_promotion_map(VALID_MAP), [])
+
+    def test_not_an_object(self):
+        self.assertEqual(validate_promotion_map([]), ["the promotion map must be a JSON object"])
+
+    def test_version(self):
+        self.assertEqual(_errors(version=2), ["unsupported version 2 (supported: 1)"])
+        self.assertEqual(len(validate_promotion_map({"ids": {}})), 1)
+
+    def test_unknown_keys(self):
+        self.assertEqual(_errors(replacements={}), ["unknown keys: replacements"])
+
+    def test_section_must_be_an_object(self):
+        self.assertEqual(_errors(ids=[DEV_ID]), ["ids: must be an object of OLD: NEW pairs"])
+
+    def test_empty_or_non_string_values(self):
+        self.assertEqual(_errors(strings={"-dev-": ""}), ["strings: '-dev-' must map to a non-empty string"])
+        self.assertEqual(_errors(strings={"-dev-": 1}), ["strings: '-dev-' must map to a non-empty string"])
+
+    def test_account_ids(self):
+        self.assertEqual(_errors(account_ids={"11111111111": "222222222222"}),
+                         ["account_ids: '11111111111' is not a 12-digit AWS account ID"])
+        self.assertEqual(_errors(account_ids={"111111111111": "222222222222", "333333333333": "444444444444"}),
+                         ["account_ids: at most one account ID pair is supported"])
+
+    def test_malformed_uuid(self):
+        self.assertEqual(_errors(ids={DEV_ID[:-1]: TST_ID}),
+                         [f"ids: '{DEV_ID[:-1]}' looks like a UUID but is malformed (35 characters)"])
+
+    def test_invalid_quicksight_id(self):
+        self.assertEqual(_errors(ids={"sales dashboard": TST_ID}), ["ids: 'sales dashboard' is not a valid QuickSight ID"])
+
+    def test_identity_mapping(self):
+        self.assertEqual(_errors(ids={DEV_ID: DEV_ID}), [f"ids: '{DEV_ID}' maps to itself"])
+
+    def test_conflicting_sections(self):
+        self.assertEqual(_errors(strings={DEV_ID: QA_ID}),
+                         [f"strings: '{DEV_ID}' is mapped to both '{TST_ID}' and '{QA_ID}'"])
+
+    def test_chain(self):
+        self.assertEqual(_errors(ids={DEV_ID: TST_ID, TST_ID: QA_ID}),
+                         [f"chain: {DEV_ID} -> {TST_ID} -> {QA_ID} (replacements are applied once, never chained)"])
+
+    def test_cycle(self):
+        errors = _errors(ids={DEV_ID: TST_ID, TST_ID: DEV_ID})
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(all(error.startswith("cycle: ") for error in errors))
+
+    def test_custom_sql_datasources_are_not_text_replacements(self):
+        # The same ID mapped differently for CustomSql data sources is neither a conflict nor a chain
+        self.assertEqual(_errors(custom_sql_datasources={DEV_ID: QA_ID, TST_ID: QA_ID}), [])
+
+    def test_compile_lists_every_problem(self):
+        with self.assertRaises(PromotionMapError) as raised:
+            compile_promotion_map(json.dumps(dict(VALID_MAP, version=2, ids={DEV_ID: DEV_ID})).encode())
+        self.assertEqual(str(raised.exception).splitlines(), ["unsupported version 2 (supported: 1)", f"ids: '{DEV_ID}' maps to itself"])
+        with self.assertRaises(PromotionMapError):
+            compile_promotion_map(b"{not json")
+
+
+class LoadPromotionMapTest(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.cache_dir = os.path.join(temp_dir.name, "cache")
+        self.map_path = os.path.join(temp_dir.name, "dev-to-tst.json")
+        self.messages = []
+        self._write(VALID_MAP)
+
+    def _write(self, document):
+        with open(self.map_path, "w") as f:
+            json.dump(document, f)
+
+    def _load(self):
+        return load_promotion_map(self.map_path, self.cache_dir, log=self.messages.append)
+
+    def _artifacts(self) -> list:
+        return sorted(os.listdir(self.cache_dir)) if os.path.isdir(self.cache_dir) else []
+
+    def test_unchanged_map_is_loaded_from_the_cache(self):
+        compiled = self._load()
+        self.assertEqual(self._artifacts(), [f"{compiled.digest}.json"])
+        with mock.patch.object(promotion_map, "compile_promotion_map", side_effect=AssertionError("recompiled")):
+            cached = self._load()
+        self.assertEqual(cached.digest, compiled.digest)
+        self.assertEqual(cached.to_artifact(), compiled.to_artifact())
+        engine = cached.replacement_engine()
+        self.assertEqual(engine.replace_ids(f"dashboard/{DEV_ID}")[0], f"dashboard/{TST_ID}")
+
+    def test_changed_map_misses_the_cache(self):
+        first = self._load()
+        self._write(dict(VALID_MAP, strings={"-dev-": "-qa-"}))
+        second = self._load()
+        self.assertNotEqual(second.digest, first.digest)
+        self.assertEqual(second.strings, {"-dev-": "-qa-"})
+        self.assertEqual(self._artifacts(), sorted([f"{first.digest}.json", f"{second.digest}.json"]))
+
+    def test_invalid_map_is_not_cached(self):
+        self._write(dict(VALID_MAP, version=2))
+        with self.assertRaises(PromotionMapError) as raised:
+            self._load()
+        self.assertTrue(str(raised.exception).startswith(f"{self.map_path}:\n"))
+        self.assertEqual(self._artifacts(), [])
+
+    def test_unreadable_or_stale_artifact_is_rebuilt(self):
+        digest = self._load().digest
+        artifact_path = os.path.join(self.cache_dir, f"{digest}.json")
+        with open(artifact_path, "w") as f:
+            f.write("{truncated")
+        self.assertEqual(self._load().digest, digest)
+        self.assertEqual(len(self.messages), 1)
+        self.assertIn("Ignoring unreadable compiled promotion map", self.messages[0])
+
+        with open(artifact_path) as f:
+            artifact = json.load(f)
+        with open(artifact_path, "w") as f:
+            json.dump(dict(artifact, format=promotion_map.COMPILED_FORMAT - 1, patterns={}), f)
+        self.assertEqual(self._load().to_artifact()["patterns"], artifact["patterns"])
+        with open(artifact_path) as f:
+            self.assertEqual(json.load(f)["format"], promotion_map.COMPILED_FORMAT)
+
+    def test_uncachable_directory_only_costs_the_compile(self):
+        with open(self.cache_dir, "w") as f:
+            f.write("not a directory")
+        self.assertEqual(self._load().strings, {"-dev-": "-tst-"})
+        self.assertIn("Could not cache the compiled promotion map", self.messages[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,177 +1,309 @@
-import boto3
+import asyncio
+import inspect
 import time
 import uuid
 import requests
 import argparse
 import os
-import zipfile
 import json
-import tempfile
-import shutil
 import sys
 import base64 # Import base64 module
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from aws_clients import get_client
+import run_report
+from bundle_rewriter import process_qs_file, process_qs_file_fanout
+from job_waiter import DEFAULT_JOB_TIMEOUT_SECONDS, PENDING_IMPORT_JOB_STATUSES, PENDING_JOB_STATUSES, JobWaiter
+from bundle_validator import DEFAULT_MAX_PRINTED_FINDINGS, format_finding, validate_before_import
+from bundle_staging import DEFAULT_S3_IMPORT_THRESHOLD_MB, DEFAULT_STAGING_PREFIX, build_import_source, remove_staged_bundle
+from id_replacement import ReplacementEngine
+from asset_graph import DEFAULT_MAX_RESOURCE_ARNS_PER_EXPORT, arn_resource_id, plan_deduplicated_exports
+from bundle_cache import DEFAULT_BUNDLE_CACHE_MAX_MB, BundleCache, bundle_cache_key
+from promotion_map import PromotionMapError, load_promotion_map
+from async_engine import DEFAULT_OFFLOAD_THREADS, AsyncEngine
+from job_journal import DEFAULT_JOURNAL_MAX_AGE_HOURS, JobJournal, file_sha256, reattach_job, run_key
+from import_overrides import generate_import_overrides
+
+# QuickSight runs a limited number of asset bundle jobs per account at once; stay under that by default
+DEFAULT_MAX_CONCURRENT_JOBS = 5
+
+def start_export_job(quicksight_client, source_aws_account_id: str, export_job_id: str, resource_arns: list,
+                     include_all_dependencies: bool) -> bool:
+    """Starts the asset bundle export job. Returns False if it could not be started."""
+    try:
+        print(f"\nStarting asset bundle export job (Job ID: {export_job_id})...")
+        with run_report.span("export", job_id=export_job_id):
+            start_export_response = quicksight_client.start_asset_bundle_export_job(
+                AwsAccountId=source_aws_account_id,
+                AssetBundleExportJobId=export_job_id,
+                ResourceArns=resource_arns,
+                ExportFormat='QUICKSIGHT_JSON',
+                IncludeAllDependencies=include_all_dependencies,
+            )
+        print(f"Export job started successfully. ARN: {start_export_response.get('Arn')}")
+    except Exception as e:
+        print(f"Error starting asset bundle export job: {e}")
+        return False
+    return True
+
+def export_download_url(wait_result):
+    """The download URL of a finished export job, or None (with the job's errors printed) if it failed."""
+    download_url = None
+    job_status = wait_result.status
+    describe_job_response = wait_result.response or {}
+    if job_status == 'SUCCESSFUL':
+        download_url = describe_job_response.get('DownloadUrl')
+        print("Export job SUCCEEDED.")
+    elif not wait_result.timed_out:
+        print(f"Export job {job_status}.")
+        if 'Errors' in describe_job_response:
+            print("Errors from export job:")
+            for error_item in describe_job_response['Errors']:
+                print(f"  - Type: {error_item.get('Type')}, Message: {error_item.get('Message')}, ARN: {error_item.get('Arn')}")
+        return None
+
+    if not download_url:
+        print(f"Export job did not succeed or no download URL was provided. Last status: {job_status}")
+    return download_url
 
-def process_qs_file(
+def download_exported_bundle(download_url: str, downloaded_qs_path: str) -> bool:
+    print(f"\nDownloading dashboard bundle to {os.path.abspath(downloaded_qs_path)}...")
+    try:
+        with run_report.span("download", bytes=0) as download_span:
+            response = requests.get(download_url, stream=True)
+            response.raise_for_status()
+            with open(downloaded_qs_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    f.write(chunk)
+                    download_span["bytes"] += len(chunk)
+        print(f"Dashboard bundle downloaded successfully: {os.path.abspath(downloaded_qs_path)}")
+    except Exception as e:
+        print(f"Error downloading asset bundle: {e}")
+        return False
+    return True
+
+def finish_export(wait_result, export_job_id: str, downloaded_qs_path: str, journal_run=None,
+                  journal_stage: str = None) -> bool:
+    """Downloads the bundle of a finished export wait and journals the outcome. Returns False on failure."""
+    download_url = export_download_url(wait_result)
+    if download_url and download_exported_bundle(download_url, downloaded_qs_path):
+        if journal_run:
+            journal_run.completed(journal_stage, export_job_id, downloaded_qs_path)
+        return True
+    if journal_run and not wait_result.timed_out:
+        journal_run.failed(journal_stage, export_job_id)
+    return False
+
+def export_and_download_bundle(
+    quicksight_client,
+    source_aws_account_id: str,
+    export_job_id: str,
+    resource_arns: list,
+    include_all_dependencies: bool,
     downloaded_qs_path: str,
-    output_modified_qs_path: str,
-    dashboard_replacements_map: dict,  # For specific replacements in 'dashboard' folder
-    p_old_account_id: str,             # Generic Account ID old value for 'dataset' folder
-    p_new_account_id: str              # Generic Account ID new value for 'dataset' folder
+    job_timeout_seconds: float = DEFAULT_JOB_TIMEOUT_SECONDS,
+    # A job_journal.JournalRun; the job is journaled under journal_stage and reattached to on a rerun
+    journal_run=None,
+    journal_stage: str = None
+) -> bool:
+    """Runs the export job for resource_arns and downloads the bundle. Returns False on any failure."""
+    describe_job = lambda job_id: quicksight_client.describe_asset_bundle_export_job(
+        AwsAccountId=source_aws_account_id, AssetBundleExportJobId=job_id)
+    reattached_job_id = reattach_job(journal_run, journal_stage, describe_job, PENDING_JOB_STATUSES, "Export job")
+    if reattached_job_id:
+        export_job_id = reattached_job_id
+    elif not start_export_job(quicksight_client, source_aws_account_id, export_job_id, resource_arns, include_all_dependencies):
+        return False
+    elif journal_run:
+        journal_run.started(journal_stage, export_job_id)
+
+    print("\nPolling export job status...")
+    try:
+        wait_result = JobWaiter(deadline_seconds=job_timeout_seconds).wait(
+            lambda: describe_job(export_job_id), label="Export job")
+    except Exception as e:
+        print(f"Error describing export job status: {e}. Aborting.")
+        return False
+    return finish_export(wait_result, export_job_id, downloaded_qs_path, journal_run, journal_stage)
+
+async def export_and_download_bundle_async(
+    engine,
+    quicksight_client,
+    source_aws_account_id: str,
+    export_job_id: str,
+    resource_arns: list,
+    include_all_dependencies: bool,
+    downloaded_qs_path: str,
+    job_timeout_seconds: float = DEFAULT_JOB_TIMEOUT_SECONDS,
+    journal_run=None,
+    journal_stage: str = None
+) -> bool:
+    """export_and_download_bundle on an AsyncEngine: one "export" job slot from start to terminal status."""
+    describe_job = lambda job_id: quicksight_client.describe_asset_bundle_export_job(
+        AwsAccountId=source_aws_account_id, AssetBundleExportJobId=job_id)
+    async with engine.job_slot("export"):
+        reattached_job_id = await engine.run_blocking(
+            reattach_job, journal_run, journal_stage, describe_job, PENDING_JOB_STATUSES, "Export job")
+        if reattached_job_id:
+            export_job_id = reattached_job_id
+        elif not await engine.run_blocking(start_export_job, quicksight_client, source_aws_account_id, export_job_id,
+                                           resource_arns, include_all_dependencies):
+            return False
+        elif journal_run:
+            await engine.run_blocking(journal_run.started, journal_stage, export_job_id)
+
+        print(f"\nPolling export job status ({export_job_id})...")
+        try:
+            wait_result = await engine.wait_job(
+                lambda: describe_job(export_job_id), label="Export job", deadline_seconds=job_timeout_seconds)
+        except asyncio.CancelledError:
+            print(f"Cancelled while waiting on export job {export_job_id}; the job keeps running in QuickSight.")
+            raise
+        except Exception as e:
+            print(f"Error describing export job status: {e}. Aborting.")
+            return False
+    return await engine.run_blocking(finish_export, wait_result, export_job_id, downloaded_qs_path,
+                                     journal_run, journal_stage)
+
+def lookup_cached_bundle(
+    quicksight_client,
+    source_aws_account_id: str,
+    source_aws_region: str,
+    export_arns: list,
+    include_all_dependencies: bool,
+    downloaded_qs_path: str,
+    bundle_cache_dir: str = None,
+    bundle_cache_max_mb: float = DEFAULT_BUNDLE_CACHE_MAX_MB
 ):
     """
-    Unzips a .qs file, modifies specified content in JSON files, and zips it back.
-    Modifications include:
-    1. Specific string replacements in 'dashboard' folder JSON files.
-    2. Global string replacement of generic Account ID in 'dataset'/'datasource' folder JSON files.
+    Copies a cached bundle for export_arns to downloaded_qs_path if the source assets are unchanged.
+    Returns (cache, cache_key, hit); cache and cache_key are None when caching is off or not possible.
     """
-    print(f"\nProcessing downloaded QS file: {downloaded_qs_path}")
-    temp_extract_dir = tempfile.mkdtemp()
-    print(f"Created temporary directory for unzipping: {temp_extract_dir}")
+    cache = BundleCache(bundle_cache_dir, int(bundle_cache_max_mb * 1024 * 1024)) if bundle_cache_dir else None
+    cache_key = None
+    if cache:
+        try:
+            cache_key = bundle_cache_key(quicksight_client, source_aws_account_id, source_aws_region,
+                                         export_arns, include_all_dependencies)
+        except Exception as e:
+            print(f"Warning: Could not compute the bundle cache key ({e}); exporting without the cache.")
 
-    try:
-        print(f"Unzipping '{downloaded_qs_path}' to '{temp_extract_dir}'...")
-        with zipfile.ZipFile(downloaded_qs_path, 'r') as zip_ref:
-            zip_ref.extractall(temp_extract_dir)
-        print("Unzipping complete.")
-
-        # --- Stage 1: Process files in 'dashboard' folder for specific replacements ---
-        dashboard_folder_path = os.path.join(temp_extract_dir, "dashboard")
-        dashboard_files_processed_count = 0
-        dashboard_string_replacements_done_count = 0
-
-        if os.path.isdir(dashboard_folder_path):
-            print(f"\nProcessing JSON files in 'dashboard' folder: {dashboard_folder_path}")
-            for filename in os.listdir(dashboard_folder_path):
-                if filename.endswith(".json"):
-                    dashboard_files_processed_count += 1
-                    file_path = os.path.join(dashboard_folder_path, filename)
-                    print(f"  Processing dashboard file: {filename}")
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content_string = f.read()
-                        
-                        original_content_string = content_string
-                        for old_id, new_id in dashboard_replacements_map.items():
-                            if old_id in content_string:
-                                content_string = content_string.replace(old_id, new_id)
-                                print(f"    Replaced in dashboard file: '{old_id}' with '{new_id}'")
-                        
-                        if content_string != original_content_string:
-                            dashboard_string_replacements_done_count +=1
-                            with open(file_path, 'w', encoding='utf-8') as f:
-                                f.write(content_string)
-                            print(f"    Dashboard file {filename} updated with specific replacements.")
-                        else:
-                            print(f"    No specific dashboard replacements made in {filename}.")
-
-                    except Exception as e:
-                        print(f"  ERROR: An unexpected error occurred while processing dashboard file {filename}: {e}")
-            print("\nSummary of 'dashboard' folder modifications:")
-            print(f"  Dashboard JSON files scanned: {dashboard_files_processed_count}")
-            print(f"  Dashboard files where specific string replacements were made: {dashboard_string_replacements_done_count}")
-        else:
-            print("\nWarning: 'dashboard' directory not found in the bundle. Skipping specific dashboard replacements.")
+    cache_hit = False
+    if cache_key:
+        with run_report.span("cache") as cache_span:
+            cache_hit = cache_span["hit"] = cache.fetch(cache_key, downloaded_qs_path)
+    if cache_hit:
+        print(f"\nSource assets unchanged since a cached export; reusing bundle {cache_key[:12]} (export job skipped).")
+    return cache, cache_key, cache_hit
 
+def store_cached_bundle(cache, cache_key: str, downloaded_qs_path: str):
+    if cache_key:
+        cache.store(cache_key, downloaded_qs_path)
+        print(f"Stored exported bundle in the cache as {cache_key[:12]}.")
 
-        # --- Stage 2: Process files in 'dataset' or 'datasource' folder for generic Account ID replacement ---
-        possible_data_folders = ["dataset", "datasource"]
-        data_folder_path = None
-        for folder_name in possible_data_folders:
-            current_path = os.path.join(temp_extract_dir, folder_name)
-            if os.path.isdir(current_path):
-                data_folder_path = current_path
-                print(f"\nFound data definition folder for generic Account ID replacement: '{folder_name}' at '{data_folder_path}'")
-                break
+def reuse_journaled_export(journal_run, journal_stage: str, downloaded_qs_path: str) -> bool:
+    """Puts the bundle an interrupted run already downloaded at downloaded_qs_path. False when there is none."""
+    artifact_path = journal_run.completed_artifact(journal_stage) if journal_run else None
+    if not artifact_path:
+        return False
+    if artifact_path != os.path.abspath(downloaded_qs_path):
+        shutil.copyfile(artifact_path, downloaded_qs_path)
+    print(f"\nReusing bundle {artifact_path} downloaded by an interrupted run (export job skipped).")
+    return True
 
-        dataset_files_scanned = 0
-        account_id_replaced_in_files_count = 0
-        
-        if data_folder_path:
-            print(f"Scanning for JSON files in '{os.path.basename(data_folder_path)}' folder to perform generic Account ID modifications...")
-            for filename in os.listdir(data_folder_path):
-                if filename.endswith(".json"):
-                    dataset_files_scanned += 1
-                    file_path = os.path.join(data_folder_path, filename)
-                    print(f"  Processing dataset/datasource file for Account ID: {filename}")
-
-                    file_had_account_id_replaced = False
-                    
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            raw_content_string = f.read()
-                        modified_content_string = raw_content_string
-
-                        if p_old_account_id and p_new_account_id and p_old_account_id in modified_content_string:
-                            temp_str = modified_content_string.replace(p_old_account_id, p_new_account_id)
-                            if temp_str != modified_content_string:
-                                modified_content_string = temp_str
-                                print(f"    Replaced generic Account ID string '{p_old_account_id}' with '{p_new_account_id}'.")
-                                file_had_account_id_replaced = True
-                        
-                        if file_had_account_id_replaced:
-                               with open(file_path, 'w', encoding='utf-8') as f:
-                                   f.write(modified_content_string)
-                               account_id_replaced_in_files_count += 1
-                        else:
-                            print(f"    No generic Account ID replacement needed or found in {filename}.")
-
-                    except Exception as e:
-                        print(f"  ERROR: An unexpected error occurred while processing {filename} for Account ID replacement: {e}")
-            
-            print(f"\nSummary of '{os.path.basename(data_folder_path)}' folder modifications (Account ID):")
-            if dataset_files_scanned > 0:
-                print(f"  Files scanned: {dataset_files_scanned}")
-                print(f"  Files where generic Account ID string was replaced: {account_id_replaced_in_files_count}")
-            else:
-                print(f"  No JSON files found or processed in '{os.path.basename(data_folder_path)}'. This is expected if export was run with --no-include-all.")
-        else:
-            print(f"\nWarning: Neither 'dataset' nor 'datasource' directory found for generic Account ID replacements. This is expected if export was run with --no-include-all.")
-
-        # --- Stage 3: Re-zip the bundle ---
-        base_output_name = os.path.splitext(output_modified_qs_path)[0]
-        print(f"\nZipping modified content from '{temp_extract_dir}' to '{output_modified_qs_path}'...")
-        created_zip_file = shutil.make_archive(base_name=base_output_name, format='zip', root_dir=temp_extract_dir)
-        final_qs_path = base_output_name + ".qs"
-        if os.path.exists(final_qs_path) and final_qs_path != created_zip_file:
-            os.remove(final_qs_path)
-        if created_zip_file != final_qs_path:
-            os.rename(created_zip_file, final_qs_path)
-        else:
-            final_qs_path = created_zip_file
-        print(f"Successfully created modified bundle file: {os.path.abspath(final_qs_path)}")
-        return os.path.abspath(final_qs_path)
-    except Exception as e:
-        print(f"An error occurred during QS file processing: {e}")
-        return None
-    finally:
-        if os.path.exists(temp_extract_dir):
-            print(f"Cleaning up temporary directory: {temp_extract_dir}")
-            shutil.rmtree(temp_extract_dir)
+def export_or_reuse_bundle(
+    quicksight_client,
+    source_aws_account_id: str,
+    source_aws_region: str,
+    export_job_id: str,
+    export_arns: list,
+    include_all_dependencies: bool,
+    downloaded_qs_path: str,
+    job_timeout_seconds: float = DEFAULT_JOB_TIMEOUT_SECONDS,
+    bundle_cache_dir: str = None,
+    bundle_cache_max_mb: float = DEFAULT_BUNDLE_CACHE_MAX_MB,
+    journal_run=None,
+    journal_stage: str = None
+) -> bool:
+    """
+    Puts the unmodified bundle at downloaded_qs_path: the one an interrupted run downloaded, the
+    cached one, or a new export. False on failure.
+    """
+    if reuse_journaled_export(journal_run, journal_stage, downloaded_qs_path):
+        return True
+    cache, cache_key, cache_hit = lookup_cached_bundle(
+        quicksight_client, source_aws_account_id, source_aws_region, export_arns, include_all_dependencies,
+        downloaded_qs_path, bundle_cache_dir, bundle_cache_max_mb)
+    if cache_hit:
+        if journal_run:
+            journal_run.completed(journal_stage, artifact_path=downloaded_qs_path)
+        return True
+    if not export_and_download_bundle(quicksight_client, source_aws_account_id, export_job_id, export_arns,
+                                      include_all_dependencies, downloaded_qs_path, job_timeout_seconds,
+                                      journal_run, journal_stage):
+        return False
+    store_cached_bundle(cache, cache_key, downloaded_qs_path)
+    return True
 
-def export_quicksight_dashboard_and_modify(
+async def export_or_reuse_bundle_async(
+    engine,
+    quicksight_client,
+    source_aws_account_id: str,
+    source_aws_region: str,
+    export_job_id: str,
+    export_arns: list,
+    include_all_dependencies: bool,
+    downloaded_qs_path: str,
+    job_timeout_seconds: float = DEFAULT_JOB_TIMEOUT_SECONDS,
+    bundle_cache_dir: str = None,
+    bundle_cache_max_mb: float = DEFAULT_BUNDLE_CACHE_MAX_MB,
+    journal_run=None,
+    journal_stage: str = None
+) -> bool:
+    """export_or_reuse_bundle on an AsyncEngine."""
+    if await engine.run_blocking(reuse_journaled_export, journal_run, journal_stage, downloaded_qs_path):
+        return True
+    cache, cache_key, cache_hit = await engine.run_blocking(
+        lookup_cached_bundle, quicksight_client, source_aws_account_id, source_aws_region, export_arns,
+        include_all_dependencies, downloaded_qs_path, bundle_cache_dir, bundle_cache_max_mb)
+    if cache_hit:
+        if journal_run:
+            await engine.run_blocking(journal_run.completed, journal_stage, None, downloaded_qs_path)
+        return True
+    if not await export_and_download_bundle_async(engine, quicksight_client, source_aws_account_id, export_job_id,
+                                                  export_arns, include_all_dependencies, downloaded_qs_path,
+                                                  job_timeout_seconds, journal_run, journal_stage):
+        return False
+    await engine.run_blocking(store_cached_bundle, cache, cache_key, downloaded_qs_path)
+    return True
+
+def plan_dashboard_export(
     source_aws_account_id: str,
     source_profile_name: str,
     dashboard_id: str,
     source_aws_region: str,
     include_all_dependencies: bool,
     output_file_path_base: str = None,
-    # This will now be Base64 encoded JSON
-    dashboard_replacements_json: str = "", 
+    dashboard_replacements_json: str = "",
     old_account_id: str = "",
-    new_account_id: str = ""
+    new_account_id: str = "",
+    resource_arns: list = None
 ):
+    """
+    The first stage of export_quicksight_dashboard_and_modify: creates the source client, the job ID,
+    the output paths and directory. Returns them as a dict, or None on failure.
+    """
     print(f"Initiating QuickSight dashboard export for Dashboard ID: {dashboard_id} from account {source_aws_account_id} in {source_aws_region}")
+    if resource_arns:
+        print(f"Exporting {len(resource_arns)} explicitly planned resource ARNs.")
     print(f"Include all dependencies: {include_all_dependencies}")
     print(f"Dashboard specific replacements JSON (Base64): {dashboard_replacements_json}")
     print(f"Generic Account ID replacement: OLD='{old_account_id}', NEW='{new_account_id}'")
 
 
     try:
-        session_params = {"region_name": source_aws_region}
-        if source_profile_name:
-            session_params["profile_name"] = source_profile_name
-        session = boto3.Session(**session_params)
-        quicksight_client = session.client('quicksight')
+        quicksight_client = get_client('quicksight', source_aws_region, source_profile_name)
     except Exception as e:
         print(f"Error creating Boto3 session or QuickSight client for source: {e}")
         return None
@@ -185,75 +317,55 @@ def export_quicksight_dashboard_and_modify(
 
     output_dir = os.path.dirname(os.path.abspath(downloaded_qs_path))
     if output_dir and not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+        os.makedirs(output_dir, exist_ok=True)
         print(f"Created output directory: {output_dir}")
 
-    try:
-        print(f"\nStarting asset bundle export job (Job ID: {export_job_id})...")
-        start_export_response = quicksight_client.start_asset_bundle_export_job(
-            AwsAccountId=source_aws_account_id,
-            AssetBundleExportJobId=export_job_id,
-            ResourceArns=[dashboard_arn],
-            ExportFormat='QUICKSIGHT_JSON',
-            IncludeAllDependencies=include_all_dependencies,
-        )
-        print(f"Export job started successfully. ARN: {start_export_response.get('Arn')}")
-    except Exception as e:
-        print(f"Error starting asset bundle export job: {e}")
-        return None
-
-    print("\nPolling export job status...")
-    download_url = None
-    job_status = "UNKNOWN"
-    max_retries = 120
-    retries = 0
-    while retries < max_retries:
-        try:
-            describe_job_response = quicksight_client.describe_asset_bundle_export_job(
-                AwsAccountId=source_aws_account_id, AssetBundleExportJobId=export_job_id)
-            job_status = describe_job_response.get('JobStatus')
-            print(f"Export Job status: {job_status} (Attempt {retries + 1}/{max_retries})")
-            if job_status == 'SUCCESSFUL':
-                download_url = describe_job_response.get('DownloadUrl')
-                print("Export job SUCCEEDED.")
-                break
-            elif job_status in ['FAILED', 'CANCELLED']:
-                print(f"Export job {job_status}.")
-                if 'Errors' in describe_job_response:
-                    print("Errors from export job:")
-                    for error_item in describe_job_response['Errors']:
-                        print(f"  - Type: {error_item.get('Type')}, Message: {error_item.get('Message')}, ARN: {error_item.get('Arn')}")
-                return None
-            retries += 1
-            time.sleep(10)
-        except Exception as e:
-            print(f"Error describing export job status: {e}")
-            time.sleep(10)
-            retries +=1
-            if retries >= max_retries:
-                print(f"Max retries reached for export job. Last status: {job_status}. Aborting.")
-                return None
-            continue
+    return {
+        "quicksight_client": quicksight_client,
+        "export_job_id": export_job_id,
+        "export_arns": resource_arns or [dashboard_arn],
+        "downloaded_qs_path": downloaded_qs_path,
+        "modified_qs_path": modified_qs_path,
+    }
 
-    if not download_url:
-        print(f"Export job did not succeed or no download URL was provided. Last status: {job_status}")
-        return None
+def rewrite_exported_bundle(
+    downloaded_qs_path: str,
+    modified_qs_path: str,
+    dashboard_replacements_json: str = "",
+    old_account_id: str = "",
+    new_account_id: str = "",
+    rewrite_mode: str = "text",
+    workers: int = 1,
+    promotion_map=None,
+    journal_run=None,
+    journal_stage: str = None,
+    source_stage: str = None,
+    deterministic_output: bool = False
+):
+    """
+    The last stage of export_quicksight_dashboard_and_modify: rewrites the downloaded bundle. Returns its
+    path or None. With journal_run, a rewrite an interrupted run made from the same export is reused.
+    With rewrite_mode "overrides" the bundle is left as exported; the import applies the promotion map.
+    """
+    if rewrite_mode == "overrides":
+        print(f"\nBundle left as exported; the import applies the promotion map through overrides: {downloaded_qs_path}")
+        return downloaded_qs_path
 
-    print(f"\nDownloading dashboard bundle to {os.path.abspath(downloaded_qs_path)}...")
-    try:
-        response = requests.get(download_url, stream=True)
-        response.raise_for_status()
-        with open(downloaded_qs_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        print(f"Dashboard bundle downloaded successfully: {os.path.abspath(downloaded_qs_path)}")
-    except Exception as e:
-        print(f"Error downloading asset bundle: {e}")
-        return None
+    reused_path = journal_run.completed_artifact(journal_stage, source_stage) if journal_run else None
+    if reused_path:
+        print(f"\nReusing bundle {reused_path} rewritten by an interrupted run from the same export.")
+        return reused_path
 
-    # Decode the Base64 string and parse it as JSON
+    # A promotion map arrives validated and precompiled; it replaces the Base64 map and account IDs
+    replacement_engine = None
     dashboard_replacements_map = {}
-    if dashboard_replacements_json: # Check if string is not empty
+    if promotion_map is not None:
+        print(f"Using {promotion_map.describe()}")
+        dashboard_replacements_map = promotion_map.id_replacements
+        old_account_id, new_account_id = promotion_map.old_account_id, promotion_map.new_account_id
+        replacement_engine = promotion_map.replacement_engine()
+    # Decode the Base64 string and parse it as JSON
+    elif dashboard_replacements_json: # Check if string is not empty
         try:
             decoded_json_bytes = base64.b64decode(dashboard_replacements_json)
             dashboard_replacements_map = json.loads(decoded_json_bytes.decode('utf-8'))
@@ -263,66 +375,215 @@ def export_quicksight_dashboard_and_modify(
             return None # Stop execution if parsing fails
 
 
+    # Built once so every bundle member is rewritten in a single scan
+    if replacement_engine is None:
+        replacement_engine = ReplacementEngine(dashboard_replacements_map, old_account_id, new_account_id)
+
     final_modified_qs_file = process_qs_file(
         downloaded_qs_path,
         modified_qs_path,
         dashboard_replacements_map, # Pass the dynamically determined map
         old_account_id,            # Pass the dynamically determined old account ID
-        new_account_id             # Pass the dynamically determined new account ID
+        new_account_id,            # Pass the dynamically determined new account ID
+        replacement_engine=replacement_engine,
+        rewrite_mode=rewrite_mode,
+        workers=workers,
+        deterministic=deterministic_output
     )
 
     if final_modified_qs_file:
+        if journal_run:
+            journal_run.completed(journal_stage, artifact_path=final_modified_qs_file, source_stage=source_stage)
         print(f"\nExport and modification stage complete. Modified QS file available at: {final_modified_qs_file}")
         return final_modified_qs_file
     else:
         print("\nProcessing of the QS file failed or no modifications made during export/modify stage.")
         return None
 
-def import_quicksight_bundle(
+def export_quicksight_dashboard_and_modify(
+    source_aws_account_id: str,
+    source_profile_name: str,
+    dashboard_id: str,
+    source_aws_region: str,
+    include_all_dependencies: bool,
+    output_file_path_base: str = None,
+    # This will now be Base64 encoded JSON
+    dashboard_replacements_json: str = "", 
+    old_account_id: str = "",
+    new_account_id: str = "",
+    rewrite_mode: str = "text",
+    job_timeout_seconds: float = DEFAULT_JOB_TIMEOUT_SECONDS,
+    workers: int = 1,
+    # Export these ARNs instead of the single dashboard; dashboard_id then only names the files and job
+    resource_arns: list = None,
+    # Reuse exports whose source assets are unchanged (see bundle_cache); None disables the cache
+    bundle_cache_dir: str = None,
+    bundle_cache_max_mb: float = DEFAULT_BUNDLE_CACHE_MAX_MB,
+    # A loaded promotion_map.PromotionMap; takes the place of the replacements JSON and account IDs
+    promotion_map=None,
+    # A job_journal.JournalRun: a rerun of an interrupted run reattaches to its export job or reuses its files
+    journal_run=None,
+    # Write the modified bundle byte-reproducibly, with a digest sidecar (see bundle_rewriter.rewrite_bundle)
+    deterministic_output: bool = False
+):
+    plan = plan_dashboard_export(source_aws_account_id, source_profile_name, dashboard_id, source_aws_region,
+                                 include_all_dependencies, output_file_path_base, dashboard_replacements_json,
+                                 old_account_id, new_account_id, resource_arns)
+    if plan is None:
+        return None
+
+    if not export_or_reuse_bundle(plan["quicksight_client"], source_aws_account_id, source_aws_region,
+                                  plan["export_job_id"], plan["export_arns"], include_all_dependencies,
+                                  plan["downloaded_qs_path"], job_timeout_seconds, bundle_cache_dir, bundle_cache_max_mb,
+                                  journal_run, f"export:{dashboard_id}"):
+        return None
+
+    return rewrite_exported_bundle(plan["downloaded_qs_path"], plan["modified_qs_path"], dashboard_replacements_json,
+                                   old_account_id, new_account_id, rewrite_mode, workers, promotion_map,
+                                   journal_run, f"rewrite:{dashboard_id}", f"export:{dashboard_id}", deterministic_output)
+
+async def export_quicksight_dashboard_and_modify_async(engine, **export_kwargs):
+    """export_quicksight_dashboard_and_modify on an AsyncEngine; takes the same keyword arguments."""
+    arguments = inspect.signature(export_quicksight_dashboard_and_modify).bind(**export_kwargs)
+    arguments.apply_defaults()
+    kwargs = arguments.arguments
+
+    plan = await engine.run_blocking(
+        plan_dashboard_export, kwargs["source_aws_account_id"], kwargs["source_profile_name"], kwargs["dashboard_id"],
+        kwargs["source_aws_region"], kwargs["include_all_dependencies"], kwargs["output_file_path_base"],
+        kwargs["dashboard_replacements_json"], kwargs["old_account_id"], kwargs["new_account_id"], kwargs["resource_arns"])
+    if plan is None:
+        return None
+
+    if not await export_or_reuse_bundle_async(
+            engine, plan["quicksight_client"], kwargs["source_aws_account_id"], kwargs["source_aws_region"],
+            plan["export_job_id"], plan["export_arns"], kwargs["include_all_dependencies"], plan["downloaded_qs_path"],
+            kwargs["job_timeout_seconds"], kwargs["bundle_cache_dir"], kwargs["bundle_cache_max_mb"],
+            kwargs["journal_run"], f"export:{kwargs['dashboard_id']}"):
+        return None
+
+    return await engine.run_blocking(
+        rewrite_exported_bundle, plan["downloaded_qs_path"], plan["modified_qs_path"],
+        kwargs["dashboard_replacements_json"], kwargs["old_account_id"], kwargs["new_account_id"],
+        kwargs["rewrite_mode"], kwargs["workers"], kwargs["promotion_map"],
+        kwargs["journal_run"], f"rewrite:{kwargs['dashboard_id']}", f"export:{kwargs['dashboard_id']}",
+        kwargs["deterministic_output"])
+
+def prepare_import(
     target_aws_account_id: str,
     target_profile: str,
     target_aws_region: str,
-    bundle_file_path: str
+    bundle_file_path: str,
+    staging_bucket: str = None,
+    staging_prefix: str = DEFAULT_STAGING_PREFIX,
+    s3_import_threshold_mb: float = DEFAULT_S3_IMPORT_THRESHOLD_MB,
+    s3_endpoint_url: str = None,
+    validate: bool = True,
+    known_ids=None,
+    check_references: bool = True,
+    validation_workers: int = 1,
+    journal_run=None,
+    journal_stage: str = None,
+    override_map=None
 ):
+    """
+    The stages of import_quicksight_bundle before the job starts: target client, local validation,
+    import overrides (from override_map) and staging. Returns a dict for start_import_job/
+    release_import_source, or None on failure. When an interrupted run's import job can be reattached
+    to, its ID is returned as "reattached_job_id" and validation and staging are skipped.
+    """
     print(f"\nInitiating QuickSight bundle import to target account {target_aws_account_id} in region {target_aws_region}...")
     print(f"Bundle file: {bundle_file_path}")
-    print("IMPORTANT: This is a 'simple import' without OverrideParameters. For cross-account migrations, "
-          "this may lead to failures if assets (like DataSources) in the bundle refer to ARNs "
-          "from the source account, or if other ID conflicts occur. Check import job errors carefully.")
+    if override_map is None:
+        print("IMPORTANT: This is a 'simple import' without OverrideParameters. For cross-account migrations, "
+              "this may lead to failures if assets (like DataSources) in the bundle refer to ARNs "
+              "from the source account, or if other ID conflicts occur. Check import job errors carefully.")
     if "--no-include-all" in " ".join(sys.argv).lower():
         print("Warning: If this bundle was exported with --no-include-all, ensure all dependencies "
               "(DataSources, DataSets, Themes) exist and are accessible in the target account.")
 
 
     try:
-        session_params = {"region_name": target_aws_region}
-        if target_profile:
-            session_params["profile_name"] = target_profile
-        target_session = boto3.Session(**session_params)
-        target_quicksight_client = target_session.client('quicksight')
+        target_quicksight_client = get_client('quicksight', target_aws_region, target_profile)
     except Exception as e:
         print(f"Error creating Boto3 session for target account: {e}")
-        return False
+        return None
 
     if not os.path.exists(bundle_file_path):
         print(f"Error: Bundle file not found at path: {bundle_file_path}")
-        return False
+        return None
 
-    try:
-        with open(bundle_file_path, 'rb') as f:
-            bundle_body = f.read()
+    reattached_job_id = journal_run and reattach_job(
+        journal_run, journal_stage,
+        lambda job_id: target_quicksight_client.describe_asset_bundle_import_job(
+            AwsAccountId=target_aws_account_id, AssetBundleImportJobId=job_id),
+        PENDING_IMPORT_JOB_STATUSES, "Import job", bundle_sha256=file_sha256(bundle_file_path))
+    if reattached_job_id:
+        return {"quicksight_client": target_quicksight_client, "import_source": None, "staged": None,
+                "staging_s3_client": None, "reattached_job_id": reattached_job_id, "import_overrides": {}}
+
+    if validate and not validate_before_import(bundle_file_path, known_ids, check_references, validation_workers):
+        return None
 
-        file_size_mb = len(bundle_body) / (1024 * 1024)
-        print(f"Bundle file size: {file_size_mb:.2f} MB")
-        if file_size_mb > 40:
-            print("Warning: Bundle file size is large. AWS API might have limitations for direct upload."
-                  "If import fails, consider using S3 URI based import via AWS Console or an updated script.")
+    import_overrides = {}
+    if override_map is not None:
+        try:
+            with run_report.span("overrides", bundle=os.path.basename(bundle_file_path)):
+                import_overrides, findings = generate_import_overrides(bundle_file_path, override_map)
+        except Exception as e:
+            print(f"Error generating import overrides for '{bundle_file_path}': {e}")
+            return None
+        if findings:
+            print(f"Error: {len(findings)} changes cannot be made through import overrides "
+                  f"({override_map.describe()}); use --rewrite-mode text or json for this bundle:")
+            for item in findings[:DEFAULT_MAX_PRINTED_FINDINGS]:
+                print(f"  - {format_finding(item)}")
+            if len(findings) > DEFAULT_MAX_PRINTED_FINDINGS:
+                print(f"  ... and {len(findings) - DEFAULT_MAX_PRINTED_FINDINGS} more.")
+            return None
+        print(f"Importing with overrides from the {override_map.describe()}: "
+              f"{', '.join(sorted(import_overrides)) or 'nothing to override'}.")
 
-        import_source = {'Body': bundle_body}
+    staging_s3_client = None
+    try:
+        if staging_bucket:
+            staging_s3_client = get_client('s3', target_aws_region, target_profile, endpoint_url=s3_endpoint_url)
+        import_source, staged = build_import_source(
+            bundle_file_path,
+            s3_client=staging_s3_client,
+            staging_bucket=staging_bucket,
+            staging_prefix=staging_prefix,
+            s3_import_threshold_mb=s3_import_threshold_mb
+        )
     except Exception as e:
-        print(f"Error reading bundle file '{bundle_file_path}': {e}")
+        print(f"Error preparing bundle file '{bundle_file_path}' for import: {e}")
+        return None
+    return {
+        "quicksight_client": target_quicksight_client,
+        "import_source": import_source,
+        "staged": staged,
+        "staging_s3_client": staging_s3_client,
+        "reattached_job_id": None,
+        "import_overrides": import_overrides,
+    }
+
+def journaled_import_done(journal_run, journal_stage: str, bundle_file_path: str) -> bool:
+    """Whether this run already imported this exact bundle before it was interrupted."""
+    if not journal_run or not os.path.exists(bundle_file_path):
         return False
+    if not journal_run.is_completed(journal_stage, bundle_sha256=file_sha256(bundle_file_path)):
+        return False
+    print(f"\nBundle {bundle_file_path} was already imported by an interrupted run; skipping the import.")
+    return True
 
+def start_import_job(prepared: dict, target_aws_account_id: str, bundle_file_path: str, journal_run=None,
+                     journal_stage: str = None):
+    """
+    Starts the asset bundle import job, or returns the reattached one. Returns its job ID, or None if it
+    could not be started.
+    """
+    if prepared["reattached_job_id"]:
+        return prepared["reattached_job_id"]
     base_bundle_name = os.path.basename(bundle_file_path).rsplit('.', 1)[0].replace('_modified', '').replace('_original', '')
     import_job_id = f"import-{base_bundle_name}-{uuid.uuid4()}"
     print(f"Generated Import Job ID: {import_job_id}")
@@ -331,61 +592,523 @@ def import_quicksight_bundle(
         start_import_params = {
             'AwsAccountId': target_aws_account_id,
             'AssetBundleImportJobId': import_job_id,
-            'AssetBundleImportSource': import_source
+            'AssetBundleImportSource': prepared["import_source"],
+            **prepared["import_overrides"]
         }
 
-        start_import_response = target_quicksight_client.start_asset_bundle_import_job(**start_import_params)
+        with run_report.span("import", job_id=import_job_id, source=next(iter(prepared["import_source"])),
+                             bytes=os.path.getsize(bundle_file_path)):
+            start_import_response = prepared["quicksight_client"].start_asset_bundle_import_job(**start_import_params)
         print(f"Import job started successfully. ARN: {start_import_response.get('Arn')}")
     except Exception as e:
         print(f"Error starting asset bundle import job: {e}")
+        return None
+    if journal_run:
+        journal_run.started(journal_stage, import_job_id, bundle_sha256=file_sha256(bundle_file_path))
+    return import_job_id
+
+def import_job_succeeded(wait_result, target_aws_account_id: str, target_aws_region: str,
+                         job_timeout_seconds: float, import_job_id: str = None, bundle_file_path: str = None,
+                         journal_run=None, journal_stage: str = None) -> bool:
+    """Prints (and journals) the outcome of a finished import wait, with the job's errors if it failed."""
+    job_status = wait_result.status
+    describe_job_response = wait_result.response or {}
+    if journal_run and not wait_result.timed_out:
+        if job_status == 'SUCCESSFUL':
+            journal_run.completed(journal_stage, import_job_id, bundle_sha256=file_sha256(bundle_file_path))
+        else:
+            journal_run.failed(journal_stage, import_job_id)
+    if job_status == 'SUCCESSFUL':
+        print("Import job SUCCEEDED.")
+        print(f"Imported assets should now be available in account {target_aws_account_id}, region {target_aws_region}.")
+        print("Please verify their functionality, especially data source connections and dataset refresh capabilities.")
+        return True
+    if wait_result.timed_out:
+        print(f"Import job did not reach a terminal state within {job_timeout_seconds}s. Last status: {job_status}.")
+        return False
+
+    print(f"Import job {job_status}.")
+    if 'Errors' in describe_job_response:
+        print("Errors from import job:")
+        for error_item in describe_job_response['Errors']:
+            error_message = f"  - Type: {error_item.get('Type')}, Message: {error_item.get('Message')}"
+            if 'ViolatedEntities' in error_item and error_item['ViolatedEntities']:
+                error_message += f", Violated Entities: {error_item.get('ViolatedEntities')}"
+            print(error_message)
+            if 'Errors' in error_item and isinstance(error_item['Errors'], list):
+                for sub_error in error_item['Errors']:
+                    print(f"    - Sub-Type: {sub_error.get('Type')}, Sub-Message: {sub_error.get('Message')}")
+    return False
+
+def release_import_source(prepared: dict, job_may_be_reading: bool = False):
+    """Removes the staged bundle, unless an unfinished import job may still be reading it."""
+    staged = prepared["staged"]
+    if job_may_be_reading and staged:
+        print(f"Keeping staged bundle s3://{staged[0]}/{staged[1]} while the import job may still be reading it.")
+    else:
+        remove_staged_bundle(prepared["staging_s3_client"], staged)
+
+def import_quicksight_bundle(
+    target_aws_account_id: str,
+    target_profile: str,
+    target_aws_region: str,
+    bundle_file_path: str,
+    job_timeout_seconds: float = DEFAULT_JOB_TIMEOUT_SECONDS,
+    # Bundles larger than s3_import_threshold_mb are staged here and imported via S3Uri
+    staging_bucket: str = None,
+    staging_prefix: str = DEFAULT_STAGING_PREFIX,
+    s3_import_threshold_mb: float = DEFAULT_S3_IMPORT_THRESHOLD_MB,
+    s3_endpoint_url: str = None,
+    # Checked locally before upload (see bundle_validator); known_ids are references that exist in the target
+    validate: bool = True,
+    known_ids=None,
+    check_references: bool = True,
+    validation_workers: int = 1,
+    # A job_journal.JournalRun: a rerun of an interrupted run reattaches to its import job or skips a finished one
+    journal_run=None,
+    # A loaded promotion_map.PromotionMap to apply through import overrides instead of a rewritten bundle
+    override_map=None
+):
+    journal_stage = f"import:{os.path.basename(bundle_file_path)}"
+    if journaled_import_done(journal_run, journal_stage, bundle_file_path):
+        return True
+    prepared = prepare_import(target_aws_account_id, target_profile, target_aws_region, bundle_file_path,
+                              staging_bucket, staging_prefix, s3_import_threshold_mb, s3_endpoint_url,
+                              validate, known_ids, check_references, validation_workers, journal_run, journal_stage,
+                              override_map)
+    if prepared is None:
         return False
 
-    print("\nPolling import job status (this may take a few minutes)...")
-    max_retries = 120
-    retries = 0
-    final_status = "UNKNOWN"
+    timed_out = False
+    try:
+        import_job_id = start_import_job(prepared, target_aws_account_id, bundle_file_path, journal_run, journal_stage)
+        if not import_job_id:
+            return False
 
-    while retries < max_retries:
+        print("\nPolling import job status (this may take a few minutes)...")
         try:
-            describe_job_response = target_quicksight_client.describe_asset_bundle_import_job(
-                AwsAccountId=target_aws_account_id,
-                AssetBundleImportJobId=import_job_id
-            )
-            job_status = describe_job_response.get('JobStatus')
-            final_status = job_status
-            print(f"Import Job status: {job_status} (Attempt {retries + 1}/{max_retries})")
-
-            if job_status == 'SUCCESSFUL':
-                print("Import job SUCCEEDED.")
-                print(f"Imported assets should now be available in account {target_aws_account_id}, region {target_aws_region}.")
-                print("Please verify their functionality, especially data source connections and dataset refresh capabilities.")
-                return True
-            elif job_status in ['FAILED', 'CANCELLED']:
-                print(f"Import job {job_status}.")
-                if 'Errors' in describe_job_response:
-                    print("Errors from import job:")
-                    for error_item in describe_job_response['Errors']:
-                        error_message = f"  - Type: {error_item.get('Type')}, Message: {error_item.get('Message')}"
-                        if 'ViolatedEntities' in error_item and error_item['ViolatedEntities']:
-                            error_message += f", Violated Entities: {error_item.get('ViolatedEntities')}"
-                        print(error_message)
-                        if 'Errors' in error_item and isinstance(error_item['Errors'], list):
-                            for sub_error in error_item['Errors']:
-                                print(f"    - Sub-Type: {sub_error.get('Type')}, Sub-Message: {sub_error.get('Message')}")
-                return False
-            retries += 1
-            time.sleep(10)
+            wait_result = JobWaiter(deadline_seconds=job_timeout_seconds).wait(
+                lambda: prepared["quicksight_client"].describe_asset_bundle_import_job(
+                    AwsAccountId=target_aws_account_id,
+                    AssetBundleImportJobId=import_job_id
+                ),
+                pending_statuses=PENDING_IMPORT_JOB_STATUSES,
+                label="Import job")
         except Exception as e:
-            print(f"Error describing asset bundle import job: {e}")
-            time.sleep(10)
-            retries +=1
-            if retries >= max_retries:
-                print(f"Max retries reached. Last import job status: {final_status}. Aborting.")
+            print(f"Error describing asset bundle import job: {e}. Aborting.")
+            return False
+        timed_out = wait_result.timed_out
+        return import_job_succeeded(wait_result, target_aws_account_id, target_aws_region, job_timeout_seconds,
+                                    import_job_id, bundle_file_path, journal_run, journal_stage)
+    finally:
+        release_import_source(prepared, job_may_be_reading=timed_out)
+
+async def import_quicksight_bundle_async(engine, **import_kwargs):
+    """
+    import_quicksight_bundle on an AsyncEngine; takes the same keyword arguments. The job holds an
+    "import" job slot from start to terminal status.
+    """
+    arguments = inspect.signature(import_quicksight_bundle).bind(**import_kwargs)
+    arguments.apply_defaults()
+    kwargs = arguments.arguments
+    journal_run = kwargs["journal_run"]
+    journal_stage = f"import:{os.path.basename(kwargs['bundle_file_path'])}"
+
+    if await engine.run_blocking(journaled_import_done, journal_run, journal_stage, kwargs["bundle_file_path"]):
+        return True
+    prepared = await engine.run_blocking(
+        prepare_import, kwargs["target_aws_account_id"], kwargs["target_profile"], kwargs["target_aws_region"],
+        kwargs["bundle_file_path"], kwargs["staging_bucket"], kwargs["staging_prefix"], kwargs["s3_import_threshold_mb"],
+        kwargs["s3_endpoint_url"], kwargs["validate"], kwargs["known_ids"], kwargs["check_references"],
+        kwargs["validation_workers"], journal_run, journal_stage, kwargs["override_map"])
+    if prepared is None:
+        return False
+
+    import_job_id = None
+    try:
+        async with engine.job_slot("import"):
+            import_job_id = await engine.run_blocking(start_import_job, prepared, kwargs["target_aws_account_id"],
+                                                      kwargs["bundle_file_path"], journal_run, journal_stage)
+            if not import_job_id:
+                await engine.run_blocking(release_import_source, prepared)
                 return False
-            continue
 
-    print(f"Import job did not reach a terminal state after {max_retries} retries. Last status: {final_status}.")
-    return False
+            print(f"\nPolling import job status ({import_job_id})...")
+            wait_result = await engine.wait_job(
+                lambda: prepared["quicksight_client"].describe_asset_bundle_import_job(
+                    AwsAccountId=kwargs["target_aws_account_id"],
+                    AssetBundleImportJobId=import_job_id
+                ),
+                pending_statuses=PENDING_IMPORT_JOB_STATUSES,
+                label="Import job", deadline_seconds=kwargs["job_timeout_seconds"])
+    except asyncio.CancelledError:
+        if import_job_id:
+            print(f"Cancelled while waiting on import job {import_job_id}; the job keeps running in QuickSight.")
+        # Cleanup is a quick S3 call at most; run inline so a second cancellation cannot interrupt it
+        release_import_source(prepared, job_may_be_reading=bool(import_job_id))
+        raise
+    except Exception as e:
+        print(f"Error describing asset bundle import job: {e}. Aborting.")
+        await engine.run_blocking(release_import_source, prepared)
+        return False
+
+    await engine.run_blocking(release_import_source, prepared, wait_result.timed_out)
+    return await engine.run_blocking(
+        import_job_succeeded, wait_result, kwargs["target_aws_account_id"], kwargs["target_aws_region"],
+        kwargs["job_timeout_seconds"], import_job_id, kwargs["bundle_file_path"], journal_run, journal_stage)
+
+def load_dashboard_manifest(manifest_path: str) -> list:
+    """
+    Reads dashboard IDs from a manifest file: either a JSON list (or {"dashboards": [...]})
+    or plain text with one ID per line. Blank lines and lines starting with '#' are ignored.
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    try:
+        manifest = json.loads(content)
+    except json.JSONDecodeError:
+        return [line.strip() for line in content.splitlines() if line.strip() and not line.strip().startswith('#')]
+    if isinstance(manifest, dict):
+        manifest = manifest.get("dashboards", [])
+    return [str(dashboard_id).strip() for dashboard_id in manifest if str(dashboard_id).strip()]
+
+def promote_dashboards_batch(
+    dashboard_ids: list,
+    export_kwargs: dict,
+    import_kwargs: dict = None,
+    max_concurrent_jobs: int = DEFAULT_MAX_CONCURRENT_JOBS
+) -> list:
+    """
+    Promotes several dashboards at once. Export jobs run concurrently, bounded by max_concurrent_jobs,
+    and each bundle is rewritten as soon as its export finishes. When import_kwargs is given, the import
+    for a dashboard starts right away in a separate pool with the same bound, while other exports continue.
+    export_kwargs/import_kwargs hold the arguments shared by every dashboard.
+    Returns one result dict per dashboard, in the order given.
+    """
+    results = {dashboard_id: {"dashboard_id": dashboard_id, "status": "PENDING", "export_seconds": 0.0,
+                              "import_seconds": 0.0, "wall_seconds": 0.0, "bundle": None}
+               for dashboard_id in dashboard_ids}
+    batch_started = time.perf_counter()
+    output_file_base = export_kwargs.get("output_file_path_base")
+
+    def export_one(dashboard_id):
+        started = time.perf_counter()
+        kwargs = dict(export_kwargs)
+        if output_file_base:
+            kwargs["output_file_path_base"] = f"{output_file_base}_{dashboard_id}"
+        with run_report.context(dashboard_id=dashboard_id):
+            bundle = export_quicksight_dashboard_and_modify(dashboard_id=dashboard_id, **kwargs)
+        results[dashboard_id]["export_seconds"] = time.perf_counter() - started
+        return bundle
+
+    def import_one(dashboard_id, bundle):
+        started = time.perf_counter()
+        with run_report.context(dashboard_id=dashboard_id):
+            successful = import_quicksight_bundle(bundle_file_path=bundle, **import_kwargs)
+        results[dashboard_id]["import_seconds"] = time.perf_counter() - started
+        return successful
+
+    with ThreadPoolExecutor(max_workers=max_concurrent_jobs) as export_pool, \
+            ThreadPoolExecutor(max_workers=max_concurrent_jobs) as import_pool:
+        export_futures = {export_pool.submit(export_one, dashboard_id): dashboard_id for dashboard_id in dashboard_ids}
+        import_futures = {}
+        for future in as_completed(export_futures):
+            dashboard_id = export_futures[future]
+            try:
+                bundle = future.result()
+            except Exception as e:
+                print(f"ERROR: Export of dashboard {dashboard_id} raised: {e}")
+                bundle = None
+            results[dashboard_id]["bundle"] = bundle
+            if not bundle:
+                results[dashboard_id]["status"] = "EXPORT_FAILED"
+                results[dashboard_id]["wall_seconds"] = time.perf_counter() - batch_started
+            elif import_kwargs is None:
+                results[dashboard_id]["status"] = "EXPORTED"
+                results[dashboard_id]["wall_seconds"] = time.perf_counter() - batch_started
+            else:
+                import_futures[import_pool.submit(import_one, dashboard_id, bundle)] = dashboard_id
+
+        for future in as_completed(import_futures):
+            dashboard_id = import_futures[future]
+            try:
+                successful = future.result()
+            except Exception as e:
+                print(f"ERROR: Import of dashboard {dashboard_id} raised: {e}")
+                successful = False
+            results[dashboard_id]["status"] = "IMPORTED" if successful else "IMPORT_FAILED"
+            results[dashboard_id]["wall_seconds"] = time.perf_counter() - batch_started
+
+    return [results[dashboard_id] for dashboard_id in dashboard_ids]
+
+def promote_dashboards_async(
+    dashboard_ids: list,
+    export_kwargs: dict,
+    import_kwargs: dict = None,
+    max_concurrent_jobs: int = DEFAULT_MAX_CONCURRENT_JOBS,
+    offload_threads: int = DEFAULT_OFFLOAD_THREADS
+) -> list:
+    """
+    promote_dashboards_batch on an asyncio engine: each dashboard is one task that exports, rewrites
+    and imports, with max_concurrent_jobs export jobs and, separately, import jobs in flight. Job
+    waits hold no thread, so max_concurrent_jobs can be far larger than offload_threads.
+    Ctrl-C cancels the promotions still running; they are reported as CANCELLED.
+    Returns one result dict per dashboard, in the order given.
+    """
+    engine = AsyncEngine(max_concurrent_jobs, offload_threads)
+    results = {dashboard_id: {"dashboard_id": dashboard_id, "status": "PENDING", "export_seconds": 0.0,
+                              "import_seconds": 0.0, "wall_seconds": 0.0, "bundle": None}
+               for dashboard_id in dashboard_ids}
+    batch_started = time.perf_counter()
+    output_file_base = export_kwargs.get("output_file_path_base")
+
+    async def promote_one(dashboard_id):
+        result = results[dashboard_id]
+        kwargs = dict(export_kwargs)
+        if output_file_base:
+            kwargs["output_file_path_base"] = f"{output_file_base}_{dashboard_id}"
+        with run_report.context(dashboard_id=dashboard_id):
+            try:
+                started = time.perf_counter()
+                bundle = await export_quicksight_dashboard_and_modify_async(engine, dashboard_id=dashboard_id, **kwargs)
+                result["export_seconds"] = time.perf_counter() - started
+                result["bundle"] = bundle
+                if not bundle:
+                    result["status"] = "EXPORT_FAILED"
+                elif import_kwargs is None:
+                    result["status"] = "EXPORTED"
+                else:
+                    started = time.perf_counter()
+                    successful = await import_quicksight_bundle_async(engine, bundle_file_path=bundle, **import_kwargs)
+                    result["import_seconds"] = time.perf_counter() - started
+                    result["status"] = "IMPORTED" if successful else "IMPORT_FAILED"
+            except asyncio.CancelledError:
+                result["status"] = "CANCELLED"
+                raise
+            except Exception as e:
+                print(f"ERROR: Promotion of dashboard {dashboard_id} raised: {e}")
+                result["status"] = "IMPORT_FAILED" if result["bundle"] else "EXPORT_FAILED"
+            finally:
+                result["wall_seconds"] = time.perf_counter() - batch_started
+
+    engine.run([promote_one(dashboard_id) for dashboard_id in dashboard_ids])
+    return [results[dashboard_id] for dashboard_id in dashboard_ids]
+
+def promote_dashboards_deduplicated(
+    dashboard_ids: list,
+    export_kwargs: dict,
+    import_kwargs: dict = None,
+    max_resource_arns_per_export: int = DEFAULT_MAX_RESOURCE_ARNS_PER_EXPORT
+) -> list:
+    """
+    Promotes several dashboards with their dependencies deduplicated. The dependency graph is resolved
+    first, then one export (or a few, in dependency order) carries every shared dataset, datasource and
+    theme exactly once. Each export group is rewritten and imported before the next one starts.
+    Returns one result dict per dashboard; all dashboards share the outcome of the run.
+    """
+    started = time.perf_counter()
+    results = [{"dashboard_id": dashboard_id, "status": "PENDING", "export_seconds": 0.0,
+                "import_seconds": 0.0, "wall_seconds": 0.0, "bundle": None}
+               for dashboard_id in dashboard_ids]
+
+    try:
+        quicksight_client = get_client('quicksight', export_kwargs["source_aws_region"],
+                                       export_kwargs.get("source_profile_name"))
+        _, export_groups = plan_deduplicated_exports(
+            quicksight_client,
+            export_kwargs["source_aws_account_id"],
+            export_kwargs["source_aws_region"],
+            dashboard_ids,
+            max_resource_arns_per_export=max_resource_arns_per_export
+        )
+    except Exception as e:
+        print(f"Error resolving the dependency graph: {e}")
+        for result in results:
+            result["status"] = "EXPORT_FAILED"
+        return results
+
+    if import_kwargs is not None:
+        # Later groups refer to assets imported with earlier ones, so every planned asset counts as resolvable
+        planned_ids = {arn_resource_id(arn) for resource_arns in export_groups for arn in resource_arns}
+        import_kwargs = dict(import_kwargs, known_ids=set(import_kwargs.get("known_ids") or ()) | planned_ids)
+
+    status = "IMPORTED" if import_kwargs is not None else "EXPORTED"
+    export_seconds = 0.0
+    import_seconds = 0.0
+    output_file_base = export_kwargs.get("output_file_path_base") or "./deduplicated"
+    for group_number, resource_arns in enumerate(export_groups, start=1):
+        print(f"\n--- Export group {group_number}/{len(export_groups)}: {len(resource_arns)} assets ---")
+        group_started = time.perf_counter()
+        kwargs = dict(export_kwargs, output_file_path_base=f"{output_file_base}_group{group_number}",
+                      include_all_dependencies=False)
+        with run_report.context(export_group=group_number):
+            bundle = export_quicksight_dashboard_and_modify(dashboard_id=f"group{group_number}",
+                                                            resource_arns=resource_arns, **kwargs)
+        export_seconds += time.perf_counter() - group_started
+        if not bundle:
+            status = "EXPORT_FAILED"
+            break
+        if import_kwargs is not None:
+            group_started = time.perf_counter()
+            with run_report.context(export_group=group_number):
+                successful = import_quicksight_bundle(bundle_file_path=bundle, **import_kwargs)
+            import_seconds += time.perf_counter() - group_started
+            if not successful:
+                status = "IMPORT_FAILED"
+                break
+
+    for result in results:
+        result.update(status=status, export_seconds=export_seconds, import_seconds=import_seconds,
+                      wall_seconds=time.perf_counter() - started)
+    return results
+
+def load_fanout_targets(targets_path: str) -> list:
+    """
+    Reads fan-out targets from a JSON file: a list (or {"targets": [...]}) of objects with a unique
+    "name" and "target_account_id", and optionally "target_aws_region", "target_profile",
+    "new_account_id" (defaults to target_account_id), "dashboard_replacements" (an ID map),
+    "promotion_map" (a promotion-map file, relative to targets_path; replaces the previous two),
+    "staging_bucket" and "staging_prefix".
+    """
+    with open(targets_path, 'r', encoding='utf-8') as f:
+        targets = json.load(f)
+    if isinstance(targets, dict):
+        targets = targets.get("targets", [])
+    names = set()
+    for target in targets:
+        if not target.get("name") or not target.get("target_account_id"):
+            raise ValueError(f"Every fan-out target needs a 'name' and a 'target_account_id': {target}")
+        if target["name"] in names:
+            raise ValueError(f"Duplicate fan-out target name: {target['name']}")
+        names.add(target["name"])
+        if target.get("promotion_map"):
+            map_path = os.path.join(os.path.dirname(os.path.abspath(targets_path)), target["promotion_map"])
+            target["promotion_map"] = load_promotion_map(map_path)
+    return targets
+
+def promote_dashboard_fanout(
+    dashboard_id: str,
+    targets: list,
+    export_kwargs: dict,
+    import_kwargs: dict = None,
+    max_concurrent_jobs: int = DEFAULT_MAX_CONCURRENT_JOBS
+) -> list:
+    """
+    Promotes one dashboard to several targets from a single export. The bundle is exported (or taken
+    from the bundle cache) once, every target's bundle is rewritten in one pass over it, and when
+    import_kwargs is given the target imports run in parallel, bounded by max_concurrent_jobs.
+    Per-target settings from load_fanout_targets override import_kwargs, and a target's
+    dashboard_replacements are applied on top of export_kwargs["dashboard_replacements"].
+    Returns one result dict per target, in the order given.
+    """
+    results = [{"target": target["name"], "target_account_id": target["target_account_id"],
+                "target_aws_region": target.get("target_aws_region") or (import_kwargs or {}).get("target_aws_region"),
+                "status": "PENDING", "export_seconds": 0.0, "rewrite_seconds": 0.0, "import_seconds": 0.0, "bundle": None}
+               for target in targets]
+
+    def fail_all(status):
+        for result in results:
+            result["status"] = status
+        return results
+
+    source_aws_account_id = export_kwargs["source_aws_account_id"]
+    source_aws_region = export_kwargs["source_aws_region"]
+    base_name_for_output = export_kwargs.get("output_file_path_base") or f"./{dashboard_id.replace(':', '_').replace('/', '_')}"
+    downloaded_qs_path = f"{base_name_for_output}_original.qs"
+    os.makedirs(os.path.dirname(os.path.abspath(downloaded_qs_path)), exist_ok=True)
+
+    # --- Export once ---
+    started = time.perf_counter()
+    try:
+        quicksight_client = get_client('quicksight', source_aws_region, export_kwargs.get("source_profile_name"))
+    except Exception as e:
+        print(f"Error creating Boto3 session or QuickSight client for source: {e}")
+        return fail_all("EXPORT_FAILED")
+    exported = export_or_reuse_bundle(
+        quicksight_client, source_aws_account_id, source_aws_region,
+        f"export-{dashboard_id.replace('-', '')}-{uuid.uuid4()}",
+        [f"arn:aws:quicksight:{source_aws_region}:{source_aws_account_id}:dashboard/{dashboard_id}"],
+        export_kwargs.get("include_all_dependencies", True), downloaded_qs_path,
+        export_kwargs.get("job_timeout_seconds", DEFAULT_JOB_TIMEOUT_SECONDS),
+        export_kwargs.get("bundle_cache_dir"), export_kwargs.get("bundle_cache_max_mb", DEFAULT_BUNDLE_CACHE_MAX_MB))
+    export_seconds = time.perf_counter() - started
+    for result in results:
+        result["export_seconds"] = export_seconds
+    if not exported:
+        return fail_all("EXPORT_FAILED")
+
+    # --- Rewrite for every target in one pass ---
+    started = time.perf_counter()
+    rewrite_targets = [
+        (f"{base_name_for_output}_{target['name']}_modified.qs",
+         target["promotion_map"].replacement_engine() if target.get("promotion_map") else
+         ReplacementEngine(dict(export_kwargs.get("dashboard_replacements") or {}, **(target.get("dashboard_replacements") or {})),
+                           export_kwargs.get("old_account_id"),
+                           target.get("new_account_id") or target["target_account_id"]))
+        for target in targets
+    ]
+    bundles = process_qs_file_fanout(downloaded_qs_path, rewrite_targets, export_kwargs.get("rewrite_mode", "text"),
+                                     export_kwargs.get("deterministic_output", False))
+    rewrite_seconds = time.perf_counter() - started
+    for result in results:
+        result["rewrite_seconds"] = rewrite_seconds
+    if not bundles:
+        return fail_all("REWRITE_FAILED")
+    for result, bundle in zip(results, bundles):
+        result["bundle"] = bundle
+        result["status"] = "EXPORTED"
+    if import_kwargs is None:
+        return results
+
+    # --- Import to every target in parallel ---
+    def import_one(target, result):
+        kwargs = dict(import_kwargs, target_aws_account_id=target["target_account_id"],
+                      target_aws_region=result["target_aws_region"])
+        for key in ("target_profile", "staging_bucket", "staging_prefix"):
+            if target.get(key):
+                kwargs[key] = target[key]
+        target_ids = target["promotion_map"].asset_ids if target.get("promotion_map") else \
+            set(target.get("dashboard_replacements") or {}) | set((target.get("dashboard_replacements") or {}).values())
+        kwargs["known_ids"] = set(kwargs.get("known_ids") or ()) | target_ids
+        started = time.perf_counter()
+        with run_report.context(target=target["name"]):
+            successful = import_quicksight_bundle(bundle_file_path=result["bundle"], **kwargs)
+        result["import_seconds"] = time.perf_counter() - started
+        return successful
+
+    with ThreadPoolExecutor(max_workers=max_concurrent_jobs) as import_pool:
+        import_futures = {import_pool.submit(import_one, target, result): result for target, result in zip(targets, results)}
+        for future in as_completed(import_futures):
+            result = import_futures[future]
+            try:
+                successful = future.result()
+            except Exception as e:
+                print(f"ERROR: Import to target {result['target']} raised: {e}")
+                successful = False
+            result["status"] = "IMPORTED" if successful else "IMPORT_FAILED"
+    return results
+
+def print_batch_summary(results: list):
+    """Prints one line per dashboard with its final status and timings."""
+    print("\n--- Batch promotion summary ---")
+    print(f"{'Dashboard ID':<40} {'Status':<14} {'Export (s)':>10} {'Import (s)':>10} {'Wall (s)':>10}")
+    for result in results:
+        print(f"{result['dashboard_id']:<40} {result['status']:<14} {result['export_seconds']:>10.1f} "
+              f"{result['import_seconds']:>10.1f} {result['wall_seconds']:>10.1f}")
+    succeeded = sum(1 for result in results if result['status'] in ('IMPORTED', 'EXPORTED'))
+    print(f"{succeeded}/{len(results)} dashboards promoted successfully.")
+
+def print_fanout_summary(results: list):
+    """Prints one line per fan-out target with its final status and import time."""
+    print("\n--- Fan-out promotion summary ---")
+    if results:
+        print(f"Export: {results[0]['export_seconds']:.1f}s, rewrite of all targets: {results[0]['rewrite_seconds']:.1f}s")
+    print(f"{'Target':<20} {'Account ID':<14} {'Region':<16} {'Status':<14} {'Import (s)':>10}")
+    for result in results:
+        print(f"{result['target']:<20} {result['target_account_id']:<14} {str(result['target_aws_region']):<16} "
+              f"{result['status']:<14} {result['import_seconds']:>10.1f}")
+    succeeded = sum(1 for result in results if result['status'] in ('IMPORTED', 'EXPORTED'))
+    print(f"{succeeded}/{len(results)} targets promoted successfully.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -403,6 +1126,11 @@ if __name__ == "__main__":
     export_group.add_argument("--source-account-id", help="AWS Account ID of the source QuickSight environment.")
     export_group.add_argument("--source-profile", help="AWS CLI profile name for the source account (optional).")
     export_group.add_argument("--dashboard-id", help="The ID of the QuickSight dashboard to export from source.")
+    export_group.add_argument("--dashboard-ids", help="Comma-separated dashboard IDs to promote together as a batch.")
+    export_group.add_argument("--dashboard-manifest", help="Path to a file listing dashboard IDs to promote as a batch\n"
+                                                           "(JSON list, or one ID per line).")
+    export_group.add_argument("--fanout-targets", help="Path to a JSON file of targets to promote --dashboard-id to from a single export.\n"
+                                                       "Each target gets its own account map; imports run in parallel.")
     export_group.add_argument("--source-aws-region", help="AWS region for the SOURCE QuickSight account (e.g., 'us-east-1').")
     export_group.add_argument("--output-file-base", help="Optional. Base path and name for output files (e.g., './exports/mydash'). Defaults to './<dashboard_id>' structure.")
     export_group.add_argument(
@@ -417,17 +1145,129 @@ if __name__ == "__main__":
     # New arguments for dynamic content modification (now expects Base64 encoded)
     export_group.add_argument("--promotion-type", help="The type of promotion (e.g., 'DEV to QA', 'QA to STAGE').")
     export_group.add_argument("--dashboard-replacements-json", help="Base64 encoded JSON string containing specific dashboard ID replacements.")
+    export_group.add_argument("--promotion-map", help="Path to a promotion-map file (see promotion-maps/). Replaces\n"
+                                                      "--dashboard-replacements-json and the generic account IDs.")
     export_group.add_argument("--old-account-id-generic", help="Generic old account ID for replacement in dataset/datasource files.")
     export_group.add_argument("--new-account-id-generic", help="Generic new account ID for replacement in dataset/datasource files.")
+    export_group.add_argument(
+        "--rewrite-mode",
+        choices=["text", "json", "overrides"],
+        default="text",
+        help="How bundle contents are rewritten (default: text).\n"
+             "text: raw string replacement in dashboard and dataset/datasource files.\n"
+             "json: parse each JSON member once and rewrite only known ID/ARN fields.\n"
+             "overrides: import the bundle as exported, with the --promotion-map applied through the import\n"
+             "job's OverrideParameters/Permissions/Tags. Refused when the map changes asset IDs or other\n"
+             "text an import cannot override."
+    )
+    export_group.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Rewrite bundle members in a process pool of this size; output is identical to a serial run (default: 1)."
+    )
+    export_group.add_argument(
+        "--bundle-cache-dir",
+        help="Cache exported bundles here, keyed by the source assets' LastUpdatedTime. When nothing changed\n"
+             "since a cached export, the export job and download are skipped (default: no cache)."
+    )
+    export_group.add_argument(
+        "--bundle-cache-max-mb",
+        type=float,
+        default=DEFAULT_BUNDLE_CACHE_MAX_MB,
+        help=f"Evict least recently used cached bundles beyond this total size (default: {DEFAULT_BUNDLE_CACHE_MAX_MB})."
+    )
+    export_group.add_argument(
+        "--deterministic-output",
+        action="store_true",
+        help="Write modified bundles reproducibly: members sorted by name, fixed timestamps and compression level,\n"
+             "plus a <bundle>.digest.json content digest sidecar. Identical inputs give byte-identical bundles."
+    )
 
+    parser.add_argument(
+        "--job-timeout-seconds",
+        type=float,
+        default=DEFAULT_JOB_TIMEOUT_SECONDS,
+        help=f"Overall deadline for each export/import job to finish (default: {DEFAULT_JOB_TIMEOUT_SECONDS}s)."
+    )
+    parser.add_argument(
+        "--deduplicate-dependencies",
+        action="store_true",
+        help="Batch mode: resolve the dependency graph of all dashboards first and export every shared\n"
+             "dataset, datasource and theme exactly once, in a single bundle where possible."
+    )
+    parser.add_argument(
+        "--max-resource-arns-per-export",
+        type=int,
+        default=DEFAULT_MAX_RESOURCE_ARNS_PER_EXPORT,
+        help=f"With --deduplicate-dependencies: split larger plans into several exports (default: {DEFAULT_MAX_RESOURCE_ARNS_PER_EXPORT})."
+    )
+    parser.add_argument(
+        "--max-concurrent-jobs",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENT_JOBS,
+        help=f"Batch mode: maximum export jobs, and separately import jobs, running at once (default: {DEFAULT_MAX_CONCURRENT_JOBS})."
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["threads", "asyncio"],
+        default="threads",
+        help="Batch mode: how jobs are driven (default: threads).\n"
+             "threads: a thread per running job, each polling with blocking sleeps.\n"
+             "asyncio: one event loop waits on every job and offloads API calls to --offload-threads threads,\n"
+             "so --max-concurrent-jobs can be raised to dozens. Ctrl-C cancels the running promotions."
+    )
+    parser.add_argument(
+        "--offload-threads",
+        type=int,
+        default=DEFAULT_OFFLOAD_THREADS,
+        help=f"With --engine asyncio: threads for blocking API calls, downloads and rewrites (default: {DEFAULT_OFFLOAD_THREADS})."
+    )
 
     import_group = parser.add_argument_group('Import Options (required if not --export-only)')
     import_group.add_argument("--target-account-id", help="Target AWS Account ID for import.")
     import_group.add_argument("--target-profile", help="AWS CLI profile for the target account (optional).")
     import_group.add_argument("--target-aws-region", help="AWS Region for the target QuickSight account.")
     import_group.add_argument("--input-bundle-file", help="Path to the .qs bundle file to import (required for --import-only).")
+    import_group.add_argument(
+        "--staging-bucket",
+        help="S3 bucket in the target account/region for staging bundles larger than --s3-import-threshold-mb.\n"
+             "Staged bundles are uploaded with concurrent multipart parts and imported via S3Uri."
+    )
+    import_group.add_argument("--staging-prefix", default=DEFAULT_STAGING_PREFIX,
+                              help=f"Key prefix for staged bundles (default: {DEFAULT_STAGING_PREFIX}).")
+    import_group.add_argument(
+        "--s3-import-threshold-mb",
+        type=float,
+        default=DEFAULT_S3_IMPORT_THRESHOLD_MB,
+        help=f"Bundles above this size are imported from the staging bucket (default: {DEFAULT_S3_IMPORT_THRESHOLD_MB})."
+    )
+    import_group.add_argument("--s3-endpoint-url",
+                              help="Endpoint for the staging S3 client, e.g. a local MinIO (optional).")
+    import_group.add_argument(
+        "--skip-validation",
+        action="store_true",
+        help="Do not check the bundle locally before import (unparsable JSON, field IDs missing from\n"
+             "field wells, dataset/data source references that resolve nowhere)."
+    )
+
+    parser.add_argument(
+        "--journal",
+        help="SQLite job journal (e.g. ./.promotion-journal.db). A rerun with the same arguments after a crash\n"
+             "reattaches to the export/import jobs already started and reuses bundles already downloaded\n"
+             "and rewritten. A run's entries are cleared once it succeeds. Not used with --fanout-targets."
+    )
+    parser.add_argument(
+        "--journal-max-age-hours",
+        type=float,
+        default=DEFAULT_JOURNAL_MAX_AGE_HOURS,
+        help=f"Ignore journal entries older than this (default: {DEFAULT_JOURNAL_MAX_AGE_HOURS})."
+    )
+    parser.add_argument("--report", help="Write a JSON run report with a timing span per stage to this path.")
+    parser.add_argument("--metrics", help="Write the per-stage totals in OpenMetrics text format to this path.")
 
     args = parser.parse_args()
+    run_report.write_on_exit(args.report, args.metrics)
 
     # --- Debugging print statements ---
     print(f"DEBUG (Python Script Start): dashboard_replacements_json argument received: {args.dashboard_replacements_json}")
@@ -449,6 +1289,176 @@ if __name__ == "__main__":
             print(f"Received Base64 string was: '{args.dashboard_replacements_json}'")
             sys.exit(1) # Exit if cannot parse this crucial input
 
+    promotion_map = None
+    if args.promotion_map:
+        try:
+            promotion_map = load_promotion_map(args.promotion_map)
+        except (OSError, PromotionMapError) as e:
+            print(f"ERROR: Could not load promotion map: {e}")
+            sys.exit(1)
+        print(f"Loaded {promotion_map.describe()}")
+        dashboard_replacements_map_for_export = promotion_map.id_replacements
+        args.old_account_id_generic = promotion_map.old_account_id
+        args.new_account_id_generic = promotion_map.new_account_id
+
+    if args.rewrite_mode == "overrides" and promotion_map is None:
+        parser.error("--rewrite-mode overrides requires --promotion-map.")
+    # With --rewrite-mode overrides the import applies the map to the bundle as exported
+    override_map = promotion_map if args.rewrite_mode == "overrides" else None
+
+    # References to these IDs resolve in the target even when the bundle does not carry the asset
+    known_ids = promotion_map.asset_ids if promotion_map else \
+        set(dashboard_replacements_map_for_export) | set(dashboard_replacements_map_for_export.values())
+    validation_kwargs = dict(
+        validate=not args.skip_validation,
+        known_ids=known_ids,
+        check_references=args.include_all_dependencies,
+        validation_workers=args.workers
+    )
+
+
+    batch_dashboard_ids = []
+    if args.dashboard_ids:
+        batch_dashboard_ids.extend(dashboard_id.strip() for dashboard_id in args.dashboard_ids.split(',') if dashboard_id.strip())
+    if args.dashboard_manifest:
+        batch_dashboard_ids.extend(load_dashboard_manifest(args.dashboard_manifest))
+    batch_dashboard_ids = list(dict.fromkeys(batch_dashboard_ids))
+
+    # A run is identified by everything that decides what gets exported, rewritten and imported
+    journal_run = None
+    if args.journal:
+        journal_run = JobJournal(args.journal, args.journal_max_age_hours).run(run_key(
+            action="export-only" if args.export_only else "import-only" if args.import_only else "export-and-import",
+            source_account_id=args.source_account_id,
+            source_aws_region=args.source_aws_region,
+            dashboards=batch_dashboard_ids or [args.dashboard_id],
+            include_all_dependencies=args.include_all_dependencies,
+            deduplicate_dependencies=args.deduplicate_dependencies,
+            dashboard_replacements_json=args.dashboard_replacements_json,
+            promotion_map=promotion_map.digest if promotion_map else None,
+            old_account_id=args.old_account_id_generic,
+            new_account_id=args.new_account_id_generic,
+            rewrite_mode=args.rewrite_mode,
+            deterministic_output=args.deterministic_output,
+            output_file_base=args.output_file_base,
+            input_bundle_file=args.input_bundle_file,
+            target_account_id=args.target_account_id,
+            target_aws_region=args.target_aws_region,
+        ))
+        print(f"Using job journal {args.journal} (run {journal_run.key[:12]}).")
+
+    if batch_dashboard_ids:
+        if args.import_only:
+            parser.error("--dashboard-ids/--dashboard-manifest cannot be combined with --import-only.")
+        if not all([args.source_account_id, args.source_aws_region]):
+            parser.error("--source-account-id and --source-aws-region are required for export actions.")
+        if args.export_and_import and not all([args.target_account_id, args.target_aws_region]):
+            parser.error("--target-account-id and --target-aws-region are required for import actions.")
+        print(f"--- Starting Batch Promotion of {len(batch_dashboard_ids)} dashboards "
+              f"(max {args.max_concurrent_jobs} concurrent jobs, {args.engine} engine) ---")
+        batch_export_kwargs = dict(
+            source_aws_account_id=args.source_account_id,
+            source_profile_name=args.source_profile,
+            source_aws_region=args.source_aws_region,
+            include_all_dependencies=args.include_all_dependencies,
+            output_file_path_base=args.output_file_base,
+            dashboard_replacements_json=args.dashboard_replacements_json,
+            old_account_id=args.old_account_id_generic,
+            new_account_id=args.new_account_id_generic,
+            rewrite_mode=args.rewrite_mode,
+            job_timeout_seconds=args.job_timeout_seconds,
+            workers=args.workers,
+            bundle_cache_dir=args.bundle_cache_dir,
+            bundle_cache_max_mb=args.bundle_cache_max_mb,
+            promotion_map=promotion_map,
+            journal_run=journal_run,
+            deterministic_output=args.deterministic_output
+        )
+        batch_import_kwargs = dict(
+            target_aws_account_id=args.target_account_id,
+            target_profile=args.target_profile,
+            target_aws_region=args.target_aws_region,
+            job_timeout_seconds=args.job_timeout_seconds,
+            staging_bucket=args.staging_bucket,
+            staging_prefix=args.staging_prefix,
+            s3_import_threshold_mb=args.s3_import_threshold_mb,
+            s3_endpoint_url=args.s3_endpoint_url,
+            journal_run=journal_run,
+            override_map=override_map,
+            **validation_kwargs
+        ) if args.export_and_import else None
+        if args.deduplicate_dependencies:
+            batch_results = promote_dashboards_deduplicated(
+                batch_dashboard_ids, batch_export_kwargs, batch_import_kwargs,
+                max_resource_arns_per_export=args.max_resource_arns_per_export
+            )
+        elif args.engine == "asyncio":
+            batch_results = promote_dashboards_async(
+                batch_dashboard_ids, batch_export_kwargs, batch_import_kwargs,
+                max_concurrent_jobs=args.max_concurrent_jobs, offload_threads=args.offload_threads
+            )
+        else:
+            batch_results = promote_dashboards_batch(
+                batch_dashboard_ids, batch_export_kwargs, batch_import_kwargs,
+                max_concurrent_jobs=args.max_concurrent_jobs
+            )
+        print_batch_summary(batch_results)
+        if any(result['status'] not in ('IMPORTED', 'EXPORTED') for result in batch_results):
+            sys.exit(1)
+        if journal_run:
+            journal_run.finish()
+        print("\nScript execution finished.")
+        sys.exit(0)
+
+    if args.fanout_targets:
+        if args.import_only:
+            parser.error("--fanout-targets cannot be combined with --import-only.")
+        if args.rewrite_mode == "overrides":
+            parser.error("--fanout-targets cannot be combined with --rewrite-mode overrides.")
+        if not all([args.source_account_id, args.dashboard_id, args.source_aws_region]):
+            parser.error("--source-account-id, --dashboard-id, and --source-aws-region are required for fan-out.")
+        try:
+            fanout_targets = load_fanout_targets(args.fanout_targets)
+        except (OSError, ValueError) as e:  # PromotionMapError is a ValueError
+            print(f"ERROR: Could not load fan-out targets from {args.fanout_targets}: {e}")
+            sys.exit(1)
+        if args.export_and_import and not args.target_aws_region and not all(target.get("target_aws_region") for target in fanout_targets):
+            parser.error("--target-aws-region is required unless every fan-out target sets target_aws_region.")
+        print(f"--- Starting Fan-out Promotion of {args.dashboard_id} to {len(fanout_targets)} targets ---")
+        fanout_results = promote_dashboard_fanout(
+            args.dashboard_id,
+            fanout_targets,
+            export_kwargs=dict(
+                source_aws_account_id=args.source_account_id,
+                source_profile_name=args.source_profile,
+                source_aws_region=args.source_aws_region,
+                include_all_dependencies=args.include_all_dependencies,
+                output_file_path_base=args.output_file_base,
+                dashboard_replacements=dashboard_replacements_map_for_export,
+                old_account_id=args.old_account_id_generic,
+                rewrite_mode=args.rewrite_mode,
+                job_timeout_seconds=args.job_timeout_seconds,
+                bundle_cache_dir=args.bundle_cache_dir,
+                bundle_cache_max_mb=args.bundle_cache_max_mb,
+                deterministic_output=args.deterministic_output
+            ),
+            import_kwargs=dict(
+                target_profile=args.target_profile,
+                target_aws_region=args.target_aws_region,
+                job_timeout_seconds=args.job_timeout_seconds,
+                staging_bucket=args.staging_bucket,
+                staging_prefix=args.staging_prefix,
+                s3_import_threshold_mb=args.s3_import_threshold_mb,
+                s3_endpoint_url=args.s3_endpoint_url,
+                **validation_kwargs
+            ) if args.export_and_import else None,
+            max_concurrent_jobs=args.max_concurrent_jobs
+        )
+        print_fanout_summary(fanout_results)
+        if any(result['status'] not in ('IMPORTED', 'EXPORTED') for result in fanout_results):
+            sys.exit(1)
+        print("\nScript execution finished.")
+        sys.exit(0)
 
     if args.export_only or args.export_and_import:
         if not all([args.source_account_id, args.dashboard_id, args.source_aws_region]):
@@ -464,12 +1474,22 @@ if __name__ == "__main__":
             # Pass the Base64 encoded string to the function
             dashboard_replacements_json=args.dashboard_replacements_json,
             old_account_id=args.old_account_id_generic,
-            new_account_id=args.new_account_id_generic
+            new_account_id=args.new_account_id_generic,
+            rewrite_mode=args.rewrite_mode,
+            job_timeout_seconds=args.job_timeout_seconds,
+            workers=args.workers,
+            bundle_cache_dir=args.bundle_cache_dir,
+            bundle_cache_max_mb=args.bundle_cache_max_mb,
+            promotion_map=promotion_map,
+            journal_run=journal_run,
+            deterministic_output=args.deterministic_output
         )
         if not modified_qs_file_to_import:
             print("\nExport and modification process failed or did not produce a file. Aborting.")
             sys.exit(1)
         if args.export_only:
+            if journal_run:
+                journal_run.finish()
             print("\n--- Export and modification complete. Import step was not requested. ---")
             print(f"Modified bundle file is available at: {modified_qs_file_to_import}")
             sys.exit(0)
@@ -496,9 +1516,19 @@ if __name__ == "__main__":
             target_aws_account_id=args.target_account_id,
             target_profile=args.target_profile,
             target_aws_region=args.target_aws_region,
-            bundle_file_path=modified_qs_file_to_import
+            bundle_file_path=modified_qs_file_to_import,
+            job_timeout_seconds=args.job_timeout_seconds,
+            staging_bucket=args.staging_bucket,
+            staging_prefix=args.staging_prefix,
+            s3_import_threshold_mb=args.s3_import_threshold_mb,
+            s3_endpoint_url=args.s3_endpoint_url,
+            journal_run=journal_run,
+            override_map=override_map,
+            **validation_kwargs
         )
         if import_successful:
+            if journal_run:
+                journal_run.finish()
             print("\n--- Import process completed successfully. Please verify assets in the target QuickSight account. ---")
         else:
             print("\n--- Import process failed or did not complete. Review logs for details. ---")